@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Timings of every caller of the matching package on synthetic cohorts
+
+    python benchmarks/matching_pipelines.py [--sizes 1000,5000] [--survey-sizes 200,1000]
+
+For each number of users it times the library stages (scoring, ranking,
+stable matching) and the pairing service endpoints through the Flask test
+client, both scoring users per request and serving from a prebuilt
+snapshot. For each survey size it writes a synthetic survey export and
+times the pipeline main.py and pairing_algorithm.py run on it: reading the
+file, pairing youth with elders and pairing the session groups.
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,5000', help='Comma-separated service cohort sizes')
+    parser.add_argument('--survey-sizes', default='200,1000', help='Comma-separated survey respondent counts')
+    parser.add_argument('--skills', type=int, default=60, help='Distinct skills')
+    parser.add_argument('--lookups', type=int, default=50, help='Single-user requests timed per size')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+def synthetic_users(count, skills, rnd):
+    names = [f'Skill {i}' for i in range(skills)] + ['Mathematics', 'Science', 'History']
+    users = []
+    for i in range(count):
+        teach = rnd.sample(names, rnd.randint(0, 5))
+        learn = rnd.sample(names, rnd.randint(0, 5))
+        users.append({
+            'id': f'user-{i}',
+            'username': f'user{i}',
+            'age_group': 'Youth' if rnd.random() < 0.5 else 'Elder',
+            'skills_teach': teach,
+            'skills_learn': learn,
+            'skill_levels': {skill: {'proficiency_level': rnd.randint(1, 10), 'years_experience': rnd.randint(0, 10)}
+                             for skill in teach + learn},
+            'want_tutoring': rnd.random() < 0.3,
+            'email': f'user{i}@example.com'
+        })
+    return users
+
+def write_survey(path, count, skills, rnd):
+    """A survey export in the layout of bridges.csv"""
+    hobbies = [f'Hobby {i}' for i in range(skills)]
+    subjects = ['Math', 'Physics', 'Chemistry', 'English', 'Social Studies', 'History']
+    answer = lambda choices: ';'.join(rnd.sample(choices, rnd.randint(1, 3)))
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Timestamp', 'Name', 'Email', 'Bio', 'Group', 'Age', 'Yteach', 'Ylearn', 'Ytutor',
+                         'Ysubject', 'Eteach', 'Elearn', 'Etutor', 'Esubject'])
+        for i in range(count):
+            tutor = 'Yes' if rnd.random() < 0.5 else 'No'
+            own = [answer(hobbies), answer(hobbies), tutor, answer(subjects) if tutor == 'Yes' else '']
+            youth = i % 2 == 0
+            writer.writerow(['', f'Person {i}', f'person{i}@example.com', '', 'Yes' if rnd.random() < 0.7 else 'No',
+                             'Youth' if youth else 'Elderly'] + (own + [''] * 4 if youth else [''] * 4 + own))
+
+def timed(results, label, fn):
+    start = time.perf_counter()
+    value = fn()
+    results[label] = time.perf_counter() - start
+    return value
+
+def bench_service(users, lookups, rnd):
+    import pairing_service
+    from matching import CohortScores, UserRegistry, stable_matching
+    from pairing_snapshot import SnapshotStore
+
+    results = {}
+    registry = timed(results, 'registry', lambda: UserRegistry(users))
+    for mode, weighted in (('count', False), ('weighted', True)):
+        scores = timed(results, f'score ({mode})', lambda: CohortScores(registry.youth, registry.elder, weighted=weighted))
+        youth_prefs, elder_prefs = timed(results, f'preferences ({mode})', scores.preferences)
+        timed(results, f'stable matching ({mode})', lambda: stable_matching(youth_prefs, elder_prefs))
+
+    pairing_service.get_user_data_from_frontend = lambda: users
+    client = pairing_service.app.test_client()
+    sample = [user['id'] for user in rnd.sample(users, min(lookups, len(users)))]
+
+    def endpoints(prefix):
+        for mode in ('count', 'weighted'):
+            timed(results, f'{prefix} {len(sample)} x /skill-swap/<id> ({mode})',
+                  lambda: [client.post(f'/api/skill-swap/{user_id}?scoring={mode}') for user_id in sample])
+            timed(results, f'{prefix} /full-matching ({mode})',
+                  lambda: client.post(f'/api/skill-swap/full-matching?scoring={mode}'))
+            timed(results, f'{prefix} /batch of {len(sample)} ({mode})',
+                  lambda: client.post('/api/skill-swap/batch',
+                                      json={'user_ids': sample, 'scoring': mode}).get_data())
+
+    pairing_service.snapshot_store = None
+    endpoints('per request')
+    with tempfile.TemporaryDirectory(prefix='bridgen-snapshot-') as directory:
+        pairing_service.snapshot_store = SnapshotStore(directory, check_seconds=60)
+        timed(results, 'snapshot build', lambda: pairing_service.snapshot_store.build(users))
+        endpoints('snapshot')
+    pairing_service.snapshot_store = None
+    return results
+
+def bench_survey(path):
+    from matching.survey import match_respondents, pair_groups, read_survey
+
+    results = {}
+    youth, elders = timed(results, 'read survey', lambda: read_survey(path))
+    pairs = timed(results, 'match respondents', lambda: match_respondents(youth, elders))
+    timed(results, 'pair session groups', lambda: pair_groups(youth, elders, pairs))
+    return results
+
+def report(title, results):
+    print(f'\n{title}')
+    for label, seconds in results.items():
+        print(f'  {label:<48} {seconds * 1000:>10.1f} ms')
+
+def main():
+    args = parse_args()
+    rnd = random.Random(args.seed)
+    summary = {}
+
+    for size in [int(n) for n in args.sizes.split(',') if n]:
+        results = bench_service(synthetic_users(size, args.skills, rnd), args.lookups, rnd)
+        report(f'Pairing service, {size} users', results)
+        summary[f'service/{size}'] = results
+
+    with tempfile.TemporaryDirectory(prefix='bridgen-survey-') as directory:
+        for size in [int(n) for n in args.survey_sizes.split(',') if n]:
+            path = os.path.join(directory, f'survey-{size}.csv')
+            write_survey(path, size, args.skills, rnd)
+            results = bench_survey(path)
+            report(f'Survey (main.py, pairing_algorithm.py), {size} respondents', results)
+            summary[f'survey/{size}'] = results
+
+    print('\n' + json.dumps({key: {label: round(s, 4) for label, s in results.items()}
+                              for key, results in summary.items()}))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -111,6 +111,23 @@ export default function ZoomMeeting({ onJoinMeeting }: ZoomMeetingProps) {
     },
   });
 
+  // The server frees a seat a few minutes after its last join, so keep renewing it while in the room
+  useEffect(() => {
+    if (!currentRoom) return;
+    const renew = setInterval(() => {
+      apiRequest('POST', `/api/meeting-rooms/${currentRoom.id}/join`, {}).catch(() => {});
+    }, 60 * 1000);
+    return () => clearInterval(renew);
+  }, [currentRoom]);
+
+  const handleLeaveMeeting = () => {
+    if (currentRoom) {
+      apiRequest('POST', `/api/meeting-rooms/${currentRoom.id}/leave`, {}).catch(() => {});
+    }
+    setSimulateVideoCall(false);
+    setCurrentRoom(null);
+  };
+
   const handleCreateRoom = () => {
     if (!roomForm.name) {
       toast({
@@ -145,10 +162,7 @@ export default function ZoomMeeting({ onJoinMeeting }: ZoomMeetingProps) {
         </div>
         <Button
           variant="destructive"
-          onClick={() => {
-            setSimulateVideoCall(false);
-            setCurrentRoom(null);
-          }}
+          onClick={handleLeaveMeeting}
           data-testid="button-leave-meeting"
         >
           Leave Meeting
@@ -0,0 +1,65 @@
+"""
+Production serving for the pairing service
+
+    gunicorn pairing_service:app       (run from this directory)
+
+The app is imported and the current matching snapshot loaded (or built) once
+in the master before the workers fork, so they start with it already in
+memory: the score matrices are memory-mapped and shared through the page
+cache, and the user registry is shared copy-on-write. Objects that exist at
+fork time are moved out of the garbage collector's reach with gc.freeze(), so
+collections in the workers do not touch, and thereby copy, those pages.
+
+The master also starts pairing_snapshot.py as a child process that rebuilds
+the snapshot every PAIRING_SNAPSHOT_REBUILD_SECONDS, and workers switch to
+each new generation on their own. A snapshot left on disk by an earlier run
+is only reused if it is younger than that. Matches may be as stale as the
+interval; users the snapshot does not know yet are looked up by id and
+trigger an early rebuild. PAIRING_SNAPSHOT_REBUILD_SECONDS=0 stops the
+rebuilds, for deployments that run pairing_snapshot.py --every themselves.
+"""
+
+import gc
+import os
+import subprocess
+import sys
+
+here = os.path.dirname(os.path.abspath(__file__))
+os.environ.setdefault('PAIRING_SNAPSHOT_DIR', os.path.join(here, '.pairing_snapshots'))
+rebuild_seconds = float(os.getenv('PAIRING_SNAPSHOT_REBUILD_SECONDS', '300'))
+
+bind = os.getenv('PAIRING_BIND', '127.0.0.1:5001')
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+threads = int(os.getenv('PAIRING_THREADS', '4'))
+preload_app = True
+# Full matching of a large cohort can take a while before the first byte
+timeout = int(os.getenv('PAIRING_TIMEOUT', '120'))
+
+rebuilder = None
+
+def when_ready(server):
+    global rebuilder
+    import pairing_service
+
+    snapshot = pairing_service.preload_snapshot(max_age=rebuild_seconds or None)
+    if snapshot:
+        server.log.info('Preloaded pairing snapshot %s with %d users', snapshot.generation, len(snapshot.registry))
+    if rebuild_seconds > 0:
+        # A separate process, so no build is ever in progress in the master when it forks
+        rebuilder = subprocess.Popen([
+            sys.executable, os.path.join(here, 'pairing_snapshot.py'),
+            '--every', str(rebuild_seconds), '--wait', str(rebuild_seconds)
+        ], cwd=here)
+        server.log.info('Rebuilding the pairing snapshot every %ss (pid %d)', rebuild_seconds, rebuilder.pid)
+    gc.collect()
+    gc.freeze()
+
+def post_fork(server, worker):
+    import pairing_db
+
+    pairing_db.reset_after_fork()
+
+def on_exit(server):
+    if rebuilder is not None and rebuilder.poll() is None:
+        rebuilder.terminate()
+        rebuilder.wait()
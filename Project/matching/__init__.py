@@ -0,0 +1,21 @@
+"""
+Matching library shared by the pairing service and the survey scripts
+
+    registry   UserRegistry, constant time lookups over a user snapshot
+    scoring    CohortScores: every youth against every elder as sparse matrices
+    ranking    preference lists from rows of those matrices
+    pairing    stable matching between the cohorts and group pairing within one
+    survey     reading the sign-up survey export and matching its respondents
+
+pairing_service.py, pairing_snapshot.py, main.py and the root
+pairing_algorithm.py all go through this package, and
+benchmarks/matching_pipelines.py times every one of those paths.
+"""
+
+from .pairing import group_pairing, stable_matching
+from .ranking import dense_preferences, ranked_row, ranked_rows
+from .registry import UserRegistry
+from .scoring import (
+    ACADEMIC_SKILLS, ACADEMIC_TUTORING, SUBJECT_TUTORING, CohortScores,
+    build_skill_index, learn_weight, overlap_counts, shared_skills, skill_matrix, teach_weight
+)
@@ -0,0 +1,104 @@
+"""
+Stable matching between cohorts and pairing within one
+
+Both are Gale-Shapley variants over ranked preference lists. Each proposer
+keeps a pointer into its list instead of starting over after a rejection,
+and every acceptor's ranking is a dict, so proposals cost O(1) and a whole
+run is linear in the total length of the preference lists.
+"""
+
+from collections import OrderedDict, deque
+from typing import Dict, List
+
+def stable_matching(proposer_preferences: Dict[str, List[str]], acceptor_preferences: Dict[str, List[str]]) -> Dict[str, str]:
+    """
+    Pair proposers (youth) with acceptors (elders), returned as {proposer: acceptor}
+
+    Proposers left out of an acceptor's list never displace its partner, and
+    proposing stops as soon as every acceptor is taken, as in the original
+    pairing() script.
+    """
+    free_proposers = deque(proposer_preferences)
+    free_acceptors = set(acceptor_preferences)
+    pairs = {}
+    # Reverse index of pairs so an acceptor's current partner is found without a scan
+    partner = {}
+    # Position of each proposer in every acceptor's preference list
+    acceptor_rank = {
+        acceptor: {proposer: index for index, proposer in enumerate(prefs)}
+        for acceptor, prefs in acceptor_preferences.items()
+    }
+    # Acceptors that rejected a proposer keep rejecting it, as their partners only
+    # get better, so a freed proposer carries on where it stopped
+    next_choice = dict.fromkeys(proposer_preferences, 0)
+    missing = float('inf')
+
+    while free_proposers and free_acceptors:
+        proposer = free_proposers.popleft()
+        prefs = proposer_preferences[proposer]
+        index = next_choice[proposer]
+
+        while index < len(prefs):
+            acceptor = prefs[index]
+            index += 1
+            if acceptor in free_acceptors:
+                pairs[proposer] = acceptor
+                partner[acceptor] = proposer
+                free_acceptors.remove(acceptor)
+                break
+
+            current = partner.get(acceptor)
+            if current and acceptor in acceptor_rank:
+                ranks = acceptor_rank[acceptor]
+                if ranks.get(proposer, missing) < ranks.get(current, missing):
+                    pairs[proposer] = acceptor
+                    partner[acceptor] = proposer
+                    del pairs[current]
+                    free_proposers.append(current)
+                    break
+
+        next_choice[proposer] = index
+
+    return pairs
+
+def group_pairing(preferences: Dict[str, List[str]]) -> Dict[str, str]:
+    """
+    Pair members of one cohort with each other, where everyone proposes
+    Someone missing from another's list is never accepted by them. Each pair
+    is returned once, as {first: second} with first < second.
+    """
+    unpaired = OrderedDict.fromkeys(preferences)
+    rank = {person: {other: index for index, other in enumerate(prefs)} for person, prefs in preferences.items()}
+    next_choice = dict.fromkeys(preferences, 0)
+    matches = {}
+    missing = float('inf')
+
+    while unpaired:
+        proposer, _ = unpaired.popitem(last=False)
+        prefs = preferences[proposer]
+        index = next_choice[proposer]
+
+        while index < len(prefs):
+            preferred = prefs[index]
+            index += 1
+            preferred_rank = rank[preferred]
+            if proposer not in preferred_rank:
+                continue
+
+            if preferred not in matches:
+                unpaired.pop(preferred, None)
+                matches[preferred] = proposer
+                matches[proposer] = preferred
+                break
+
+            current = matches[preferred]
+            if preferred_rank[proposer] < preferred_rank.get(current, missing):
+                matches[preferred] = proposer
+                matches[proposer] = preferred
+                del matches[current]
+                unpaired[current] = None
+                break
+
+        next_choice[proposer] = index
+
+    return {person: other for person, other in matches.items() if person < other}
@@ -0,0 +1,50 @@
+"""
+Preference lists from score rows
+Ties keep the order of the other cohort, as a stable sort of the scores did
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+def ranked_row(cols: np.ndarray, values: np.ndarray, width: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Columns and values of one sparse score row, best first
+    Only positive scores are ranked unless width is given, in which case all
+    width columns are, the ones missing from the row scoring 0
+    """
+    if width is None:
+        positive = values > 0
+        cols, values = cols[positive], values[positive]
+        order = np.lexsort((cols, -values))
+        return cols[order], values[order]
+    dense = np.zeros(width, dtype=np.float64)
+    dense[cols] = values
+    order = np.argsort(-dense, kind='stable')
+    return order, dense[order]
+
+def ranked_rows(matrix: sparse.csr_matrix, include_zero: bool = False) -> List[np.ndarray]:
+    """
+    The ranked columns of every row, as ranked_row() orders them, with one
+    sort over the whole matrix instead of one per row
+    """
+    if include_zero:
+        return list(np.argsort(-matrix.toarray(), axis=1, kind='stable'))
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    positive = matrix.data > 0
+    rows, cols, values = rows[positive], matrix.indices[positive], matrix.data[positive]
+    order = np.lexsort((cols, -values, rows))
+    ends = np.cumsum(np.bincount(rows, minlength=matrix.shape[0]))
+    return np.split(cols[order], ends[:-1])
+
+def dense_preferences(names: Sequence[str], scores: np.ndarray) -> Dict[str, List[str]]:
+    """
+    Everyone's ranking of everyone else from a square score matrix, where
+    scores[i, j] is how much names[i] likes names[j]
+    """
+    preferences = {}
+    for i, name in enumerate(names):
+        order = np.argsort(-scores[i], kind='stable')
+        preferences[name] = [names[j] for j in order if j != i]
+    return preferences
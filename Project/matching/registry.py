@@ -0,0 +1,61 @@
+"""
+User registry for the matching endpoints
+"""
+
+from collections import ChainMap
+from typing import Any, Dict, List
+
+class UserRegistry:
+    """
+    Index over a snapshot of users so lookups by username, id or cohort
+    are constant time instead of a scan over the whole user list
+    """
+
+    def __init__(self, users: List[Dict]):
+        self.users = list(users)
+        self.by_username: Dict[str, Dict] = {}
+        self.by_id: Dict[Any, Dict] = {}
+        self.youth: List[Dict] = []
+        self.elder: List[Dict] = []
+        self._cohort: Dict[str, str] = {}
+
+        for user in self.users:
+            # First record wins, matching the old next(...) lookups
+            self.by_username.setdefault(user['username'], user)
+            self.by_id.setdefault(user['id'], user)
+            self._cohort.setdefault(user['username'], user['age_group'])
+            if user['age_group'] == 'Youth':
+                self.youth.append(user)
+            elif user['age_group'] == 'Elder':
+                self.elder.append(user)
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def get(self, username: str) -> Dict:
+        return self.by_username.get(username)
+
+    def get_by_id(self, user_id) -> Dict:
+        return self.by_id.get(user_id)
+
+    def is_youth(self, username: str) -> bool:
+        return self._cohort.get(username) == 'Youth'
+
+    def is_elder(self, username: str) -> bool:
+        return self._cohort.get(username) == 'Elder'
+
+    def extended(self, users: List[Dict]) -> 'UserRegistry':
+        """
+        This registry with users added to the lookups, without copying it
+        The cohort lists are shared rather than extended, so the added users
+        are nobody's candidates
+        """
+        extra = UserRegistry(users)
+        registry = UserRegistry.__new__(UserRegistry)
+        registry.users = self.users
+        registry.by_username = ChainMap(self.by_username, extra.by_username)
+        registry.by_id = ChainMap(self.by_id, extra.by_id)
+        registry.youth = self.youth
+        registry.elder = self.elder
+        registry._cohort = ChainMap(self._cohort, extra._cohort)
+        return registry
@@ -0,0 +1,246 @@
+"""
+Compatibility scoring
+Scores a whole youth/elder cohort at once with sparse matrix products
+instead of per-pair loops over skill lists
+
+Count scoring reproduces the original similarities(): every skill a person
+lists counts once for each time it is listed, if the other person lists it
+on the opposite side. Weighted scoring weighs each skill by proficiency and
+experience instead.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .ranking import ranked_row, ranked_rows
+
+ACADEMIC_SKILLS = ['Mathematics', 'Science', 'History', 'Literature', 'Academics (General)']
+
+# Where the tutoring bonus comes from: academic skills among the ones taught and
+# learnt (users of the app) or the separate tutoring subjects (survey answers)
+ACADEMIC_TUTORING = 'academic'
+SUBJECT_TUTORING = 'subjects'
+
+# Experience beyond this many years does not add to a teacher's weight
+MAX_EXPERIENCE_YEARS = 5
+
+def teach_weight(level: Optional[Dict]) -> float:
+    """
+    Weight of a skill someone offers to teach
+    1.0 for an average teacher (proficiency 5, 2.5 years), up to 1.5 for an
+    expert with 5+ years and 1.0 when no level information is stored
+    """
+    if not level:
+        return 1.0
+    proficiency = level.get('proficiency_level') or 1
+    years = min(level.get('years_experience') or 0, MAX_EXPERIENCE_YEARS)
+    return 0.5 + proficiency / 20 + years / (2 * MAX_EXPERIENCE_YEARS)
+
+def learn_weight(level: Optional[Dict]) -> float:
+    """
+    Weight of a skill someone wants to learn
+    Beginners have more to gain, so a lower proficiency weighs more
+    """
+    if not level:
+        return 1.0
+    proficiency = level.get('proficiency_level') or 1
+    return 1.5 - proficiency / 10
+
+def build_skill_index(lists: Sequence[Sequence[str]]) -> Dict[str, int]:
+    """Assign a matrix column to every skill in any of the lists"""
+    index = {}
+    for skills in lists:
+        for skill in skills:
+            index.setdefault(skill, len(index))
+    return index
+
+def skill_matrix(lists: Sequence[Sequence[str]], skill_index: Dict[str, int],
+                 weights: Optional[Sequence[Sequence[float]]] = None, binary: bool = False) -> sparse.csr_matrix:
+    """
+    Lists x skills matrix in CSR form
+    Entries count how often each list names the skill, are 1 with binary=True,
+    or hold the given per-skill weights, in which case a skill listed twice
+    still only counts once
+    """
+    rows, cols, data = [], [], []
+    for row, skills in enumerate(lists):
+        if weights is not None:
+            pairs = dict(zip(skills, weights[row]))
+        elif binary:
+            pairs = dict.fromkeys(skills, 1.0)
+        else:
+            pairs = None
+        if pairs is None:
+            # Duplicates are summed when the matrix is built
+            rows.extend([row] * len(skills))
+            cols.extend(skill_index[skill] for skill in skills)
+            data.extend([1.0] * len(skills))
+        else:
+            for skill, value in pairs.items():
+                rows.append(row)
+                cols.append(skill_index[skill])
+                data.append(value)
+    return sparse.csr_matrix((data, (rows, cols)), shape=(len(lists), len(skill_index)), dtype=np.float64)
+
+def overlap_counts(lists: Sequence[Sequence[str]]) -> np.ndarray:
+    """
+    counts[i, j] is how many entries of lists[i] appear in lists[j], an entry
+    listed twice counting twice. Dense, for small sets such as session groups.
+    """
+    index = build_skill_index(lists)
+    return (skill_matrix(lists, index) @ skill_matrix(lists, index, binary=True).T).toarray()
+
+def shared_skills(person: Dict, match: Dict, is_youth: bool, wants_tutoring: bool = False,
+                  tutoring: str = ACADEMIC_TUTORING) -> List[Tuple[str, str]]:
+    """
+    The skills behind person's count score for match, as (kind, skill) pairs
+    with kind 'teach', 'learn' or 'tutoring', in the order they are scored
+    """
+    shared = [('teach', skill) for skill in person['skills_teach'] if skill in match['skills_learn']]
+    shared += [('learn', skill) for skill in person['skills_learn'] if skill in match['skills_teach']]
+    if wants_tutoring:
+        if tutoring == SUBJECT_TUTORING:
+            shared += [('tutoring', subject) for subject in person['subjects'] if subject in match['subjects']]
+        elif is_youth:
+            shared += [('tutoring', skill) for skill in person['skills_learn']
+                       if skill in ACADEMIC_SKILLS and skill in match['skills_teach']]
+        else:
+            shared += [('tutoring', skill) for skill in person['skills_teach']
+                       if skill in ACADEMIC_SKILLS and skill in match['skills_learn']]
+    return shared
+
+class CohortScores:
+    """
+    Compatibility of every youth with every elder, from both sides
+
+    youth_scores[i, j] is youth i's score for elder j and elder_scores[j, i]
+    is elder j's score for youth i. They differ in the tutoring bonus, which
+    belongs to whoever asked for tutoring, and in count mode in how often
+    each side listed a skill.
+
+    Users are dicts with skills_teach and skills_learn lists, want_tutoring
+    and, for weighted scoring, skill_levels. With tutoring=SUBJECT_TUTORING
+    the bonus counts the shared entries of their subjects lists instead.
+    """
+
+    def __init__(self, youth_users: List[Dict], elder_users: List[Dict], weighted: bool = True,
+                 tutoring: str = ACADEMIC_TUTORING):
+        self.weighted = weighted
+        self._index([u['username'] for u in youth_users], [u['username'] for u in elder_users])
+
+        keys = ['skills_teach', 'skills_learn'] + (['subjects'] if tutoring == SUBJECT_TUTORING else [])
+        skill_index = build_skill_index([u.get(key) or [] for u in youth_users + elder_users for key in keys])
+
+        def matrices(users):
+            """(own, other) matrices per key: a user's own listings, and as seen by the other cohort"""
+            result = {}
+            for key in keys:
+                lists = [u.get(key) or [] for u in users]
+                if weighted and key != 'subjects':
+                    weight_fn = teach_weight if key == 'skills_teach' else learn_weight
+                    weights = [[weight_fn(u.get('skill_levels', {}).get(skill)) for skill in skills]
+                               for u, skills in zip(users, lists)]
+                    own = other = skill_matrix(lists, skill_index, weights)
+                elif weighted:
+                    own = other = skill_matrix(lists, skill_index, binary=True)
+                else:
+                    own, other = skill_matrix(lists, skill_index), skill_matrix(lists, skill_index, binary=True)
+                result[key] = (own, other)
+            return result
+
+        youth = matrices(youth_users)
+        elder = matrices(elder_users)
+        youth_tutoring = sparse.diags([1.0 if u.get('want_tutoring', False) else 0.0 for u in youth_users])
+        elder_tutoring = sparse.diags([1.0 if u.get('want_tutoring', False) else 0.0 for u in elder_users])
+
+        if tutoring == SUBJECT_TUTORING:
+            youth_bonus = youth['subjects'][0] @ elder['subjects'][1].T
+            elder_bonus = elder['subjects'][0] @ youth['subjects'][1].T
+        else:
+            academic = np.zeros(len(skill_index))
+            for skill in ACADEMIC_SKILLS:
+                if skill in skill_index:
+                    academic[skill_index[skill]] = 1.0
+            academic = sparse.diags(academic)
+            # Masked to academic skills: what a youth learns, what an elder teaches
+            youth_bonus = (youth['skills_learn'][0] @ academic) @ elder['skills_teach'][1].T
+            elder_bonus = (elder['skills_teach'][0] @ academic) @ youth['skills_learn'][1].T
+
+        self.youth_scores = sparse.csr_matrix(
+            youth['skills_teach'][0] @ elder['skills_learn'][1].T
+            + youth['skills_learn'][0] @ elder['skills_teach'][1].T
+            + youth_tutoring @ youth_bonus
+        )
+        self.elder_scores = sparse.csr_matrix(
+            elder['skills_teach'][0] @ youth['skills_learn'][1].T
+            + elder['skills_learn'][0] @ youth['skills_teach'][1].T
+            + elder_tutoring @ elder_bonus
+        )
+
+    @classmethod
+    def from_matrices(cls, youth_names: List[str], elder_names: List[str],
+                      youth_scores: sparse.csr_matrix, elder_scores: sparse.csr_matrix,
+                      weighted: bool = True) -> 'CohortScores':
+        """Wrap score matrices computed earlier, e.g. ones memory-mapped from a snapshot"""
+        scores = cls.__new__(cls)
+        scores.weighted = weighted
+        scores._index(youth_names, elder_names)
+        scores.youth_scores = youth_scores
+        scores.elder_scores = elder_scores
+        return scores
+
+    def _index(self, youth_names: List[str], elder_names: List[str]):
+        self.youth_names = youth_names
+        self.elder_names = elder_names
+        self.youth_rows = {name: i for i, name in enumerate(youth_names)}
+        self.elder_rows = {name: i for i, name in enumerate(elder_names)}
+
+    def _side(self, username: str):
+        if username in self.youth_rows:
+            return self.youth_scores, self.youth_rows[username], self.elder_names
+        if username in self.elder_rows:
+            return self.elder_scores, self.elder_rows[username], self.youth_names
+        return None, None, None
+
+    def _value(self, value) -> float:
+        """Scores as returned: whole numbers when counting, two decimals when weighted"""
+        return round(float(value), 2) if self.weighted else int(round(value))
+
+    def score(self, username: str, match_name: str) -> float:
+        """Score of match_name from username's point of view"""
+        scores, row, _ = self._side(username)
+        if scores is None:
+            return 0
+        other_rows = self.elder_rows if scores is self.youth_scores else self.youth_rows
+        if match_name not in other_rows:
+            return 0
+        return self._value(scores[row, other_rows[match_name]])
+
+    def ranked_for(self, username: str, include_zero: bool = False) -> List[Tuple[str, float]]:
+        """
+        Matches for one user, best first, ties in cohort order
+        Only positive scores unless include_zero, which ranks the whole other cohort
+        """
+        scores, row, names = self._side(username)
+        if scores is None:
+            return []
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        cols, values = ranked_row(scores.indices[start:end], scores.data[start:end],
+                                  width=len(names) if include_zero else None)
+        return [(names[col], self._value(value)) for col, value in zip(cols, values)]
+
+    def preferences(self, include_zero: bool = False) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+        """Ranked preference lists for both cohorts, in the order of ranked_for()"""
+        youth_names = np.array(self.youth_names, dtype=object)
+        elder_names = np.array(self.elder_names, dtype=object)
+        youth_preferences = {
+            name: elder_names[cols].tolist()
+            for name, cols in zip(self.youth_names, ranked_rows(self.youth_scores, include_zero))
+        }
+        elder_preferences = {
+            name: youth_names[cols].tolist()
+            for name, cols in zip(self.elder_names, ranked_rows(self.elder_scores, include_zero))
+        }
+        return youth_preferences, elder_preferences
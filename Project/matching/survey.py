@@ -0,0 +1,90 @@
+"""
+Matching the respondents of the sign-up survey
+Reads the Google Forms export (bridges.csv), pairs youth with elders and
+pairs the resulting pairs into session groups, for pairing_algorithm.py and
+main.py
+
+Everyone ranks the whole other cohort, zero scores included, and the
+tutoring bonus counts shared tutoring subjects.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .pairing import group_pairing, stable_matching
+from .ranking import dense_preferences
+from .scoring import SUBJECT_TUTORING, CohortScores, overlap_counts, shared_skills
+
+SURVEY_COLUMNS = [
+    "Name", "Email", "Bio", "Group", "Age", "Yteach", "Ylearn", "Ytutor",
+    "Ysubject", "Eteach", "Elearn", "Etutor", "Esubject"
+]
+
+def _split(answer) -> List[str]:
+    """A multiple choice answer as a list; unanswered questions are empty"""
+    return answer.split(";") if isinstance(answer, str) else []
+
+def read_survey(path: str) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Youth and elder respondents of a survey export, in file order
+    Each is a dict with username, email, bio, group_sessions, skills_teach,
+    skills_learn, want_tutoring and subjects, from the questions for their age
+    """
+    data = pd.read_csv(path).drop(columns="Timestamp")
+    data.columns = SURVEY_COLUMNS
+
+    youth, elders = [], []
+    for row in data.itertuples(index=False):
+        if row.Age == "Youth":
+            prefix, cohort = "Y", youth
+        elif row.Age == "Elderly":
+            prefix, cohort = "E", elders
+        else:
+            continue
+        cohort.append({
+            "username": row.Name,
+            "email": row.Email,
+            "bio": row.Bio,
+            "group_sessions": row.Group == "Yes",
+            "skills_teach": _split(getattr(row, prefix + "teach")),
+            "skills_learn": _split(getattr(row, prefix + "learn")),
+            "want_tutoring": getattr(row, prefix + "tutor") == "Yes",
+            "subjects": _split(getattr(row, prefix + "subject")),
+        })
+    return youth, elders
+
+def match_respondents(youth: List[Dict], elders: List[Dict]) -> Dict[str, str]:
+    """Stable pairs as {youth name: elder name}"""
+    scores = CohortScores(youth, elders, weighted=False, tutoring=SUBJECT_TUTORING)
+    youth_preferences, elder_preferences = scores.preferences(include_zero=True)
+    return stable_matching(youth_preferences, elder_preferences)
+
+def session_groups(youth: List[Dict], elders: List[Dict], pairs: Dict[str, str]) -> List[Tuple[str, str, List[str]]]:
+    """
+    Pairs where both people want group sessions, in youth order, as
+    (youth, elder, interests) with the interests the elder shares with the youth
+    """
+    elders_by_name = {elder["username"]: elder for elder in elders}
+    groups = []
+    for person in youth:
+        elder = elders_by_name.get(pairs.get(person["username"]))
+        if elder is None or not (person["group_sessions"] and elder["group_sessions"]):
+            continue
+        interests = [skill for _, skill in shared_skills(
+            elder, person, is_youth=False, wants_tutoring=elder["want_tutoring"], tutoring=SUBJECT_TUTORING
+        )]
+        groups.append((person["username"], elder["username"], interests))
+    return groups
+
+def group_scores(groups: List[Tuple[str, str, List[str]]]) -> np.ndarray:
+    """scores[i, j]: how many of group i's interests group j shares"""
+    return overlap_counts([interests for _, _, interests in groups])
+
+def pair_groups(youth: List[Dict], elders: List[Dict], pairs: Dict[str, str]) -> List[Tuple[str, str, str, str]]:
+    """Pairs of session groups with the most interests in common, as (youth, elder, youth, elder)"""
+    groups = session_groups(youth, elders, pairs)
+    names = [name for name, _, _ in groups]
+    matched = group_pairing(dense_preferences(names, group_scores(groups)))
+    return [(first, pairs[first], second, pairs[second]) for first, second in matched.items()]
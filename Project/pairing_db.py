@@ -0,0 +1,125 @@
+"""
+Direct database access for the pairing service
+Reads users and their skills from the same database as server/app.py, so
+matching does not need a loopback HTTP call to another service
+"""
+
+import os
+import threading
+from itertools import groupby
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.engine import Engine
+
+# Age from which a user is matched in the elder cohort
+ELDER_MIN_AGE = 60
+
+# Rows fetched per round trip from the server-side cursor
+FETCH_BATCH_SIZE = int(os.getenv('PAIRING_DB_FETCH_SIZE', '2000'))
+
+# One row per (user, skill); users without skills come back once with NULL skill columns.
+# Ordered by user id so each user's rows arrive together and can be grouped while streaming.
+_USERS_WITH_SKILLS = """
+    SELECT u.id, u.username, u.email, u.age, u.level,
+           s.name AS skill_name, us.proficiency_level, us.years_experience,
+           us.want_to_teach, us.want_to_learn
+    FROM users u
+    LEFT JOIN user_skills us ON us.user_id = u.id
+    LEFT JOIN skills s ON s.id = us.skill_id
+    {where}
+    ORDER BY u.id
+"""
+USERS_WITH_SKILLS_QUERY = text(_USERS_WITH_SKILLS.format(where=''))
+USERS_BY_ID_QUERY = text(_USERS_WITH_SKILLS.format(where='WHERE u.id IN :user_ids'))\
+    .bindparams(bindparam('user_ids', expanding=True))
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+def database_url() -> Optional[str]:
+    return os.getenv('DATABASE_URL')
+
+def database_configured() -> bool:
+    return bool(database_url())
+
+def get_engine() -> Engine:
+    """Shared, pooled engine for the configured database"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                url = database_url()
+                options = {'pool_pre_ping': True}
+                if not url.startswith('sqlite'):
+                    options['pool_size'] = int(os.getenv('PAIRING_DB_POOL_SIZE', '5'))
+                    options['max_overflow'] = int(os.getenv('PAIRING_DB_MAX_OVERFLOW', '5'))
+                _engine = create_engine(url, **options)
+    return _engine
+
+def reset_after_fork():
+    """
+    Forget pooled connections inherited from a parent process
+    They stay open for the parent; the child opens its own on first use
+    """
+    if _engine is not None:
+        _engine.dispose(close=False)
+
+def age_group_for(age: Optional[int], level: Optional[int]) -> str:
+    """Cohort for a user; falls back to the level heuristic when no age is stored"""
+    if age is not None:
+        return 'Elder' if age >= ELDER_MIN_AGE else 'Youth'
+    return 'Youth' if (level or 1) < 5 else 'Elder'
+
+def _user_from_rows(rows: List) -> Dict:
+    first = rows[0]
+    skills_teach = []
+    skills_learn = []
+    skill_levels = {}
+
+    for row in rows:
+        if row.skill_name is None:
+            continue
+        if row.want_to_teach:
+            skills_teach.append(row.skill_name)
+        if row.want_to_learn:
+            skills_learn.append(row.skill_name)
+        skill_levels[row.skill_name] = {
+            'proficiency_level': row.proficiency_level,
+            'years_experience': row.years_experience
+        }
+
+    return {
+        'id': first.id,
+        'username': first.username,
+        'age_group': age_group_for(first.age, first.level),
+        'skills_teach': skills_teach,
+        'skills_learn': skills_learn,
+        'skill_levels': skill_levels,
+        'want_tutoring': any('Academics' in name for name in skill_levels),
+        'email': first.email or ''
+    }
+
+def iter_users() -> Iterator[Dict]:
+    """
+    Stream users in the pairing service format from one joined query
+    Uses a server-side cursor where the driver supports it, so memory stays
+    bounded by the fetch batch rather than the number of users
+    """
+    with get_engine().connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, yield_per=FETCH_BATCH_SIZE
+        ).execute(USERS_WITH_SKILLS_QUERY)
+        for _, rows in groupby(result, key=lambda row: row.id):
+            yield _user_from_rows(list(rows))
+
+def load_users() -> List[Dict]:
+    return list(iter_users())
+
+def load_users_by_id(user_ids: List[str]) -> List[Dict]:
+    """The users among user_ids that exist, in the same format as load_users()"""
+    if not user_ids:
+        return []
+    with get_engine().connect() as conn:
+        result = conn.execute(USERS_BY_ID_QUERY, {'user_ids': list(user_ids)})
+        return [_user_from_rows(list(rows)) for _, rows in groupby(result, key=lambda row: row.id)]
@@ -4,30 +4,35 @@ Skill Matching Service
 Integrates the pairing algorithm with the frontend database
 """
 
-import sqlite3
 import json
-from flask import Flask, request, jsonify
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import pandas as pd
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List
+
+import pairing_db
+from matching import CohortScores, UserRegistry, shared_skills, stable_matching
+from pairing_snapshot import Snapshot, SnapshotStore, generation_age
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the standard library encoder
+    orjson = None
 
 app = Flask(__name__)
 CORS(app)
 
-# Database connection
-def get_db_connection():
-    conn = sqlite3.connect(':memory:', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
-
 def fetch_users_from_db():
-    """Fetch all users and their skills from the database"""
+    """Sample users, used when neither the database nor the Node.js server is reachable"""
     try:
-        # Read from the actual SQLite in-memory database created by the Node.js server
-        # We'll use the same database structure but with a direct connection
-        
         # Sample data that matches our database structure
-        # In production, this would read from the actual database
         users_data = [
             {
                 'id': 'user1', 'username': 'Alice_Teacher', 'age_group': 'Elder',
@@ -73,10 +78,17 @@ def fetch_users_from_db():
 def get_user_data_from_frontend():
     """
     This function will be called by the frontend to get real user data
-    In production, this would query the actual database
+    Reads the database directly when DATABASE_URL is set, otherwise asks the
+    Node.js server, and falls back to sample data
     """
     import requests
     
+    if pairing_db.database_configured():
+        try:
+            return pairing_db.load_users()
+        except Exception as e:
+            print(f"Database error: {e}")
+    
     try:
         # Try to fetch data from the Node.js server
         response = requests.get('http://localhost:5000/api/users')
@@ -91,9 +103,14 @@ def get_user_data_from_frontend():
                 # Extract skills from user_skills data
                 skills_teach = []
                 skills_learn = []
+                skill_levels = {}
                 
                 for skill_data in user.get('skills', []):
                     skill_name = skill_data['skill']['name']
+                    skill_levels[skill_name] = {
+                        'proficiency_level': skill_data.get('proficiency_level'),
+                        'years_experience': skill_data.get('years_experience')
+                    }
                     if skill_data['want_to_teach']:
                         skills_teach.append(skill_name)
                     if skill_data['want_to_learn']:
@@ -105,6 +122,7 @@ def get_user_data_from_frontend():
                     'age_group': age_group,
                     'skills_teach': skills_teach,
                     'skills_learn': skills_learn,
+                    'skill_levels': skill_levels,
                     'want_tutoring': len([s for s in user.get('skills', []) if 'Academics' in s['skill']['name']]) > 0,
                     'email': user.get('email', '')
                 })
@@ -116,199 +134,233 @@ def get_user_data_from_frontend():
     # Fallback to sample data
     return fetch_users_from_db()
 
-def calculate_compatibility_score(person: Dict, potential_match: Dict, is_youth: bool, wants_tutoring: bool = False) -> Tuple[int, List[str]]:
+# Prebuilt snapshots (pairing_snapshot.py) served instead of loading and scoring users per request
+snapshot_store = SnapshotStore(
+    os.getenv('PAIRING_SNAPSHOT_DIR'),
+    check_seconds=float(os.getenv('PAIRING_SNAPSHOT_CHECK_SECONDS', '5'))
+) if os.getenv('PAIRING_SNAPSHOT_DIR') else None
+
+# Users looked up per request when the snapshot lacks them, and lookups per minute per worker
+MAX_MISSING_USERS = int(os.getenv('PAIRING_MAX_MISSING_USERS', '100'))
+MISSING_LOOKUPS_PER_MINUTE = int(os.getenv('PAIRING_MISSING_LOOKUPS_PER_MINUTE', '60'))
+
+class LookupBudget:
+    """Token bucket allowing per_minute lookups a minute in this process, in bursts of up to per_minute"""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._tokens = float(per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.per_minute, self._tokens + (now - self._updated) * self.per_minute / 60)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+missing_lookups = LookupBudget(MISSING_LOOKUPS_PER_MINUTE)
+
+class ExtendedScores:
+    """A snapshot's scores, with rankings of the users added to it taken from their own scores"""
+
+    def __init__(self, base: CohortScores, added: Dict[str, CohortScores]):
+        self._base = base
+        self._added = added
+
+    def score(self, username: str, match_name: str) -> float:
+        return self._added.get(username, self._base).score(username, match_name)
+
+    def ranked_for(self, username: str, include_zero: bool = False):
+        return self._added.get(username, self._base).ranked_for(username, include_zero)
+
+class SnapshotView:
     """
-    Calculate compatibility score between two people
-    Adapted from the original similarities() function
+    A snapshot extended with users it does not know yet
+    Each added user is scored against the snapshot's other cohort only, so
+    they get their matches right away, but are nobody else's match until
+    the next build
     """
-    points = 0
-    shared_interests = []
-    
-    if is_youth:
-        # Youth person teaching to elder person learning
-        for skill in person['skills_teach']:
-            if skill in potential_match['skills_learn']:
-                points += 1
-                shared_interests.append(f"You teach {skill}")
-        
-        # Youth person learning from elder person teaching  
-        for skill in person['skills_learn']:
-            if skill in potential_match['skills_teach']:
-                points += 1
-                shared_interests.append(f"You learn {skill}")
-                
-        # Tutoring bonus for academic subjects
-        if wants_tutoring:
-            academic_skills = ['Mathematics', 'Science', 'History', 'Literature', 'Academics (General)']
-            for skill in person['skills_learn']:
-                if skill in academic_skills and skill in potential_match['skills_teach']:
-                    points += 1
-                    shared_interests.append(f"Academic tutoring: {skill}")
-    else:
-        # Elder person teaching to youth person learning
-        for skill in person['skills_teach']:
-            if skill in potential_match['skills_learn']:
-                points += 1
-                shared_interests.append(f"You teach {skill}")
-        
-        # Elder person learning from youth person teaching
-        for skill in person['skills_learn']:
-            if skill in potential_match['skills_teach']:
-                points += 1
-                shared_interests.append(f"You learn {skill}")
-                
-        # Tutoring bonus
-        if wants_tutoring:
-            academic_skills = ['Mathematics', 'Science', 'History', 'Literature', 'Academics (General)']
-            for skill in person['skills_teach']:
-                if skill in academic_skills and skill in potential_match['skills_learn']:
-                    points += 1
-                    shared_interests.append(f"Academic tutoring: {skill}")
-    
-    return points, shared_interests
 
-def score_all_matches(youth_users: List[Dict], elder_users: List[Dict]) -> Tuple[Dict, Dict]:
+    def __init__(self, snapshot: Snapshot, users: List[Dict]):
+        self.generation = snapshot.generation
+        self.registry = snapshot.registry.extended(users)
+        self._snapshot = snapshot
+        self._youth = [u for u in users if u['age_group'] == 'Youth']
+        self._elder = [u for u in users if u['age_group'] == 'Elder']
+        self._scores = {}
+
+    def scores(self, weighted: bool) -> ExtendedScores:
+        if weighted not in self._scores:
+            registry = self._snapshot.registry
+            added = {}
+            if self._youth and registry.elder:
+                youth_scores = CohortScores(self._youth, registry.elder, weighted=weighted)
+                added.update((u['username'], youth_scores) for u in self._youth)
+            if self._elder and registry.youth:
+                elder_scores = CohortScores(registry.youth, self._elder, weighted=weighted)
+                added.update((u['username'], elder_scores) for u in self._elder)
+            self._scores[weighted] = ExtendedScores(self._snapshot.scores(weighted), added)
+        return self._scores[weighted]
+
+def lookup_missing_users(user_ids: List[str]) -> List[Dict]:
     """
-    Score all possible matches between youth and elder users
-    Adapted from the original score() function
+    The users among user_ids found in the database, at most MAX_MISSING_USERS
+    None while this worker is out of lookups, or without a database to ask:
+    the other sources can only return every user
     """
-    all_scored = {}
-    all_match_interests = {}
-    
-    # Score youth users against elder users
-    for person in youth_users:
-        person_scores = {}
-        person_interests = {}
-        
-        for potential_match in elder_users:
-            score, interests = calculate_compatibility_score(
-                person, potential_match, is_youth=True, 
-                wants_tutoring=person.get('want_tutoring', False)
-            )
-            person_scores[potential_match['username']] = score
-            person_interests[potential_match['username']] = interests
-        
-        all_scored[person['username']] = person_scores
-        all_match_interests[person['username']] = person_interests
-    
-    # Score elder users against youth users  
-    for person in elder_users:
-        person_scores = {}
-        person_interests = {}
-        
-        for potential_match in youth_users:
-            score, interests = calculate_compatibility_score(
-                person, potential_match, is_youth=False,
-                wants_tutoring=person.get('want_tutoring', False)
-            )
-            person_scores[potential_match['username']] = score
-            person_interests[potential_match['username']] = interests
-        
-        all_scored[person['username']] = person_scores
-        all_match_interests[person['username']] = person_interests
-    
-    return all_scored, all_match_interests
+    if not pairing_db.database_configured() or not missing_lookups.take():
+        return []
+    try:
+        return pairing_db.load_users_by_id(user_ids[:MAX_MISSING_USERS])
+    except Exception as e:
+        print(f"Database error: {e}")
+        return []
 
-def rank_preferences(scored_matches: Dict) -> Dict:
+def current_snapshot(user_ids=()) -> Snapshot:
     """
-    Rank preferences for each person based on compatibility scores
-    Adapted from the original rank() function
+    The snapshot to serve from, or None when users are loaded per request
+    Users among user_ids the snapshot lacks, such as ones who registered
+    since it was built, are looked up by id and added to it (SnapshotView),
+    and an early rebuild is requested. Ids that are still unknown are
+    answered as not found rather than loading and scoring every user.
     """
-    ranked = {}
-    for person, scores in scored_matches.items():
-        # Sort by score (descending) and create preference list
-        sorted_matches = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        ranked[person] = [match[0] for match in sorted_matches if match[1] > 0]  # Only include positive scores
-    return ranked
-
-def stable_matching(youth_preferences: Dict, elder_preferences: Dict) -> Dict:
+    snapshot = snapshot_store.current() if snapshot_store else None
+    if snapshot is None:
+        return None
+    missing = [user_id for user_id in dict.fromkeys(user_ids) if not snapshot.registry.get_by_id(user_id)]
+    if not missing:
+        return snapshot
+    snapshot_store.request_rebuild()
+    users = lookup_missing_users(missing)
+    return SnapshotView(snapshot, users) if users else snapshot
+
+def preload_snapshot(max_age: float = None) -> Snapshot:
     """
-    Implement stable matching algorithm (Gale-Shapley)
-    Adapted from the original pairing() function
+    Load the current snapshot, building one first if none exists or the
+    current one is older than max_age seconds
+    Called in the gunicorn master so workers inherit it when they fork
     """
-    youth_free = list(youth_preferences.keys())
-    elder_free = list(elder_preferences.keys())
-    pairs = {}
-    
-    while len(youth_free) > 0 and len(elder_free) > 0:
-        youth = youth_free.pop(0)
-        
-        for elder in youth_preferences[youth]:
-            if elder in elder_free:
-                # Elder is free, pair them
-                pairs[youth] = elder
-                elder_free.remove(elder)
-                break
-            else:
-                # Elder is already paired, check if they prefer this youth
-                current_youth = None
-                for y, e in pairs.items():
-                    if e == elder:
-                        current_youth = y
-                        break
-                
-                if current_youth and elder in elder_preferences:
-                    youth_index = elder_preferences[elder].index(youth) if youth in elder_preferences[elder] else float('inf')
-                    current_index = elder_preferences[elder].index(current_youth) if current_youth in elder_preferences[elder] else float('inf')
-                    
-                    if youth_index < current_index:
-                        # Elder prefers new youth, swap
-                        pairs[youth] = elder
-                        del pairs[current_youth]
-                        youth_free.append(current_youth)
-                        break
-    
-    return pairs
+    if snapshot_store is None:
+        return None
+    snapshot = snapshot_store.current()
+    if snapshot is None or (max_age is not None and generation_age(snapshot.generation) > max_age):
+        snapshot = snapshot_store.build(get_user_data_from_frontend())
+    return snapshot
+
+def ndjson_line(obj) -> bytes:
+    """Encode one NDJSON line, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj) + b'\n'
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8') + b'\n'
+
+# Uncompressed bytes gzip_chunks() lets zlib buffer before flushing them to the client
+GZIP_FLUSH_BYTES = 16 * 1024
+
+def ndjson_response(lines, flush_bytes: int = GZIP_FLUSH_BYTES) -> Response:
+    """
+    Stream NDJSON lines, gzip-compressed when the client accepts it
+    Compression is incremental so large responses never sit in memory whole;
+    see gzip_chunks() for flush_bytes
+    """
+    headers = {'Vary': 'Accept-Encoding'}
+    if request.args.get('gzip', '1') != '0' and request.accept_encodings['gzip']:
+        headers['Content-Encoding'] = 'gzip'
+        lines = gzip_chunks(lines, flush_bytes)
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson', headers=headers)
+
+def gzip_chunks(chunks, flush_bytes: int = GZIP_FLUSH_BYTES):
+    """
+    Gzip a stream of byte chunks lazily
+    zlib holds back output until its block fills, so the compressor is
+    sync-flushed after the first chunk (the header line clients wait for) and
+    then whenever flush_bytes of input have gone in since the last flush; 0
+    flushes every chunk. Each flush costs a few bytes and some compression.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    unflushed = 0
+    first = True
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        unflushed += len(chunk)
+        if first or unflushed >= flush_bytes:
+            compressed += compressor.flush(zlib.Z_SYNC_FLUSH)
+            unflushed = 0
+            first = False
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def weighted_scoring_requested() -> bool:
+    """Whether the request asked for proficiency/experience weighted scores"""
+    return request.args.get('scoring', 'count') == 'weighted'
+
+# How each kind of shared skill is described to the user
+INTEREST_LABELS = {'teach': 'You teach {}', 'learn': 'You learn {}', 'tutoring': 'Academic tutoring: {}'}
+
+def shared_interests_for(registry: UserRegistry, person: Dict, match_name: str) -> List[str]:
+    """Shared interests for a single pair, from person's point of view"""
+    shared = shared_skills(
+        person, registry.get(match_name), is_youth=registry.is_youth(person['username']),
+        wants_tutoring=person.get('want_tutoring', False)
+    )
+    return [INTEREST_LABELS[kind].format(skill) for kind, skill in shared]
+
+def cohort_scores_for(registry: UserRegistry, snapshot, weighted: bool) -> CohortScores:
+    """The snapshot's scores when serving from one, else the registry's cohorts scored now"""
+    if snapshot:
+        return snapshot.scores(weighted)
+    return CohortScores(registry.youth, registry.elder, weighted=weighted)
 
 @app.route('/api/skill-swap/<user_id>', methods=['POST'])
 def find_skill_swap_match(user_id):
     """
     Find the best skill swap match for a given user
+    Pass ?scoring=weighted to weigh skills by proficiency and experience
     """
     try:
-        # Fetch all users and their skills from frontend
-        all_users = get_user_data_from_frontend()
+        # Fetch all users and their skills from frontend, unless a snapshot is preloaded
+        snapshot = current_snapshot([user_id])
+        registry = snapshot.registry if snapshot else UserRegistry(get_user_data_from_frontend())
         
         # Find the requesting user
-        requesting_user = None
-        for user in all_users:
-            if user['id'] == user_id:
-                requesting_user = user
-                break
+        requesting_user = registry.get_by_id(user_id)
         
         if not requesting_user:
             return jsonify({'error': 'User not found'}), 404
         
         # Separate youth and elder users
-        youth_users = [u for u in all_users if u['age_group'] == 'Youth']
-        elder_users = [u for u in all_users if u['age_group'] == 'Elder']
-        
-        # Score all potential matches
-        all_scored, all_interests = score_all_matches(youth_users, elder_users)
+        youth_users = registry.youth
+        elder_users = registry.elder
         
-        # Get the requesting user's scores
-        user_scores = all_scored.get(requesting_user['username'], {})
-        user_interests = all_interests.get(requesting_user['username'], {})
+        # Score the whole cohort in one pass, shared interests only for the top matches
+        username = requesting_user['username']
+        opponents = elder_users if registry.is_youth(username) else youth_users
         
-        if not user_scores:
+        if not (registry.is_youth(username) or registry.is_elder(username)) or not opponents:
             return jsonify({
                 'message': 'No compatible matches found',
                 'matches': []
             })
         
-        # Sort matches by compatibility score
-        sorted_matches = sorted(user_scores.items(), key=lambda x: x[1], reverse=True)
+        ranked = cohort_scores_for(registry, snapshot, weighted_scoring_requested()).ranked_for(username)
+        sorted_matches = ranked[:5]
+        total_potential_matches = len(ranked)
+        user_interests = {
+            match_name: shared_interests_for(registry, requesting_user, match_name)
+            for match_name, _ in sorted_matches
+        }
         
         # Format response with top matches
         top_matches = []
-        for match_name, score in sorted_matches[:5]:  # Top 5 matches
+        for match_name, score in sorted_matches:  # Top 5 matches
             if score > 0:
                 # Find the full user data for this match
-                match_user = None
-                for user in all_users:
-                    if user['username'] == match_name:
-                        match_user = user
-                        break
+                match_user = registry.get(match_name)
                 
                 if match_user:
                     top_matches.append({
@@ -321,7 +373,7 @@ def find_skill_swap_match(user_id):
         return jsonify({
             'requesting_user': requesting_user,
             'matches': top_matches,
-            'total_potential_matches': len([s for s in user_scores.values() if s > 0])
+            'total_potential_matches': total_potential_matches
         })
         
     except Exception as e:
@@ -332,36 +384,43 @@ def find_skill_swap_match(user_id):
 def run_full_matching():
     """
     Run the complete stable matching algorithm for all users
+    Pass ?scoring=weighted to weigh skills by proficiency and experience
+    
+    Pass ?format=ndjson to stream the result one line per pair, with users
+    referenced by id and each profile sent once. Adding &compact=1 leaves the
+    profiles out entirely.
     """
     try:
-        all_users = get_user_data_from_frontend()
+        snapshot = current_snapshot()
+        registry = snapshot.registry if snapshot else UserRegistry(get_user_data_from_frontend())
         
         # Separate youth and elder users
-        youth_users = [u for u in all_users if u['age_group'] == 'Youth']
-        elder_users = [u for u in all_users if u['age_group'] == 'Elder']
-        
-        # Score all matches
-        all_scored, all_interests = score_all_matches(youth_users, elder_users)
+        youth_users = registry.youth
+        elder_users = registry.elder
         
-        # Rank preferences
-        all_ranked = rank_preferences(all_scored)
-        
-        # Separate youth and elder preferences
-        youth_preferences = {k: v for k, v in all_ranked.items() if any(u['username'] == k and u['age_group'] == 'Youth' for u in all_users)}
-        elder_preferences = {k: v for k, v in all_ranked.items() if any(u['username'] == k and u['age_group'] == 'Elder' for u in all_users)}
+        cohort_scores = cohort_scores_for(registry, snapshot, weighted_scoring_requested())
+        youth_preferences, elder_preferences = cohort_scores.preferences()
+        pair_score = cohort_scores.score
+        pair_interests = lambda youth, elder: shared_interests_for(registry, registry.get(youth), elder)
         
         # Run stable matching
         final_pairs = stable_matching(youth_preferences, elder_preferences)
         
+        if request.args.get('format') == 'ndjson':
+            return ndjson_response(stream_full_matching(
+                registry, final_pairs, pair_score, pair_interests,
+                compact=request.args.get('compact', '0') == '1'
+            ))
+        
         # Format results
         formatted_pairs = []
         for youth, elder in final_pairs.items():
-            youth_data = next((u for u in all_users if u['username'] == youth), None)
-            elder_data = next((u for u in all_users if u['username'] == elder), None)
+            youth_data = registry.get(youth)
+            elder_data = registry.get(elder)
             
             if youth_data and elder_data:
-                compatibility_score = all_scored.get(youth, {}).get(elder, 0)
-                shared_interests = all_interests.get(youth, {}).get(elder, [])
+                compatibility_score = pair_score(youth, elder)
+                shared_interests = pair_interests(youth, elder)
                 
                 formatted_pairs.append({
                     'youth': youth_data,
@@ -372,7 +431,7 @@ def run_full_matching():
         
         return jsonify({
             'pairs': formatted_pairs,
-            'total_users': len(all_users),
+            'total_users': len(registry),
             'youth_count': len(youth_users),
             'elder_count': len(elder_users),
             'successful_matches': len(formatted_pairs)
@@ -382,9 +441,194 @@ def run_full_matching():
         print(f"Error in full matching: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def stream_full_matching(registry: UserRegistry, final_pairs: Dict, pair_score, pair_interests, compact: bool = False):
+    """
+    Yield the full matching result as NDJSON lines
+    A header line with the cohort counts, then per pair the not yet sent
+    profiles ("user" lines, skipped in compact mode) and a "pair" line, and a
+    final "summary" line
+    """
+    yield ndjson_line({
+        'type': 'header',
+        'total_users': len(registry),
+        'youth_count': len(registry.youth),
+        'elder_count': len(registry.elder)
+    })
+    
+    successful_matches = 0
+    sent_users = set()
+    for youth, elder in final_pairs.items():
+        youth_data = registry.get(youth)
+        elder_data = registry.get(elder)
+        
+        if not (youth_data and elder_data):
+            continue
+        
+        if not compact:
+            for user in (youth_data, elder_data):
+                if user['id'] not in sent_users:
+                    sent_users.add(user['id'])
+                    yield ndjson_line({'type': 'user', 'user': user})
+        
+        yield ndjson_line({
+            'type': 'pair',
+            'youth_id': youth_data['id'],
+            'elder_id': elder_data['id'],
+            'compatibility_score': pair_score(youth, elder),
+            'shared_interests': pair_interests(youth, elder)
+        })
+        successful_matches += 1
+    
+    yield ndjson_line({'type': 'summary', 'successful_matches': successful_matches})
+
+class BatchMarkers:
+    """
+    Running and cancelled batches as empty marker files in a directory, so a
+    DELETE /api/skill-swap/batch/<id> reaching any worker stops the batch
+    streaming from another. Workers on several hosts need PAIRING_BATCH_DIR
+    on a shared mount.
+    """
+    BATCH_ID = re.compile(r'[0-9a-f]{32}')
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, batch_id: str, state: str) -> str:
+        return os.path.join(self.directory, f'{batch_id}.{state}')
+
+    def start(self, batch_id: str):
+        open(self._path(batch_id, 'running'), 'w').close()
+
+    def cancel(self, batch_id: str) -> bool:
+        """Flag a running batch to stop; False if there is no such batch"""
+        if not self.BATCH_ID.fullmatch(batch_id) or not os.path.exists(self._path(batch_id, 'running')):
+            return False
+        open(self._path(batch_id, 'cancelled'), 'w').close()
+        if not os.path.exists(self._path(batch_id, 'running')):
+            # Finished in the meantime; don't leave the flag behind
+            self._remove(batch_id, 'cancelled')
+            return False
+        return True
+
+    def cancelled(self, batch_id: str) -> bool:
+        return os.path.exists(self._path(batch_id, 'cancelled'))
+
+    def finish(self, batch_id: str):
+        self._remove(batch_id, 'running')
+        self._remove(batch_id, 'cancelled')
+
+    def _remove(self, batch_id: str, state: str):
+        try:
+            os.remove(self._path(batch_id, state))
+        except FileNotFoundError:
+            pass
+
+# Batch requests that are still streaming, so they can be cancelled from any worker
+batch_markers = BatchMarkers(os.getenv('PAIRING_BATCH_DIR') or os.path.join(tempfile.gettempdir(), 'pairing-batches'))
+
+# Most user ids one batch request may ask for
+MAX_BATCH_USERS = int(os.getenv('PAIRING_MAX_BATCH_USERS', '10000'))
+
+@app.route('/api/skill-swap/batch', methods=['POST'])
+def find_skill_swap_matches_batch():
+    """
+    Find the best skill swap matches for many users in one request
+    Body: {"user_ids": [...], "scoring": "count" | "weighted", "limit": 5}
+    
+    All users share one snapshot and one scoring pass. Results are streamed
+    as newline-delimited JSON: a header line with the batch id, one line per
+    user id in request order and a final summary line. DELETE
+    /api/skill-swap/batch/<batch_id> or closing the connection stops the batch.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    user_ids = data.get('user_ids')
+    limit = data.get('limit', 5)
+    
+    # Everything is checked before the stream starts, as errors can't change its status afterwards
+    if not isinstance(user_ids, list) or not user_ids or not all(isinstance(user_id, str) for user_id in user_ids):
+        return jsonify({'error': 'user_ids must be a non-empty list of strings'}), 400
+    if len(user_ids) > MAX_BATCH_USERS:
+        return jsonify({'error': f'At most {MAX_BATCH_USERS} user_ids per batch'}), 400
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit <= 0:
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+    if data.get('scoring', 'count') not in ('count', 'weighted'):
+        return jsonify({'error': "scoring must be 'count' or 'weighted'"}), 400
+    
+    try:
+        snapshot = current_snapshot(user_ids)
+        registry = snapshot.registry if snapshot else UserRegistry(get_user_data_from_frontend())
+        cohort_scores = cohort_scores_for(registry, snapshot, data.get('scoring', 'count') == 'weighted')
+    except Exception as e:
+        print(f"Error in batch skill swap matching: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+    
+    batch_id = uuid.uuid4().hex
+    batch_markers.start(batch_id)
+    
+    def generate():
+        completed = 0
+        try:
+            yield ndjson_line({'batch_id': batch_id, 'total': len(user_ids)})
+            
+            cancelled = False
+            for user_id in user_ids:
+                if batch_markers.cancelled(batch_id):
+                    cancelled = True
+                    break
+                
+                user = registry.get_by_id(user_id)
+                if not user:
+                    yield ndjson_line({'user_id': user_id, 'error': 'User not found'})
+                    completed += 1
+                    continue
+                
+                ranked = cohort_scores.ranked_for(user['username'])
+                matches = []
+                for match_name, score in ranked[:limit]:
+                    matches.append({
+                        'user': registry.get(match_name),
+                        'compatibility_score': score,
+                        'shared_interests': shared_interests_for(registry, user, match_name),
+                        'match_percentage': min(100, (score / 5) * 100)
+                    })
+                
+                yield ndjson_line({
+                    'user_id': user_id,
+                    'matches': matches,
+                    'total_potential_matches': len(ranked)
+                })
+                completed += 1
+            
+            yield ndjson_line({
+                'batch_id': batch_id,
+                'completed': completed,
+                'cancelled': cancelled
+            })
+        finally:
+            # Also runs when the client disconnects and the generator is closed
+            batch_markers.finish(batch_id)
+    
+    # Every user's line is flushed as soon as it is ready
+    return ndjson_response(generate(), flush_bytes=0)
+
+@app.route('/api/skill-swap/batch/<batch_id>', methods=['DELETE'])
+def cancel_skill_swap_batch(batch_id):
+    """Stop a running batch after the user currently being processed"""
+    if not batch_markers.cancel(batch_id):
+        return jsonify({'error': 'Batch not found'}), 404
+    
+    return jsonify({'batch_id': batch_id, 'cancelled': True})
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'service': 'pairing_service'})
+    health = {'status': 'healthy', 'service': 'pairing_service'}
+    snapshot = current_snapshot()
+    if snapshot:
+        health['snapshot'] = snapshot.generation
+    return jsonify(health)
 
 if __name__ == '__main__':
     print("🚀 Starting Skill Matching Service...")
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Prebuilt matching snapshots shared by pre-forked workers
+Users and their score matrices are computed once and written to disk, and
+every worker memory-maps the same files instead of scoring the cohorts itself
+
+    python pairing_snapshot.py [--dir DIR] [--every SECONDS] [--wait SECONDS] [--min-interval SECONDS]
+
+A snapshot is a generation directory under PAIRING_SNAPSHOT_DIR holding
+users.json and, for count and weighted scoring, the CSR arrays (data,
+indices, indptr) of the youth and elder score matrices as .npy files. The
+CURRENT file names the newest complete generation and is replaced
+atomically, so readers never see a half-written snapshot.
+
+The arrays are opened with mmap, so the master and all workers share one copy
+in the page cache however many workers there are. Only the user registry is
+built per process, and a registry loaded before the fork stays shared until
+written to. Workers check CURRENT at most every PAIRING_SNAPSHOT_CHECK_SECONDS
+and switch to a new generation without restarting.
+
+A snapshot is as old as its last build: under gunicorn.conf.py the master
+runs this script with --every PAIRING_SNAPSHOT_REBUILD_SECONDS. Workers asked
+about users the snapshot does not know yet create a REBUILD file, and the
+loop then builds early, though never within --min-interval of its last build.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from matching import CohortScores, UserRegistry
+
+logger = logging.getLogger(__name__)
+
+SCORING_MODES = {'count': False, 'weighted': True}
+
+CURRENT_FILE = 'CURRENT'
+REBUILD_FILE = 'REBUILD'
+GENERATION_PREFIX = 'gen-'
+GENERATION_TIME_FORMAT = '%Y%m%d%H%M%S%f'
+
+# Generations kept on disk; older ones are deleted after each build
+KEEP_GENERATIONS = 2
+
+# How often a waiting rebuild loop looks for a REBUILD file
+REBUILD_POLL_SECONDS = 1.0
+
+def _save_matrix(path: str, name: str, matrix: sparse.csr_matrix):
+    for part in ('data', 'indices', 'indptr'):
+        np.save(os.path.join(path, f'{name}.{part}.npy'), getattr(matrix, part))
+
+def _load_matrix(path: str, name: str, shape: Tuple[int, int]) -> sparse.csr_matrix:
+    data, indices, indptr = (
+        np.load(os.path.join(path, f'{name}.{part}.npy'), mmap_mode='r')
+        for part in ('data', 'indices', 'indptr')
+    )
+    # copy=False keeps the read-only memory maps as the matrix's own arrays
+    return sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+def current_generation(directory: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def generation_age(generation: str) -> float:
+    """Seconds since generation was built"""
+    built = datetime.strptime(generation[len(GENERATION_PREFIX):], GENERATION_TIME_FORMAT)
+    return (datetime.utcnow() - built).total_seconds()
+
+def request_rebuild(directory: str):
+    """Ask the rebuild loop for a build before its next scheduled one"""
+    path = os.path.join(directory, REBUILD_FILE)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        open(path, 'a').close()
+
+def rebuild_requested(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, REBUILD_FILE))
+
+def clear_rebuild_request(directory: str):
+    try:
+        os.remove(os.path.join(directory, REBUILD_FILE))
+    except FileNotFoundError:
+        pass
+
+def wait_for_build(directory: str, seconds: float, min_interval: float):
+    """Sleep for seconds, or only min_interval once a rebuild is requested"""
+    start = time.monotonic()
+    while True:
+        elapsed = time.monotonic() - start
+        if elapsed >= seconds or (elapsed >= min_interval and rebuild_requested(directory)):
+            return
+        time.sleep(min(REBUILD_POLL_SECONDS, seconds - elapsed))
+
+def build_snapshot(directory: str, users) -> str:
+    """Write users and their score matrices as a new generation, make it current and return its name"""
+    os.makedirs(directory, exist_ok=True)
+    generation = GENERATION_PREFIX + datetime.utcnow().strftime(GENERATION_TIME_FORMAT)
+    staging = os.path.join(directory, generation + '.tmp')
+    os.makedirs(staging)
+
+    registry = UserRegistry(users)
+    with open(os.path.join(staging, 'users.json'), 'w') as f:
+        json.dump(registry.users, f, separators=(',', ':'))
+
+    shapes = {}
+    for mode, weighted in SCORING_MODES.items():
+        scores = CohortScores(registry.youth, registry.elder, weighted=weighted)
+        for side in ('youth', 'elder'):
+            matrix = getattr(scores, f'{side}_scores')
+            _save_matrix(staging, f'{mode}_{side}', matrix)
+            shapes[f'{mode}_{side}'] = matrix.shape
+    with open(os.path.join(staging, 'meta.json'), 'w') as f:
+        json.dump({'generation': generation, 'users': len(registry), 'shapes': shapes}, f)
+
+    os.rename(staging, os.path.join(directory, generation))
+    pointer = os.path.join(directory, CURRENT_FILE + '.tmp')
+    with open(pointer, 'w') as f:
+        f.write(generation + '\n')
+    os.replace(pointer, os.path.join(directory, CURRENT_FILE))
+
+    # Workers still on an older generation keep their maps of deleted files
+    generations = sorted(name for name in os.listdir(directory)
+                         if name.startswith(GENERATION_PREFIX) and not name.endswith('.tmp'))
+    for name in generations[:-KEEP_GENERATIONS]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    return generation
+
+class Snapshot:
+    """One loaded generation: the user registry and its cohort scores per scoring mode"""
+
+    def __init__(self, generation: str, registry: UserRegistry, scores: Dict[str, CohortScores]):
+        self.generation = generation
+        self.registry = registry
+        self._scores = scores
+
+    def scores(self, weighted: bool) -> CohortScores:
+        return self._scores['weighted' if weighted else 'count']
+
+def load_snapshot(directory: str, generation: str) -> Snapshot:
+    path = os.path.join(directory, generation)
+    with open(os.path.join(path, 'meta.json')) as f:
+        shapes = json.load(f)['shapes']
+    with open(os.path.join(path, 'users.json')) as f:
+        registry = UserRegistry(json.load(f))
+
+    youth_names = [u['username'] for u in registry.youth]
+    elder_names = [u['username'] for u in registry.elder]
+    scores = {
+        mode: CohortScores.from_matrices(
+            youth_names, elder_names,
+            _load_matrix(path, f'{mode}_youth', tuple(shapes[f'{mode}_youth'])),
+            _load_matrix(path, f'{mode}_elder', tuple(shapes[f'{mode}_elder'])),
+            weighted=SCORING_MODES[mode]
+        )
+        for mode in SCORING_MODES
+    }
+    return Snapshot(generation, registry, scores)
+
+class SnapshotStore:
+    """
+    The current snapshot of a directory, reloaded when CURRENT changes
+    A generation that fails to load is logged and the previous one kept
+    """
+
+    def __init__(self, directory: str, check_seconds: float = 5.0):
+        self.directory = directory
+        self.check_seconds = check_seconds
+        self._snapshot: Optional[Snapshot] = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[Snapshot]:
+        """The newest snapshot, or None when none has been built yet"""
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_seconds:
+            return self._snapshot
+        with self._lock:
+            if self._checked_at is None or time.monotonic() - self._checked_at >= self.check_seconds:
+                self._refresh()
+                self._checked_at = time.monotonic()
+        return self._snapshot
+
+    def build(self, users) -> Snapshot:
+        """Build a new generation from users and switch to it"""
+        build_snapshot(self.directory, users)
+        with self._lock:
+            self._refresh()
+            self._checked_at = time.monotonic()
+        return self._snapshot
+
+    def request_rebuild(self):
+        request_rebuild(self.directory)
+
+    def _refresh(self):
+        generation = current_generation(self.directory)
+        if generation is None or (self._snapshot is not None and self._snapshot.generation == generation):
+            return
+        try:
+            self._snapshot = load_snapshot(self.directory, generation)
+        except (OSError, ValueError, KeyError):
+            logger.exception('Loading pairing snapshot %s failed; keeping the previous one', generation)
+            return
+        logger.info('Loaded pairing snapshot %s (%d users)', generation, len(self._snapshot.registry))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', default=os.getenv('PAIRING_SNAPSHOT_DIR'), help='Snapshot directory')
+    parser.add_argument('--every', type=float, help='Keep rebuilding every SECONDS')
+    parser.add_argument('--wait', type=float, default=0, help='Wait SECONDS before the first build')
+    parser.add_argument('--min-interval', type=float,
+                        default=float(os.getenv('PAIRING_SNAPSHOT_MIN_REBUILD_SECONDS', '30')),
+                        help='Build early on request, but at most once per SECONDS')
+    args = parser.parse_args()
+    if not args.dir:
+        parser.error('--dir or PAIRING_SNAPSHOT_DIR is required')
+
+    from pairing_service import get_user_data_from_frontend
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    wait_for_build(args.dir, args.wait, args.min_interval)
+    while True:
+        start = time.perf_counter()
+        # Cleared before users are read, so a request made during the build asks for another
+        clear_rebuild_request(args.dir)
+        try:
+            users = get_user_data_from_frontend()
+            generation = build_snapshot(args.dir, users)
+        except Exception:
+            if not args.every:
+                raise
+            # Keep serving the previous generation and try again next time
+            logger.exception('Building a pairing snapshot failed')
+        else:
+            print(f'Built {generation} with {len(users)} users in {time.perf_counter() - start:.1f}s', flush=True)
+        if not args.every:
+            return
+        wait_for_build(args.dir, args.every, args.min_interval)
+
+if __name__ == '__main__':
+    sys.exit(main())
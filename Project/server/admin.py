@@ -0,0 +1,22 @@
+"""
+Access control for the operational /api/admin endpoints
+"""
+
+import hmac
+from functools import wraps
+
+from flask import jsonify, request
+
+from app import app
+
+def admin_required(view):
+    """Require X-Admin-Token to match ADMIN_TOKEN; without one configured the endpoint does not exist"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = app.config.get('ADMIN_TOKEN')
+        if not token:
+            return jsonify({'error': 'Not found'}), 404
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+            return jsonify({'error': 'Forbidden'}), 403
+        return view(*args, **kwargs)
+    return wrapper
@@ -7,6 +7,7 @@ import uuid
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 import logging
+from db_routing import RoutingSession, remember_writes, replica_binds
 
 # Load environment variables
 load_dotenv()
@@ -30,7 +31,86 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
 app.config['SESSION_TYPE'] = 'filesystem'
 
-db = SQLAlchemy(app)
+# Connection pools, applied to the primary and every replica
+engine_options = {'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')}
+if os.getenv('DB_POOL_SIZE'):
+    engine_options['pool_size'] = int(os.getenv('DB_POOL_SIZE'))
+if os.getenv('DB_MAX_OVERFLOW'):
+    engine_options['max_overflow'] = int(os.getenv('DB_MAX_OVERFLOW'))
+if os.getenv('DB_POOL_RECYCLE'):
+    engine_options['pool_recycle'] = int(os.getenv('DB_POOL_RECYCLE'))
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+
+# Read replicas for @read_only routes (comma-separated URLs), and seconds a
+# client keeps reading from the primary after it wrote
+app.config['SQLALCHEMY_BINDS'] = replica_binds(os.getenv('DATABASE_REPLICA_URLS'))
+app.config['REPLICA_STICKY_SECONDS'] = float(os.getenv('REPLICA_STICKY_SECONDS', '5'))
+
+# Seconds before cached skill statistics are reloaded from the database
+app.config['SKILL_STATS_TTL'] = int(os.getenv('SKILL_STATS_TTL', '300'))
+
+# Request threads per process, as gunicorn.conf.py runs them; the limits below that hold
+# a thread per request are sized against it
+app.config['REQUEST_THREADS'] = int(os.getenv('GUNICORN_THREADS', '8'))
+
+# Buffer chat messages and insert them in batches from a background writer
+app.config['MESSAGE_WRITE_BEHIND'] = os.getenv('MESSAGE_WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+app.config['MESSAGE_QUEUE_SIZE'] = int(os.getenv('MESSAGE_QUEUE_SIZE', '10000'))
+app.config['MESSAGE_FLUSH_INTERVAL'] = float(os.getenv('MESSAGE_FLUSH_INTERVAL', '0.05'))
+app.config['MESSAGE_FLUSH_SIZE'] = int(os.getenv('MESSAGE_FLUSH_SIZE', '500'))
+
+# Chat streams pick up messages accepted by other workers every interval
+# seconds (0 disables it for single-process servers), reading back lookback seconds
+app.config['CHAT_RELAY_INTERVAL'] = float(os.getenv('CHAT_RELAY_INTERVAL', '0.5'))
+app.config['CHAT_RELAY_LOOKBACK'] = float(os.getenv('CHAT_RELAY_LOOKBACK', '10'))
+
+# Chat streams open at once per process. Each holds a request thread while connected,
+# so past this many new streams get 503s; by default a quarter of the request threads
+app.config['SSE_MAX_STREAMS'] = int(os.getenv('SSE_MAX_STREAMS', str(max(1, app.config['REQUEST_THREADS'] // 4))))
+
+# Users kept in the in-memory leaderboard, and seconds before it is reloaded
+app.config['LEADERBOARD_SIZE'] = int(os.getenv('LEADERBOARD_SIZE', '100'))
+app.config['LEADERBOARD_TTL'] = int(os.getenv('LEADERBOARD_TTL', '60'))
+
+# Seconds a meeting room seat is held after its holder last joined; clients renew it by joining again
+app.config['MEETING_SEAT_LEASE_SECONDS'] = int(os.getenv('MEETING_SEAT_LEASE_SECONDS', '300'))
+
+# Password hashing: werkzeug method (work factor), pool size and queued requests before 503s.
+# By default at most half of the request threads wait on a hash, so the 503 fires while
+# the other endpoints still have threads to run on
+_request_threads = app.config['REQUEST_THREADS']
+app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS',
+                                                    str(max(1, min(os.cpu_count() or 2, _request_threads // 4)))))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.getenv('PASSWORD_HASH_QUEUE',
+                                                  str(max(0, _request_threads // 2 - app.config['PASSWORD_HASH_WORKERS']))))
+
+# Conditional-GET cache for skills, meeting rooms and profiles: body budget and max age in seconds
+app.config['HTTP_CACHE_MAX_BYTES'] = int(os.getenv('HTTP_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+app.config['HTTP_CACHE_TTL'] = int(os.getenv('HTTP_CACHE_TTL', '60'))
+
+# Serve skill matches from the materialized skill_matches table; one process
+# at a time re-scores users whose skills changed, polling every this many seconds
+app.config['SKILL_MATCH_STORE'] = os.getenv('SKILL_MATCH_STORE', 'true').lower() in ('1', 'true', 'yes')
+app.config['SKILL_MATCH_REFRESH_DELAY'] = float(os.getenv('SKILL_MATCH_REFRESH_DELAY', '0.5'))
+
+# Per-request SQL/latency profiling (opt in); headers are always sent in debug mode
+app.config['PROFILE_REQUESTS'] = os.getenv('PROFILE_REQUESTS', 'false').lower() in ('1', 'true', 'yes')
+app.config['PROFILE_HEADERS'] = os.getenv('PROFILE_HEADERS', 'false').lower() in ('1', 'true', 'yes')
+app.config['PROFILE_SLOW_MS'] = float(os.getenv('PROFILE_SLOW_MS', '500'))
+
+# Chat messages older than this many days are moved into compressed archive segments
+app.config['MESSAGE_ARCHIVE_AFTER_DAYS'] = int(os.getenv('MESSAGE_ARCHIVE_AFTER_DAYS', '30'))
+app.config['MESSAGE_ARCHIVE_SEGMENT_SIZE'] = int(os.getenv('MESSAGE_ARCHIVE_SEGMENT_SIZE', '500'))
+# Seconds before the set of rooms with archived messages is reloaded
+app.config['MESSAGE_ARCHIVE_ROOMS_TTL'] = int(os.getenv('MESSAGE_ARCHIVE_ROOMS_TTL', '60'))
+
+# Token required in X-Admin-Token by the /api/admin endpoints; unset disables them
+app.config['ADMIN_TOKEN'] = os.getenv('ADMIN_TOKEN')
+
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+if app.config['SQLALCHEMY_BINDS']:
+    app.after_request(remember_writes)
 
 # Database Models
 class User(db.Model):
@@ -55,7 +135,7 @@ class User(db.Model):
     sent_messages = db.relationship('Message', foreign_keys='Message.sender_id', backref='sender', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, app.config['PASSWORD_HASH_METHOD'])
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -128,6 +208,10 @@ class SkillMatch(db.Model):
     user2_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
     skill_id = db.Column(db.String(36), db.ForeignKey('skills.id'), nullable=False)
     match_percentage = db.Column(db.Float, nullable=False)
+    # The candidate's user skill and whether they would teach or learn it;
+    # filled in by the materializer in match_store.py
+    user_skill_id = db.Column(db.String(36))
+    match_type = db.Column(db.String(10))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -141,7 +225,8 @@ class SkillMatch(db.Model):
             'user1': {'id': self.user1.id, 'username': self.user1.username} if self.user1 else None,
             'user2': {'id': self.user2.id, 'username': self.user2.username} if self.user2 else None,
             'skill': self.skill.to_dict() if self.skill else None,
-            'match_percentage': self.match_percentage
+            'match_percentage': self.match_percentage,
+            'match_type': self.match_type
         }
 
 class Message(db.Model):
@@ -167,6 +252,46 @@ class Message(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class SkillMatchDirty(db.Model):
+    """A user whose rows in skill_matches are out of date until match_store.py re-scores them"""
+    __tablename__ = 'skill_match_dirty'
+    
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    # Counts the changes, so a refresh only clears the ones it scored
+    changes = db.Column(db.Integer, nullable=False, default=1)
+    marked_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class BackgroundLease(db.Model):
+    """The process running a background job that only one process may run at a time"""
+    __tablename__ = 'background_leases'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    holder = db.Column(db.String(100))
+    expires_at = db.Column(db.DateTime)
+
+class MessageArchiveSegment(db.Model):
+    """A run of a room's oldest messages, moved out of messages by message_archive.py"""
+    __tablename__ = 'message_archive_segments'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    room_id = db.Column(db.String(100), nullable=False)
+    # Sort keys (created_at, id) of the oldest and newest message in the segment
+    first_created_at = db.Column(db.DateTime, nullable=False)
+    first_message_id = db.Column(db.String(36), nullable=False)
+    last_created_at = db.Column(db.DateTime, nullable=False)
+    last_message_id = db.Column(db.String(36), nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    # zlib-compressed JSON list of the messages, oldest first
+    payload = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CacheVersion(db.Model):
+    """Write counter of a conditional-GET cache key, shared by every worker (see http_cache.py)"""
+    __tablename__ = 'cache_versions'
+    
+    key = db.Column(db.String(200), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
 class MeetingRoom(db.Model):
     __tablename__ = 'meeting_rooms'
     
@@ -178,6 +303,8 @@ class MeetingRoom(db.Model):
     zoom_join_url = db.Column(db.String(500))
     scheduled_time = db.Column(db.DateTime)
     max_participants = db.Column(db.Integer, default=10)
+    # Rows in meeting_room_participants, kept in step by occupancy.py
+    current_participants = db.Column(db.Integer, default=0)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -197,10 +324,23 @@ class MeetingRoom(db.Model):
             'is_active': self.is_active
         }
 
+class MeetingRoomParticipant(db.Model):
+    """A user currently in a meeting room"""
+    __tablename__ = 'meeting_room_participants'
+    
+    room_id = db.Column(db.String(36), db.ForeignKey('meeting_rooms.id'), primary_key=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    joined_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Renewed by every join; the seat is freed MEETING_SEAT_LEASE_SECONDS after the last one
+    last_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 # Initialize database
 def create_tables():
+    from migrations import run_migrations
+    
     with app.app_context():
         db.create_all()
+        run_migrations()
         
         # Create default skills if they don't exist
         default_skills = [
@@ -214,11 +354,9 @@ def create_tables():
             {'name': 'Chess', 'category': 'Games', 'description': 'Strategic chess playing', 'icon': 'gamepad-2'}
         ]
         
-        for skill_data in default_skills:
-            existing_skill = Skill.query.filter_by(name=skill_data['name']).first()
-            if not existing_skill:
-                skill = Skill(**skill_data)
-                db.session.add(skill)
+        names = [skill_data['name'] for skill_data in default_skills]
+        existing = set(db.session.execute(db.select(Skill.name).where(Skill.name.in_(names))).scalars())
+        db.session.add_all(Skill(**skill_data) for skill_data in default_skills if skill_data['name'] not in existing)
         
         db.session.commit()
 
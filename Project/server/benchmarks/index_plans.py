@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Query plans and timings for the hot query paths, before and after migrations
+
+    python benchmarks/index_plans.py [--users 5000] [--messages 100000]
+    python benchmarks/index_plans.py --url postgresql://... (an empty database)
+
+Seeds a fresh database without migrations, prints the plan and mean time
+of each query, applies the migrations and prints them again.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Database URL (default: a temporary SQLite file)')
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--skills', type=int, default=50)
+    parser.add_argument('--rooms', type=int, default=2000)
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50, help='Runs per query for timing')
+    return parser.parse_args()
+
+def hot_queries(ids):
+    from sqlalchemy import select
+    from app import UserSkill, Message, MeetingRoom
+
+    user_id = ids['users'][0]
+    skill_id = ids['skills'][0]
+    room_id = ids['message_rooms'][0]
+
+    return {
+        'user skill lookup (user_id, skill_id)': select(UserSkill).where(
+            UserSkill.user_id == user_id, UserSkill.skill_id == skill_id),
+        'teachers for skill': select(UserSkill.user_id).where(
+            UserSkill.skill_id == skill_id, UserSkill.want_to_teach == True, UserSkill.user_id != user_id),
+        'learners for skill': select(UserSkill.user_id).where(
+            UserSkill.skill_id == skill_id, UserSkill.want_to_learn == True, UserSkill.user_id != user_id),
+        'room messages, newest first': select(Message).where(
+            Message.room_id == room_id).order_by(Message.created_at.desc()).limit(50),
+        'active meeting rooms': select(MeetingRoom).where(
+            MeetingRoom.is_active == True).order_by(MeetingRoom.created_at.desc()).limit(50),
+    }
+
+def explain(conn, statement):
+    from sqlalchemy import text
+
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True})
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = conn.execute(text(prefix + str(compiled))).all()
+    if conn.dialect.name == 'sqlite':
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+def measure(engine, queries, repeat):
+    results = {}
+    with engine.connect() as conn:
+        for name, statement in queries.items():
+            plan = explain(conn, statement)
+            conn.execute(statement).all()  # warm up
+            start = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(statement).all()
+            results[name] = (plan, (time.perf_counter() - start) / repeat * 1000)
+    return results
+
+def report(title, results):
+    print(f'\n== {title} ==')
+    for name, (plan, mean_ms) in results.items():
+        print(f'\n{name}: {mean_ms:.3f} ms')
+        for line in plan:
+            print(f'    {line}')
+
+def main():
+    args = parse_args()
+    workdir = None
+    if args.url:
+        os.environ['DATABASE_URL'] = args.url
+    else:
+        workdir = tempfile.mkdtemp(prefix='bridgen-bench-')
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+    from seed import seed_database
+    from app import app, db
+    from migrations import run_migrations
+
+    with app.app_context():
+        db.create_all()
+
+    print(f'Seeding {args.users} users, {args.rooms} rooms, {args.messages} messages...')
+    ids = seed_database(users=args.users, skills=args.skills, rooms=args.rooms, messages=args.messages)
+
+    with app.app_context():
+        queries = hot_queries(ids)
+        before = measure(db.engine, queries, args.repeat)
+        applied = run_migrations()
+        with db.engine.connect() as conn:
+            # Refresh planner statistics for the new indexes
+            conn.exec_driver_sql('ANALYZE')
+            conn.commit()
+        after = measure(db.engine, queries, args.repeat)
+
+    report('Before migrations', before)
+    report('After migrations (' + ', '.join(applied) + ')', after)
+
+    print('\n== Summary ==')
+    for name in queries:
+        old_ms, new_ms = before[name][1], after[name][1]
+        print(f'{name:<40} {old_ms:9.3f} ms -> {new_ms:9.3f} ms  ({old_ms / new_ms:6.1f}x)')
+
+    if workdir:
+        print(f'\nDatabase kept at {workdir}')
+
+if __name__ == '__main__':
+    sys.exit(main())
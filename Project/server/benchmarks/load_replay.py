@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Replay a weighted mix of API calls against a seeded database
+
+    python benchmarks/load_replay.py [--users 2000] [--concurrency 8] [--duration 20]
+    python benchmarks/load_replay.py --http            (through a local WSGI server)
+    python benchmarks/load_replay.py --url postgresql://... (an empty database)
+    python benchmarks/load_replay.py --compare results/abc1234.json results/def5678.json
+
+Seeds a fresh database with seed.py, builds the derived tables (search index,
+materialized matches), then runs --concurrency clients for --duration
+seconds. Each client is logged in as a random seeded user and picks its next
+call from the weighted mix in ENDPOINTS; --mix overrides the weights, e.g.
+--mix profile=50,send_message=0.
+
+Prints throughput and p50/p95/p99 latency per route and saves them to
+results/<git sha>.json (with -dirty for uncommitted trees), so runs on
+different commits can be compared with --compare.
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+SEARCH_WORDS = ['gardening', 'piano', 'chess', 'teacher', 'student', 'cooking', 'history', 'python']
+
+# name: (weight, route label, call(ctx, rnd) -> (method, path, JSON body or None))
+ENDPOINTS = {
+    'profile': (20, 'GET /api/users/<id>',
+                lambda ctx, rnd: ('GET', f"/api/users/{rnd.choice(ctx['users'])}", None)),
+    'skills': (10, 'GET /api/skills',
+               lambda ctx, rnd: ('GET', '/api/skills', None)),
+    'user_skills': (5, 'GET /api/users/<id>/skills',
+                    lambda ctx, rnd: ('GET', f"/api/users/{rnd.choice(ctx['users'])}/skills", None)),
+    'skill_matches': (10, 'GET /api/skill-matches/<id>',
+                      lambda ctx, rnd: ('GET', f"/api/skill-matches/{ctx['me']}?limit=20", None)),
+    'percentiles': (3, 'GET /api/skill-matches/percentiles',
+                    lambda ctx, rnd: ('GET', '/api/skill-matches/percentiles', None)),
+    'messages': (15, 'GET /api/messages/<room>',
+                 lambda ctx, rnd: ('GET', f"/api/messages/{rnd.choice(ctx['message_rooms'])}?per_page=50", None)),
+    'send_message': (10, 'POST /api/messages',
+                     lambda ctx, rnd: ('POST', '/api/messages', {
+                         'room_id': rnd.choice(ctx['message_rooms']),
+                         'content': ' '.join(rnd.sample(SEARCH_WORDS, 4))})),
+    'meeting_rooms': (8, 'GET /api/meeting-rooms',
+                      lambda ctx, rnd: ('GET', '/api/meeting-rooms', None)),
+    'live_rooms': (4, 'GET /api/meeting-rooms/live',
+                   lambda ctx, rnd: ('GET', '/api/meeting-rooms/live?upcoming=true', None)),
+    'join_room': (3, 'POST /api/meeting-rooms/<id>/join',
+                  lambda ctx, rnd: ('POST', f"/api/meeting-rooms/{rnd.choice(ctx['rooms'])}/join", None)),
+    'leaderboard': (5, 'GET /api/leaderboard',
+                    lambda ctx, rnd: ('GET', '/api/leaderboard?limit=10', None)),
+    'award_points': (3, 'POST /api/users/<id>/points',
+                     lambda ctx, rnd: ('POST', f"/api/users/{ctx['me']}/points", {'points': rnd.randint(1, 50)})),
+    'search': (4, 'GET /api/search/users',
+               lambda ctx, rnd: ('GET', f"/api/search/users?q={rnd.choice(SEARCH_WORDS)}", None)),
+    'login': (1, 'POST /api/auth/login',
+              lambda ctx, rnd: ('POST', '/api/auth/login', {'username': ctx['username'], 'password': ctx['password']})),
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Database URL (default: a temporary SQLite file)')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--skills', type=int, default=50)
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of measured load')
+    parser.add_argument('--warmup', type=float, default=3, help='Seconds of unmeasured load first')
+    parser.add_argument('--mix', default='', help='Weight overrides, e.g. profile=50,login=0')
+    parser.add_argument('--http', action='store_true', help='Go through a local WSGI server instead of the test client')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Where to save results (default: results/<git sha>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='Compare two saved results and exit')
+    return parser.parse_args()
+
+def weighted_mix(overrides):
+    weights = {name: weight for name, (weight, _, _) in ENDPOINTS.items()}
+    for item in filter(None, overrides.split(',')):
+        name, _, weight = item.partition('=')
+        if name not in weights:
+            raise SystemExit(f'Unknown endpoint {name!r}; choose from {", ".join(ENDPOINTS)}')
+        weights[name] = float(weight)
+    names = [name for name in weights if weights[name] > 0]
+    return names, [weights[name] for name in names]
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class TestClient:
+    """The Flask test client, logged in by writing the session directly"""
+
+    def __init__(self, app, user_id, username):
+        self.client = app.test_client()
+        with self.client.session_transaction() as session:
+            session['user_id'] = user_id
+            session['username'] = username
+
+    def request(self, method, path, body):
+        response = self.client.open(path, method=method, json=body)
+        return response.status_code, len(response.get_data())
+
+class HttpClient:
+    """urllib against a local server, logged in through /api/auth/login"""
+
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        status, _ = self.request('POST', '/api/auth/login', {'username': username, 'password': password})
+        if status != 200:
+            raise RuntimeError(f'Login as {username} failed with {status}')
+
+    def request(self, method, path, body):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with self.opener.open(request) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, len(e.read())
+
+def start_server(app):
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+def run(make_client, ctx, names, weights, concurrency, warmup, duration, seed):
+    samples = {ENDPOINTS[name][1]: [] for name in names}
+    statuses = {label: Counter() for label in samples}
+    lock = threading.Lock()
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+
+    def worker(n):
+        rnd = random.Random(seed * 1000 + n)
+        user = rnd.randrange(len(ctx['users']))
+        client = make_client(ctx['users'][user], ctx['usernames'][user])
+        me = dict(ctx, me=ctx['users'][user], username=ctx['usernames'][user])
+        while True:
+            name = rnd.choices(names, weights)[0]
+            _, label, call = ENDPOINTS[name]
+            method, path, body = call(me, rnd)
+            start = time.perf_counter()
+            if start >= stop_at:
+                return
+            status, _ = client.request(method, path, body)
+            elapsed = (time.perf_counter() - start) * 1000
+            if start < measure_from:
+                continue
+            with lock:
+                samples[label].append(elapsed)
+                statuses[label][status] += 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    routes = {}
+    for label, latencies in samples.items():
+        latencies.sort()
+        routes[label] = {
+            'requests': len(latencies),
+            'errors': sum(n for status, n in statuses[label].items() if status >= 500),
+            'statuses': {str(status): n for status, n in sorted(statuses[label].items())},
+            'rps': round(len(latencies) / duration, 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+        }
+    total = sum(route['requests'] for route in routes.values())
+    return {'total_requests': total, 'rps': round(total / duration, 2), 'routes': routes}
+
+def report(results):
+    print(f'\n{"route":<40} {"reqs":>7} {"rps":>8} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"5xx":>5}')
+    for label, route in sorted(results['routes'].items()):
+        print(f'{label:<40} {route["requests"]:>7} {route["rps"]:>8.1f} {route["p50_ms"]:>9.2f} '
+              f'{route["p95_ms"]:>9.2f} {route["p99_ms"]:>9.2f} {route["errors"]:>5}')
+    print(f'\n{results["total_requests"]} requests, {results["rps"]:.1f} req/s')
+
+def compare(base_path, new_path):
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    def change(old, current):
+        return f'{(current - old) / old * 100:+7.1f}%' if old else '    n/a'
+
+    print(f'{base.get("git_sha")} -> {new.get("git_sha")}\n')
+    print(f'{"route":<40} {"rps":>17} {"p50":>17} {"p95":>17} {"p99":>17}')
+    for label in sorted(set(base['results']['routes']) | set(new['results']['routes'])):
+        old = base['results']['routes'].get(label)
+        current = new['results']['routes'].get(label)
+        if not old or not current:
+            print(f'{label:<40} only in {"new" if current else "base"}')
+            continue
+        print(f'{label:<40}' + ''.join(
+            f' {current[key]:>8.1f} {change(old[key], current[key])}' for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms')))
+    print(f'\n{"total":<40} {new["results"]["rps"]:>8.1f} {change(base["results"]["rps"], new["results"]["rps"])}')
+
+def git_sha():
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        sha = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=here, text=True).strip()
+        dirty = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return sha + ('-dirty' if dirty.strip() else '')
+
+def main():
+    args = parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    names, weights = weighted_mix(args.mix)
+    workdir = None
+    if args.url:
+        os.environ['DATABASE_URL'] = args.url
+    else:
+        workdir = tempfile.mkdtemp(prefix='bridgen-bench-')
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+    from seed import seed_database, SEED_PASSWORD
+    from app import app, db, create_tables
+    import routes  # noqa: F401 - registers the endpoints
+    from match_store import SkillMatchMaterializer
+    from user_search import SearchUnavailable, index_users
+
+    create_tables()
+    print(f'Seeding {args.users} users, {args.rooms} rooms, {args.messages} messages...')
+    ids = seed_database(users=args.users, skills=args.skills, rooms=args.rooms,
+                        messages=args.messages, seed=args.seed)
+    with app.app_context():
+        try:
+            with db.engine.begin() as conn:
+                index_users(conn)
+        except SearchUnavailable:
+            pass
+    SkillMatchMaterializer(app).rebuild()
+
+    ctx = {
+        'users': ids['users'],
+        'usernames': [f'user{i}' for i in range(len(ids['users']))],
+        'rooms': ids['rooms'],
+        'message_rooms': ids['message_rooms'],
+        'password': SEED_PASSWORD,
+    }
+
+    server = None
+    if args.http:
+        server, base_url = start_server(app)
+        make_client = lambda user_id, username: HttpClient(base_url, username, SEED_PASSWORD)
+    else:
+        make_client = lambda user_id, username: TestClient(app, user_id, username)
+
+    print(f'Replaying with {args.concurrency} clients for {args.duration:g}s '
+          f'({"HTTP" if args.http else "test client"})...')
+    results = run(make_client, ctx, names, weights, args.concurrency, args.warmup, args.duration, args.seed)
+    if server:
+        server.shutdown()
+    report(results)
+
+    sha = git_sha()
+    output = args.output or os.path.join(RESULTS_DIR, f'{sha}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'git_sha': sha,
+            'recorded_at': datetime.utcnow().isoformat(),
+            'database': 'sqlite' if workdir else args.url.split(':', 1)[0],
+            'options': {key: value for key, value in vars(args).items() if key not in ('url', 'compare', 'output')},
+            'weights': dict(zip(names, weights)),
+            'results': results
+        }, f, indent=2)
+    print(f'Saved {output}')
+
+    if workdir:
+        print(f'Database kept at {workdir}')
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Login throughput against the number of password hashing workers
+
+    python benchmarks/login_throughput.py [--workers 1,2,4,8] [--clients 16]
+    python benchmarks/login_throughput.py --method pbkdf2:sha256:600000
+
+Seeds users hashed with --method, then for each worker count runs --clients
+concurrent clients logging in through the Flask test client while a probe
+thread polls /api/health. Reports logins per second, login latency, how
+many logins were turned away with 503, and how long the cheap endpoint took
+while hashing was saturated.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Database URL (default: a temporary SQLite file)')
+    parser.add_argument('--method', default='scrypt', help='werkzeug hash method (work factor)')
+    parser.add_argument('--workers', default='1,2,4,8', help='Comma-separated hashing pool sizes')
+    parser.add_argument('--queue', type=int, default=32, help='Queued hashes allowed before 503')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent login clients')
+    parser.add_argument('--logins', type=int, default=20, help='Logins per client per run')
+    parser.add_argument('--users', type=int, default=200)
+    return parser.parse_args()
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def run(app, usernames, password, clients, logins):
+    login_ms = []
+    health_ms = []
+    rejected = [0]
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def client(offset):
+        http = app.test_client()
+        for i in range(logins):
+            username = usernames[(offset * logins + i) % len(usernames)]
+            start = time.perf_counter()
+            response = http.post('/api/auth/login', json={'username': username, 'password': password})
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if response.status_code == 503:
+                    rejected[0] += 1
+                elif response.status_code == 200:
+                    login_ms.append(elapsed)
+                else:
+                    raise RuntimeError(f'Login failed with {response.status_code}: {response.get_data(as_text=True)}')
+
+    def probe():
+        http = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            http.get('/api/health')
+            health_ms.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.01)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+
+    return {
+        'logins_per_second': len(login_ms) / elapsed,
+        'login_p50_ms': percentile(login_ms, 0.50),
+        'login_p95_ms': percentile(login_ms, 0.95),
+        'rejected': rejected[0],
+        'health_p95_ms': percentile(health_ms, 0.95),
+    }
+
+def main():
+    args = parse_args()
+    workdir = None
+    if args.url:
+        os.environ['DATABASE_URL'] = args.url
+    else:
+        workdir = tempfile.mkdtemp(prefix='bridgen-bench-')
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ['PASSWORD_HASH_METHOD'] = args.method
+
+    from seed import seed_database, SEED_PASSWORD
+    from app import app, db, User
+    import routes  # noqa: F401 - registers the endpoints
+    from passwords import password_hasher
+
+    with app.app_context():
+        db.create_all()
+    seed_database(users=args.users, skills=10, rooms=0, messages=0, message_rooms=0)
+    with app.app_context():
+        usernames = [username for (username,) in db.session.query(User.username)]
+
+    print(f'{args.method}: {password_hasher.stored_method}, {args.clients} clients x {args.logins} logins\n')
+    print(f'{"workers":>7} {"logins/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"503s":>5} {"health p95 ms":>14}')
+    for workers in [int(n) for n in args.workers.split(',')]:
+        password_hasher.configure(workers=workers, max_queue=args.queue)
+        result = run(app, usernames, SEED_PASSWORD, args.clients, args.logins)
+        print(f'{workers:>7} {result["logins_per_second"]:>9.1f} {result["login_p50_ms"]:>8.1f} '
+              f'{result["login_p95_ms"]:>8.1f} {result["rejected"]:>5} {result["health_p95_ms"]:>14.1f}')
+
+    if workdir:
+        print(f'\nDatabase kept at {workdir}')
+
+if __name__ == '__main__':
+    sys.exit(main())
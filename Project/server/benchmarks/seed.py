@@ -0,0 +1,118 @@
+"""
+Synthetic data for the backend benchmarks
+Import after DATABASE_URL points at the database to fill, since app.py reads
+it at import time.
+"""
+
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+from app import app, db, User, Skill, UserSkill, Message, MeetingRoom
+
+# Every seeded user can log in with this password
+SEED_PASSWORD = 'benchmark-password'
+
+CATEGORIES = ['Technology', 'Life Skills', 'Hobbies', 'Music', 'Creative', 'Languages', 'Crafts', 'Games', 'Academics']
+
+BIO_WORDS = ['gardening', 'history', 'piano', 'cooking', 'chess', 'retired', 'teacher', 'student',
+             'engineer', 'nurse', 'photography', 'knitting', 'spanish', 'python', 'baking', 'travel']
+
+def _insert(model, rows, batch_size=5000):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(model.__table__.insert(), rows[start:start + batch_size])
+
+def seed_database(users=1000, skills=50, skills_per_user=5, rooms=100, messages=20000,
+                  message_rooms=50, seed=0):
+    """
+    Fill an empty database created by db.create_all() and return the seeded ids
+    as {'users': [...], 'skills': [...], 'rooms': [...], 'message_rooms': [...]}
+    """
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(SEED_PASSWORD, app.config['PASSWORD_HASH_METHOD'])
+
+    with app.app_context():
+        skill_rows = [{
+            'id': str(uuid.UUID(int=rnd.getrandbits(128))),
+            'name': f'Skill {i}',
+            'category': CATEGORIES[i % len(CATEGORIES)],
+            'description': f'Synthetic skill {i}',
+            'icon': 'star',
+            'created_at': now
+        } for i in range(skills)]
+
+        user_rows = [{
+            'id': str(uuid.UUID(int=rnd.getrandbits(128))),
+            'username': f'user{i}',
+            'email': f'user{i}@example.com',
+            'password_hash': password_hash,
+            'first_name': f'First{i}',
+            'last_name': f'Last{i}',
+            'age': rnd.choice([rnd.randint(14, 25), rnd.randint(60, 90)]),
+            'bio': ' '.join(rnd.sample(BIO_WORDS, 4)),
+            'profile_image_url': '',
+            'points': rnd.randint(0, 5000),
+            'level': 1,
+            'created_at': now - timedelta(days=rnd.randint(0, 365)),
+            'updated_at': now
+        } for i in range(users)]
+        for row in user_rows:
+            row['level'] = row['points'] // 100 + 1
+
+        user_skill_rows = []
+        for user in user_rows:
+            for skill in rnd.sample(skill_rows, min(skills_per_user, len(skill_rows))):
+                user_skill_rows.append({
+                    'id': str(uuid.UUID(int=rnd.getrandbits(128))),
+                    'user_id': user['id'],
+                    'skill_id': skill['id'],
+                    'proficiency_level': rnd.randint(1, 10),
+                    'want_to_teach': rnd.random() < 0.5,
+                    'want_to_learn': rnd.random() < 0.5,
+                    'years_experience': rnd.randint(0, 10),
+                    'created_at': now
+                })
+
+        room_rows = [{
+            'id': str(uuid.UUID(int=rnd.getrandbits(128))),
+            'name': f'Room {i}',
+            'description': f'Synthetic room {i}',
+            'creator_id': rnd.choice(user_rows)['id'],
+            'zoom_meeting_id': f'bridgen-{i:08x}',
+            'zoom_join_url': f'https://zoom.us/j/bridgen-{i:08x}',
+            'scheduled_time': now + timedelta(hours=rnd.randint(-48, 240)),
+            'max_participants': rnd.choice([2, 5, 10, 20]),
+            'is_active': rnd.random() < 0.8,
+            'created_at': now - timedelta(minutes=rnd.randint(0, 60 * 24 * 30))
+        } for i in range(rooms)]
+
+        chat_rooms = [f'room-{i}' for i in range(message_rooms)]
+        message_rows = [{
+            'id': str(uuid.UUID(int=rnd.getrandbits(128))),
+            'sender_id': rnd.choice(user_rows)['id'],
+            'room_id': rnd.choice(chat_rooms),
+            'content': ' '.join(rnd.sample(BIO_WORDS, 6)),
+            'message_type': 'text',
+            'created_at': now - timedelta(seconds=rnd.randint(0, 60 * 60 * 24 * 90))
+        } for _ in range(messages)]
+
+        _insert(Skill, skill_rows)
+        _insert(User, user_rows)
+        _insert(UserSkill, user_skill_rows)
+        _insert(MeetingRoom, room_rows)
+        _insert(Message, message_rows)
+        db.session.commit()
+
+    return {
+        'users': [row['id'] for row in user_rows],
+        'skills': [row['id'] for row in skill_rows],
+        'rooms': [row['id'] for row in room_rows],
+        'message_rooms': chat_rooms
+    }
@@ -0,0 +1,110 @@
+"""
+In-process publish/subscribe for chat rooms
+
+send_message() publishes each message once; the hub encodes it as a
+server-sent event a single time and fans the bytes out to every subscriber
+of the room. It holds nothing per room beyond the current subscribers: a
+client reconnecting with Last-Event-ID catches up from the database.
+
+Subscribers live in this process only. With several workers, chat_relay.py
+publishes the messages other workers accepted once they are committed; the
+hub ignores ids it published within the last dedupe_seconds, so each
+subscriber gets a message once.
+
+Every subscriber is a streaming response holding a request thread for as
+long as the client stays connected. subscribe() raises StreamsFull once
+SSE_MAX_STREAMS are open in this process, so the streams can never take all
+of the threads and the route answers 503 instead.
+"""
+
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from app import app
+
+class StreamsFull(Exception):
+    pass
+
+def encode_event(message):
+    """A chat message as a server-sent event"""
+    return f"id: {message['id']}\nevent: message\ndata: {json.dumps(message)}\n\n"
+
+def encode_reset(reason):
+    """An event telling the client it cannot resume where it left off and should reload the room"""
+    return f"event: reset\ndata: {json.dumps({'reason': reason})}\n\n"
+
+class Subscription:
+    def __init__(self, room_id, max_pending):
+        self.room_id = room_id
+        self.events = queue.Queue(maxsize=max_pending)
+        # Set when the subscriber fell too far behind; it should reconnect and resume
+        self.overflowed = False
+
+class RoomHub:
+    def __init__(self, max_pending=1000, dedupe_seconds=60.0):
+        self.max_pending = max_pending
+        self.dedupe_seconds = dedupe_seconds
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._streams = 0
+        # message id -> time published, oldest first, across all rooms
+        self._published = OrderedDict()
+
+    def publish(self, room_id, message):
+        """Send message to the room's subscribers; False if it was already published"""
+        event = encode_event(message)
+        now = time.monotonic()
+        with self._lock:
+            published = self._published
+            while published and next(iter(published.values())) < now - self.dedupe_seconds:
+                published.popitem(last=False)
+            if message['id'] in published:
+                return False
+            published[message['id']] = now
+            subscribers = list(self._subscribers.get(room_id, ()))
+
+        for subscription in subscribers:
+            try:
+                subscription.events.put_nowait((message['id'], event))
+            except queue.Full:
+                subscription.overflowed = True
+                self.unsubscribe(subscription)
+        return True
+
+    def subscribe(self, room_id):
+        """Register a subscriber; it receives (id, event) pairs published from now on"""
+        subscription = Subscription(room_id, self.max_pending)
+        with self._lock:
+            if self._streams >= app.config['SSE_MAX_STREAMS']:
+                raise StreamsFull('Too many open chat streams, try again shortly')
+            self._streams += 1
+            self._subscribers[room_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.room_id)
+            if subscribers is not None and subscription in subscribers:
+                self._streams -= 1
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.room_id]
+
+    def rooms(self):
+        """Rooms with at least one subscriber"""
+        with self._lock:
+            return list(self._subscribers)
+
+    def stream_count(self):
+        """Subscribers across all rooms"""
+        with self._lock:
+            return self._streams
+
+    def subscriber_count(self, room_id):
+        with self._lock:
+            return len(self._subscribers.get(room_id, ()))
+
+room_hub = RoomHub()
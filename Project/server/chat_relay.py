@@ -0,0 +1,90 @@
+"""
+Chat delivery across worker processes
+
+RoomHub only fans a message out inside the process that accepted it. So
+that subscribers on every worker see every message, a ChatRelay thread in
+each worker polls the messages table every CHAT_RELAY_INTERVAL seconds for
+the rooms with subscribers here, and publishes what it finds; the hub
+drops the messages it already published.
+
+Write-behind rows are committed a little after their created_at, so every
+poll reads back the last CHAT_RELAY_LOOKBACK seconds instead of resuming
+from the newest row it saw. Messages sent through another worker reach
+subscribers here up to one interval, plus that worker's flush delay, later
+than those sent through this one.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from app import app, db, Message
+from chat_hub import room_hub
+from serializers import message_options, serialize_message
+
+logger = logging.getLogger(__name__)
+
+class ChatRelay:
+    def __init__(self, flask_app, hub, interval=0.5, lookback=10.0, limit=2000):
+        self.app = flask_app
+        self.hub = hub
+        self.interval = interval
+        self.lookback = lookback
+        self.limit = limit
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='chat-relay', daemon=True)
+            self._thread.start()
+        return self
+
+    def poll(self):
+        """Publish the recent messages of subscribed rooms; returns how many were new here"""
+        rooms = self.hub.rooms()
+        if not rooms:
+            return 0
+
+        since = datetime.utcnow() - timedelta(seconds=self.lookback)
+        with self.app.app_context():
+            try:
+                # Newest first, so a burst beyond limit costs the oldest rows rather than the live ones
+                rows = Message.query.options(*message_options())\
+                    .filter(Message.room_id.in_(rooms), Message.created_at > since)\
+                    .order_by(Message.created_at.desc(), Message.id.desc()).limit(self.limit).all()
+                messages = [serialize_message(message) for message in reversed(rows)]
+            except Exception:
+                logger.exception('Polling messages of %d rooms failed', len(rooms))
+                return 0
+            finally:
+                db.session.remove()
+
+        return sum(self.hub.publish(message['room_id'], message) for message in messages)
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.poll()
+
+_relay = None
+_relay_lock = threading.Lock()
+
+def chat_relay():
+    """The shared relay, started on first use, or None when CHAT_RELAY_INTERVAL is 0"""
+    global _relay
+    if app.config['CHAT_RELAY_INTERVAL'] <= 0:
+        return None
+    if _relay is None:
+        with _relay_lock:
+            if _relay is None:
+                _relay = ChatRelay(
+                    app, room_hub,
+                    interval=app.config['CHAT_RELAY_INTERVAL'],
+                    lookback=app.config['CHAT_RELAY_LOOKBACK']
+                ).start()
+    return _relay
@@ -0,0 +1,63 @@
+"""
+Read-replica routing for the SQLAlchemy session
+
+Replica URLs from DATABASE_REPLICA_URLS become binds named replica_0,
+replica_1, ... Requests to views decorated with @read_only send their
+queries to one of those replicas. Everything else goes to the primary:
+other views, anything that writes or flushes, and work outside a request
+such as background threads and CLI scripts.
+
+Replicas lag behind the primary, so a client that wrote recently keeps
+reading from the primary for REPLICA_STICKY_SECONDS; the time of its last
+write is kept in the Flask session.
+"""
+
+import random
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Delete, Insert, Update
+
+REPLICA_PREFIX = 'replica_'
+
+def replica_binds(urls):
+    """SQLALCHEMY_BINDS entries for a comma-separated list of replica URLs"""
+    urls = [url.strip() for url in (urls or '').split(',') if url.strip()]
+    return {f'{REPLICA_PREFIX}{n}': url for n, url in enumerate(urls)}
+
+def read_only(view):
+    """Serve a view from a replica unless the client wrote recently"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        last_write = session.get('last_write_at', 0)
+        g.db_use_replica = time.time() - last_write > current_app.config['REPLICA_STICKY_SECONDS']
+        return view(*args, **kwargs)
+    return wrapper
+
+def remember_writes(response):
+    """after_request hook: start read-after-write stickiness for clients that wrote"""
+    if g.get('db_wrote'):
+        session['last_write_at'] = time.time()
+    return response
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            writing = self._flushing or isinstance(clause, (Insert, Update, Delete))
+            if writing:
+                g.db_wrote = True
+            elif g.get('db_use_replica') and not g.get('db_wrote'):
+                replica = self._replica()
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica(self):
+        # One replica per session, so a request sees a single consistent snapshot
+        if 'replica' not in self.info:
+            replicas = [engine for key, engine in self._db.engines.items()
+                        if key is not None and key.startswith(REPLICA_PREFIX)]
+            self.info['replica'] = random.choice(replicas) if replicas else None
+        return self.info['replica']
@@ -0,0 +1,37 @@
+"""
+Production serving for the backend API
+
+    gunicorn wsgi:app       (run from this directory)
+
+The app is imported and the schema migrated once in the master, then the
+workers fork from it and share its memory copy-on-write. gc.freeze() keeps
+the garbage collector in the workers from touching, and thereby copying,
+the objects that exist at fork time. Connection pools are not shared: each
+worker drops the connections it inherited and opens its own.
+
+Background threads (message writer, match store, chat relay) start lazily
+on first use, so they only ever run in the workers.
+"""
+
+import gc
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5001')
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+# Chat streams hold a thread each for as long as the client is connected, so
+# at most SSE_MAX_STREAMS (a quarter of these by default) are served per
+# worker. Raise this to serve more listeners: a thread waiting on a stream
+# costs little more than its stack.
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+preload_app = True
+
+def when_ready(server):
+    gc.collect()
+    gc.freeze()
+
+def post_fork(server, worker):
+    from app import app, db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,155 @@
+"""
+Conditional-GET caching for rarely changing endpoints
+
+Each cached resource has a key ('skills', 'meeting-rooms', 'user:<id>') with
+a version counter in the cache_versions table, which the write routes bump
+in the same transaction as their change. Every request reads the key's
+version (a primary-key lookup) and a cached body is served only if it was
+rendered at that version. Its ETag is a hash of the body, so If-None-Match
+is answered with 304 without rendering, and every worker gives the same
+bytes the same tag. Bodies are kept in an LRU bounded by
+HTTP_CACHE_MAX_BYTES; 0 disables the cache.
+
+Since the counter is shared, a write handled by any worker is seen by all of
+them on their next request. The version is read before the view runs and
+through the same session, so with read replicas both come from the same
+replica and a body is never stored under a version newer than the data it
+was rendered from. HTTP_CACHE_TTL only bounds how long a body is kept.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, request
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db, CacheVersion
+
+_versions = CacheVersion.__table__
+
+class ResponseCache:
+    def __init__(self, max_bytes=16 * 1024 * 1024, ttl=60):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (version, etag, body, stored_at)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._stats = {'hits': 0, 'not_modified': 0, 'misses': 0, 'evictions': 0}
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def version(self, key):
+        return db.session.execute(select(_versions.c.version).where(_versions.c.key == key)).scalar() or 0
+
+    def bump(self, *keys):
+        """Invalidate keys as part of the current transaction; the caller commits"""
+        for key in keys:
+            bumped = db.session.execute(
+                update(_versions).where(_versions.c.key == key).values(version=_versions.c.version + 1)
+            ).rowcount
+            if not bumped:
+                try:
+                    with db.session.begin_nested():
+                        db.session.execute(insert(_versions).values(key=key, version=1))
+                except IntegrityError:
+                    # Another transaction created the key first
+                    db.session.execute(
+                        update(_versions).where(_versions.c.key == key).values(version=_versions.c.version + 1)
+                    )
+            with self._lock:
+                self._discard(key)
+
+    def get(self, key, version):
+        """The (etag, body) for key rendered at version, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_version, etag, body, stored_at = entry
+            if stored_version != version or time.monotonic() - stored_at > self.ttl:
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return etag, body
+
+    def put(self, key, version, body):
+        """Store body rendered at version; returns its ETag"""
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        if len(body) > self.max_bytes:
+            return etag
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (version, etag, body, time.monotonic())
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._stats['evictions'] += 1
+        return etag
+
+    def count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[2])
+
+response_cache = ResponseCache(
+    max_bytes=app.config['HTTP_CACHE_MAX_BYTES'],
+    ttl=app.config['HTTP_CACHE_TTL']
+)
+
+def _respond(etag, body):
+    if request.if_none_match.contains(etag):
+        response_cache.count('not_modified')
+        response = Response(status=304)
+    else:
+        response = Response(body, status=200, mimetype='application/json')
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate before reusing it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def conditional_get(key_for):
+    """
+    Cache a JSON GET view under key_for(**view_args). Only 200 responses are
+    stored; anything else passes through untouched. Goes below @read_only,
+    so the version is read from wherever the view reads.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not response_cache.enabled:
+                return view(*args, **kwargs)
+
+            key = key_for(**kwargs)
+            version = response_cache.version(key)
+            cached = response_cache.get(key, version)
+            if cached is not None:
+                response_cache.count('hits')
+                return _respond(*cached)
+
+            response_cache.count('misses')
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            return _respond(response_cache.put(key, version, body), body)
+        return wrapper
+    return decorator
+
+def user_key(user_id):
+    return f'user:{user_id}'
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Bulk import of survey exports (bridges.csv) into users, skills and user_skills
+
+    python import_survey.py ../../bridges.csv [--batch-size 5000] [--restart]
+
+Rows are inserted in batches with executemany, one transaction per batch,
+instead of one request and several commits per participant. Ids are derived
+from the row contents, and every insert skips rows that already exist, so
+running the import twice does not duplicate anyone. Progress is checkpointed
+in survey_imports in the same transaction as each batch; an interrupted
+import picks up after the last committed batch.
+
+Imported users get an unusable password hash and have to reset it before
+logging in. Survey emails are not unique, so repeats of an address within a
+file are stored with a +tag.
+"""
+
+import argparse
+import csv
+import hashlib
+import logging
+import re
+import sys
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import app, db, create_tables, User, Skill, UserSkill
+from user_search import index_users
+
+logger = logging.getLogger(__name__)
+
+# Namespace for ids derived from survey contents
+SURVEY_NAMESPACE = uuid.UUID('6f1c2d4e-8a3b-5c7d-9e0f-1a2b3c4d5e6f')
+
+# No werkzeug hash has this form, so check_password_hash() always fails
+UNUSABLE_PASSWORD = '!survey-import'
+
+# Ages recorded for the survey's two brackets
+ELDER_AGE = 60
+YOUTH_AGE = 14
+
+ACADEMIC_CATEGORY = 'Academics'
+INTEREST_CATEGORY = 'Interests'
+
+_metadata = MetaData()
+
+survey_imports = Table(
+    'survey_imports', _metadata,
+    Column('source', String(64), primary_key=True),
+    Column('path', String(255)),
+    Column('rows_done', Integer, nullable=False),
+    Column('updated_at', DateTime, nullable=False)
+)
+
+# Positions of the answers in a survey export; several headers repeat
+TIMESTAMP, NAME, EMAIL, BIO, GROUP, BRACKET = 0, 1, 2, 3, 4, 5
+YOUTH_TEACH, YOUTH_LEARN, YOUTH_TUTORED, YOUTH_SUBJECTS = 6, 7, 8, 9
+ELDER_TEACH, ELDER_LEARN, ELDER_TUTORS, ELDER_SUBJECTS = 10, 11, 12, 13
+
+def _id(*parts):
+    return str(uuid.uuid5(SURVEY_NAMESPACE, '\x1f'.join(parts)))
+
+def _split(answer):
+    return [item.strip() for item in answer.split(';') if item.strip()]
+
+def _timestamp(answer):
+    # e.g. "2025/09/07 5:00:49 PM MDT"; the zone name is dropped
+    try:
+        return datetime.strptime(answer.strip().rsplit(' ', 1)[0], '%Y/%m/%d %I:%M:%S %p')
+    except ValueError:
+        return datetime.utcnow()
+
+def _username(name, user_id):
+    slug = re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')[:60] or 'participant'
+    return f'{slug}-{user_id[:13].replace("-", "")}'
+
+def _email(answer, user_id, seen_emails):
+    email = answer.strip().lower() or f'{user_id}@survey.invalid'
+    if email in seen_emails:
+        local, _, domain = email.partition('@')
+        email = f'{local}+{user_id[:13].replace("-", "")}@{domain}'
+    seen_emails.add(email)
+    return email
+
+def parse_row(row, seen_emails):
+    """A survey row as (user, {skill name: (category, teach, learn)}), or None if it is blank"""
+    row = row + [''] * (ELDER_SUBJECTS + 1 - len(row))
+    name = row[NAME].strip()
+    if not name:
+        return None
+
+    user_id = _id(row[TIMESTAMP].strip(), name, row[EMAIL].strip().lower())
+    elder = row[BRACKET].strip().lower().startswith('elder')
+    created_at = _timestamp(row[TIMESTAMP])
+    user = {
+        'id': user_id,
+        'username': _username(name, user_id),
+        'email': _email(row[EMAIL], user_id, seen_emails),
+        'password_hash': UNUSABLE_PASSWORD,
+        'first_name': name[:50],
+        'last_name': '',
+        'age': ELDER_AGE if elder else YOUTH_AGE,
+        'bio': row[BIO].strip(),
+        'profile_image_url': '',
+        'points': 0,
+        'level': 1,
+        'created_at': created_at,
+        'updated_at': created_at
+    }
+
+    if elder:
+        teach, learn = _split(row[ELDER_TEACH]), _split(row[ELDER_LEARN])
+        subjects = _split(row[ELDER_SUBJECTS]) if row[ELDER_TUTORS].strip().lower() == 'yes' else []
+        subject_teach, subject_learn = True, False
+    else:
+        teach, learn = _split(row[YOUTH_TEACH]), _split(row[YOUTH_LEARN])
+        subjects = _split(row[YOUTH_SUBJECTS]) if row[YOUTH_TUTORED].strip().lower() == 'yes' else []
+        subject_teach, subject_learn = False, True
+
+    # One user_skills row per skill, however many answers mention it
+    skills = {}
+    def add(name, category, wants_teach, wants_learn):
+        _, teaches, learns = skills.get(name, (category, False, False))
+        skills[name] = (category, teaches or wants_teach, learns or wants_learn)
+
+    for skill in teach:
+        add(skill, INTEREST_CATEGORY, True, False)
+    for skill in learn:
+        add(skill, INTEREST_CATEGORY, False, True)
+    for subject in subjects:
+        add(subject, ACADEMIC_CATEGORY, subject_teach, subject_learn)
+
+    return user, skills
+
+def insert_ignoring_conflicts(conn, table, rows):
+    """executemany INSERT that skips rows violating a primary key or unique constraint"""
+    if not rows:
+        return
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        statement = postgresql.insert(table).on_conflict_do_nothing()
+    elif dialect == 'sqlite':
+        statement = sqlite.insert(table).on_conflict_do_nothing()
+    else:
+        raise RuntimeError(f'Survey import does not support {dialect}')
+    conn.execute(statement, rows)
+
+class SkillIds:
+    """Skill name -> id, creating skills the first time a batch mentions them"""
+
+    def __init__(self):
+        self._ids = {}
+
+    def resolve(self, conn, categories):
+        missing = [name for name in categories if name not in self._ids]
+        if not missing:
+            return self._ids
+
+        now = datetime.utcnow()
+        insert_ignoring_conflicts(conn, Skill.__table__, [{
+            'id': _id('skill', name),
+            'name': name,
+            'category': categories[name],
+            'description': '',
+            'icon': 'star',
+            'created_at': now
+        } for name in missing])
+        # Names that already existed keep their original ids
+        self._ids.update(conn.execute(select(Skill.name, Skill.id).where(Skill.name.in_(missing))).all())
+        return self._ids
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def import_batch(conn, parsed, skill_ids):
+    """Insert one batch; returns (users inserted or already present, user_skills rows attempted)"""
+    categories = {}
+    for _, skills in parsed:
+        for name, (category, _, _) in skills.items():
+            categories.setdefault(name, category)
+    ids = skill_ids.resolve(conn, categories)
+
+    users = [user for user, _ in parsed]
+    insert_ignoring_conflicts(conn, User.__table__, users)
+
+    # A user can be skipped because its username or email is already taken by
+    # someone else; only link skills to the ids that made it in
+    present = set(conn.execute(
+        select(User.id).where(User.id.in_([user['id'] for user in users]))
+    ).scalars())
+
+    user_skills = []
+    for user, skills in parsed:
+        if user['id'] not in present:
+            continue
+        for name, (_, teaches, learns) in skills.items():
+            skill_id = ids[name]
+            user_skills.append({
+                'id': _id('user_skill', user['id'], skill_id),
+                'user_id': user['id'],
+                'skill_id': skill_id,
+                'proficiency_level': 1,
+                'want_to_teach': teaches,
+                'want_to_learn': learns,
+                'years_experience': 0,
+                'created_at': user['created_at']
+            })
+    insert_ignoring_conflicts(conn, UserSkill.__table__, user_skills)
+    index_users(conn, present)
+
+    return len(present), len(user_skills)
+
+def import_survey(path, batch_size=5000, restart=False):
+    """Import a survey export, resuming from its checkpoint; returns a summary dict"""
+    source = file_digest(path)
+    engine = db.engine
+    survey_imports.create(engine, checkfirst=True)
+
+    with engine.begin() as conn:
+        if restart:
+            conn.execute(survey_imports.delete().where(survey_imports.c.source == source))
+        rows_done = conn.execute(
+            select(survey_imports.c.rows_done).where(survey_imports.c.source == source)
+        ).scalar() or 0
+
+    summary = {'source': source, 'resumed_at': rows_done, 'rows': rows_done,
+               'users': 0, 'user_skills': 0, 'skipped_users': 0}
+    skill_ids = SkillIds()
+    seen_emails = set()
+
+    def flush(parsed, rows_through):
+        with engine.begin() as conn:
+            users, user_skills = import_batch(conn, parsed, skill_ids)
+            values = {'path': path[-255:], 'rows_done': rows_through, 'updated_at': datetime.utcnow()}
+            updated = conn.execute(
+                survey_imports.update().where(survey_imports.c.source == source).values(**values)
+            ).rowcount
+            if not updated:
+                conn.execute(survey_imports.insert().values(source=source, **values))
+        summary['rows'] = rows_through
+        summary['users'] += users
+        summary['skipped_users'] += len(parsed) - users
+        summary['user_skills'] += user_skills
+        logger.info('Imported rows through %d', rows_through)
+
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # header
+
+        parsed = []
+        row_number = 0
+        for row_number, row in enumerate(reader, start=1):
+            # Rows before the checkpoint are still parsed so repeated emails
+            # are tagged the same way as in the interrupted run
+            result = parse_row(row, seen_emails)
+            if row_number <= rows_done or result is None:
+                continue
+            parsed.append(result)
+            if len(parsed) >= batch_size:
+                flush(parsed, row_number)
+                parsed = []
+
+        if parsed or row_number > rows_done:
+            flush(parsed, row_number)
+
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='Survey export (CSV)')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows per transaction')
+    parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the first row')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    create_tables()
+
+    start = time.perf_counter()
+    with app.app_context():
+        summary = import_survey(args.path, args.batch_size, args.restart)
+    elapsed = time.perf_counter() - start
+
+    print(f"{summary['rows']} rows (resumed at {summary['resumed_at']}): {summary['users']} users, "
+          f"{summary['user_skills']} user skills, {summary['skipped_users']} users skipped "
+          f"in {elapsed:.1f}s")
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Points accrual and the cached leaderboard
+
+award_points() adds points and recomputes the level in one UPDATE ...
+RETURNING, so concurrent awards never overwrite each other. The leaderboard
+keeps the top LEADERBOARD_SIZE users in memory, loaded once from the points
+index and updated on every award instead of rebuilt per request.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, update
+
+from app import app, db, User
+
+# Every 100 points is one level
+POINTS_PER_LEVEL = 100
+# Most points a single award may add
+MAX_POINTS_PER_AWARD = 1000
+
+def award_points(user_id, points):
+    """
+    Atomically add points to a user and return (username, points, level), or
+    None when there is no such user. Does not commit.
+    """
+    new_points = func.coalesce(User.points, 0) + points
+    statement = update(User).where(User.id == user_id).values(
+        points=new_points,
+        level=new_points // POINTS_PER_LEVEL + 1,
+        updated_at=datetime.utcnow()
+    ).returning(User.username, User.points, User.level)
+    return db.session.execute(statement, execution_options={'synchronize_session': False}).first()
+
+class Leaderboard:
+    """
+    Top users by points, best first. Reloaded after LEADERBOARD_TTL seconds
+    so awards made by other workers show up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = None
+        self._loaded_at = 0.0
+
+    @property
+    def size(self):
+        return app.config.get('LEADERBOARD_SIZE', 100)
+
+    def _expired(self):
+        ttl = app.config.get('LEADERBOARD_TTL', 60)
+        return self._entries is None or (ttl and time.monotonic() - self._loaded_at > ttl)
+
+    def _load(self):
+        rows = db.session.query(User.id, User.username, User.points, User.level)\
+            .order_by(User.points.desc(), User.id).limit(self.size).all()
+        self._entries = [
+            {'id': row.id, 'username': row.username, 'points': row.points or 0, 'level': row.level}
+            for row in rows
+        ]
+        self._loaded_at = time.monotonic()
+
+    def top(self, limit):
+        with self._lock:
+            if self._expired():
+                self._load()
+            return [dict(entry, rank=rank) for rank, entry in enumerate(self._entries[:limit], start=1)]
+
+    def record(self, user_id, username, points, level):
+        """Apply a user's new total; points only grow, so nobody else moves up"""
+        with self._lock:
+            if self._entries is None:
+                return
+            entries = [entry for entry in self._entries if entry['id'] != user_id]
+            if len(entries) < self.size or points >= entries[-1]['points']:
+                entries.append({'id': user_id, 'username': username, 'points': points, 'level': level})
+                entries.sort(key=lambda entry: (-entry['points'], entry['id']))
+                del entries[self.size:]
+            self._entries = entries
+
+leaderboard = Leaderboard()
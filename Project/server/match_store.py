@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Materialized skill matches
+
+skill_matches holds one scored row per (user, candidate user skill, match
+type), the same rows candidate_matches() computes, so /api/skill-matches
+reads a page of indexed rows instead of joining user_skills with itself on
+every call. Migration 0008 fills the table in one pass; after that only the
+users whose skills changed are re-scored, along with the rows in which they
+are someone else's candidate.
+
+The routes that change a user's skills call mark_stale() in the same
+transaction, which records the user in skill_match_dirty. Until their rows
+are re-scored, their matches come from the live query, whichever worker
+serves them, so people always see matches for their own latest skills;
+other users' lists catch up once the refresh lands. Every worker runs a
+materializer thread, but only the one holding the refresh lease in
+background_leases re-scores, SKILL_MATCH_REFRESH_DELAY seconds apart, and
+clears the marks it scored in the same transaction. After loading data
+outside the app (e.g. import_survey.py), rebuild the table:
+
+    python match_store.py --rebuild
+"""
+
+import argparse
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, delete, exists, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db, BackgroundLease, SkillMatch, SkillMatchDirty, UserSkill
+from skill_matching import find_skill_matches, rank_candidates, scored_pairs
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH_SIZE = 5000
+# Name of the background_leases row held by the process that re-scores
+REFRESH_LEASE = 'skill-match-refresh'
+
+_dirty = SkillMatchDirty.__table__
+_leases = BackgroundLease.__table__
+
+def stored_candidates(user_id):
+    """The stored matches of user_id, shaped like candidate_matches()"""
+    return select(
+        SkillMatch.user1_id,
+        SkillMatch.match_type,
+        SkillMatch.user_skill_id,
+        SkillMatch.user2_id.label('user_id'),
+        SkillMatch.skill_id,
+        UserSkill.proficiency_level,
+        UserSkill.years_experience,
+        SkillMatch.match_percentage
+    ).join(UserSkill, UserSkill.id == SkillMatch.user_skill_id)\
+        .where(SkillMatch.user1_id == user_id)\
+        .subquery('candidates')
+
+def _write_pairs(conn, pairs):
+    """Insert the rows of a scored_pairs() subquery in batches; returns the row count"""
+    now = datetime.utcnow()
+    written = 0
+    result = conn.execution_options(stream_results=True, yield_per=INSERT_BATCH_SIZE).execute(select(pairs))
+    for rows in result.partitions():
+        conn.execute(SkillMatch.__table__.insert(), [{
+            'id': str(uuid.uuid4()),
+            'user1_id': row.user1_id,
+            'user2_id': row.user_id,
+            'skill_id': row.skill_id,
+            'user_skill_id': row.user_skill_id,
+            'match_type': row.match_type,
+            'match_percentage': row.match_percentage,
+            'created_at': now
+        } for row in rows])
+        written += len(rows)
+    return written
+
+def _refresh_pairs(conn, user_ids):
+    """Re-score the rows of user_ids and the rows in which they are candidates"""
+    conn.execute(delete(SkillMatch).where(or_(
+        SkillMatch.user1_id.in_(user_ids),
+        SkillMatch.user2_id.in_(user_ids)
+    )))
+    # Their own matches, then theirs as other users' candidates;
+    # pairs between two refreshed users are already in the first set
+    written = _write_pairs(conn, scored_pairs(
+        lambda mine, other: [mine.user_id.in_(user_ids)]))
+    written += _write_pairs(conn, scored_pairs(
+        lambda mine, other: [other.user_id.in_(user_ids), mine.user_id.not_in(user_ids)]))
+    return written
+
+def build_matches(conn):
+    """Replace every stored match with a full scoring pass; returns the row count"""
+    # Marks committed from here on are for changes this pass may not see
+    conn.execute(delete(_dirty))
+    conn.execute(delete(SkillMatch))
+    return _write_pairs(conn, scored_pairs(lambda mine, other: []))
+
+def mark_stale(user_id):
+    """Record in the current transaction that user_id's skills changed; the caller commits"""
+    values = {'changes': _dirty.c.changes + 1, 'marked_at': datetime.utcnow()}
+    marked = db.session.execute(update(_dirty).where(_dirty.c.user_id == user_id).values(**values)).rowcount
+    if not marked:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(_dirty).values(user_id=user_id, changes=1, marked_at=datetime.utcnow()))
+        except IntegrityError:
+            # Another transaction marked them first
+            db.session.execute(update(_dirty).where(_dirty.c.user_id == user_id).values(**values))
+
+def is_stale(user_id):
+    """Whether user_id has skill changes their stored matches do not reflect yet"""
+    return db.session.execute(select(exists().where(_dirty.c.user_id == user_id))).scalar()
+
+class SkillMatchMaterializer:
+    def __init__(self, flask_app, refresh_delay=0.5, lease_seconds=60, batch_size=500):
+        self.app = flask_app
+        self.refresh_delay = refresh_delay
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.holder = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='skill-match-store', daemon=True)
+                self._thread.start()
+        return self
+
+    def rebuild(self):
+        """Replace every stored match with a full scoring pass, in one transaction"""
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                written = build_matches(conn)
+        logger.info('Materialized %d skill matches', written)
+        return written
+
+    def refresh(self, user_ids):
+        """Re-score the rows of user_ids and the rows in which they are candidates"""
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                return _refresh_pairs(conn, list(user_ids))
+
+    def refresh_stale(self):
+        """
+        Re-score up to batch_size users marked stale and clear their marks;
+        returns how many, or None when another process holds the lease
+        """
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                if not self._hold_lease(conn):
+                    return None
+            with db.engine.begin() as conn:
+                marks = conn.execute(
+                    select(_dirty.c.user_id, _dirty.c.changes).order_by(_dirty.c.marked_at).limit(self.batch_size)
+                ).all()
+                if not marks:
+                    return 0
+                _refresh_pairs(conn, [mark.user_id for mark in marks])
+                # A change marked while this ran bumped changes and keeps its mark
+                conn.execute(
+                    delete(_dirty).where(_dirty.c.user_id == bindparam('marked_user'),
+                                         _dirty.c.changes == bindparam('seen_changes')),
+                    [{'marked_user': mark.user_id, 'seen_changes': mark.changes} for mark in marks]
+                )
+        return len(marks)
+
+    def _hold_lease(self, conn):
+        """Take or renew the refresh lease unless another process holds it"""
+        now = datetime.utcnow()
+        return conn.execute(
+            update(_leases)
+            .where(_leases.c.name == REFRESH_LEASE,
+                   or_(_leases.c.holder == self.holder, _leases.c.expires_at.is_(None), _leases.c.expires_at < now))
+            .values(holder=self.holder, expires_at=now + timedelta(seconds=self.lease_seconds))
+        ).rowcount > 0
+
+    def _run(self):
+        while True:
+            try:
+                refreshed = self.refresh_stale()
+            except Exception:
+                logger.exception('Refreshing stale skill matches failed; retrying')
+                refreshed = 0
+            if refreshed is None:
+                # Take over within a third of a lease once the holder's runs out
+                time.sleep(self.lease_seconds / 3)
+            elif refreshed < self.batch_size:
+                time.sleep(self.refresh_delay)
+
+_materializer = None
+_materializer_lock = threading.Lock()
+
+def match_materializer():
+    """The shared materializer, started on first use, or None when the store is disabled"""
+    global _materializer
+    if not app.config.get('SKILL_MATCH_STORE'):
+        return None
+    if _materializer is None:
+        with _materializer_lock:
+            if _materializer is None:
+                _materializer = SkillMatchMaterializer(
+                    app, refresh_delay=app.config['SKILL_MATCH_REFRESH_DELAY']
+                ).start()
+    return _materializer
+
+def load_skill_matches(user_id, limit=None, cursor=None):
+    """find_skill_matches() served from the store whenever it is current for user_id"""
+    if match_materializer() and not is_stale(user_id):
+        return rank_candidates(stored_candidates(user_id), limit, cursor)
+    return find_skill_matches(user_id, limit, cursor)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rebuild', action='store_true', help='Re-score every match')
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        return 1
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    start = time.perf_counter()
+    written = SkillMatchMaterializer(app).rebuild()
+    print(f'{written} skill matches in {time.perf_counter() - start:.1f}s')
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Archival of old chat messages
+
+    python message_archive.py [--older-than-days 30] [--segment-size 500]
+
+Moves messages older than MESSAGE_ARCHIVE_AFTER_DAYS out of the messages
+table into message_archive_segments. Each segment holds up to
+MESSAGE_ARCHIVE_SEGMENT_SIZE consecutive messages of one room as
+zlib-compressed JSON, next to the (created_at, id) range it covers, so the
+hot table and its indexes only hold recent chat. Each segment is written
+and its messages deleted in one transaction, so an interrupted run loses
+nothing and the next run carries on.
+
+load_room_page() reads through to the segments once a page goes past the
+oldest hot message; archived_messages_before() does that part. Most rooms
+never had anything archived, so it first asks archived_rooms, a per-process
+set of the rooms that have segments, reloaded from the segment index every
+MESSAGE_ARCHIVE_ROOMS_TTL seconds. Segments are never deleted, so a room in
+the set stays there; a room archived for the first time is found once the
+set is next reloaded.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, func, or_, select
+
+from app import app, db, Message, MessageArchiveSegment, User
+from serializers import MessageDTO, UserRefDTO
+
+logger = logging.getLogger(__name__)
+
+# Segments fetched per query while reading back through the archive
+READ_BATCH = 4
+
+def encode_segment(messages):
+    rows = [[m.id, m.sender_id, m.content, m.message_type, m.created_at.isoformat()] for m in messages]
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode('utf-8'))
+
+def decode_segment(payload):
+    """(id, sender_id, content, message_type, created_at) tuples, oldest first"""
+    return [(message_id, sender_id, content, message_type, datetime.fromisoformat(created_at))
+            for message_id, sender_id, content, message_type, created_at
+            in json.loads(zlib.decompress(payload))]
+
+def archive_messages(older_than, segment_size=500):
+    """Archive every message created before older_than; returns (messages, segments) archived"""
+    archived = segments = 0
+    rooms = db.session.execute(
+        select(Message.room_id).where(Message.created_at < older_than).group_by(Message.room_id)
+    ).scalars().all()
+
+    for room_id in rooms:
+        while True:
+            batch = db.session.execute(
+                select(Message.id, Message.sender_id, Message.content, Message.message_type, Message.created_at)
+                .where(Message.room_id == room_id, Message.created_at < older_than)
+                .order_by(Message.created_at, Message.id)
+                .limit(segment_size)
+            ).all()
+            if not batch:
+                break
+
+            first, last = batch[0], batch[-1]
+            db.session.add(MessageArchiveSegment(
+                room_id=room_id,
+                first_created_at=first.created_at,
+                first_message_id=first.id,
+                last_created_at=last.created_at,
+                last_message_id=last.id,
+                message_count=len(batch),
+                payload=encode_segment(batch)
+            ))
+            db.session.execute(delete(Message).where(Message.id.in_([m.id for m in batch])))
+            db.session.commit()
+
+            archived += len(batch)
+            segments += 1
+            if len(batch) < segment_size:
+                break
+        logger.info('Archived room %s', room_id)
+
+    return archived, segments
+
+def archived_messages_before(room_id, created_at=None, message_id=None, limit=50):
+    """
+    Up to limit serialized archived messages of the room older than
+    (created_at, message_id), or the newest archived ones when created_at is
+    None, returned newest first
+    """
+    segments = select(MessageArchiveSegment.id, MessageArchiveSegment.payload)\
+        .where(MessageArchiveSegment.room_id == room_id)\
+        .order_by(MessageArchiveSegment.last_created_at.desc(), MessageArchiveSegment.last_message_id.desc())
+    if created_at is not None:
+        # Segments that start before the cursor hold at least one older message
+        segments = segments.where(or_(
+            MessageArchiveSegment.first_created_at < created_at,
+            and_(MessageArchiveSegment.first_created_at == created_at,
+                 MessageArchiveSegment.first_message_id < message_id)
+        ))
+
+    rows = []
+    offset = 0
+    while len(rows) < limit:
+        payloads = db.session.execute(segments.offset(offset).limit(READ_BATCH)).all()
+        if not payloads:
+            break
+        offset += len(payloads)
+        for segment in payloads:
+            for row in reversed(decode_segment(segment.payload)):
+                if created_at is None or (row[4], row[0]) < (created_at, message_id):
+                    rows.append(row)
+                    if len(rows) == limit:
+                        break
+            if len(rows) == limit:
+                break
+
+    sender_ids = {row[1] for row in rows}
+    usernames = dict(db.session.execute(
+        select(User.id, User.username).where(User.id.in_(sender_ids))
+    ).all()) if sender_ids else {}
+
+    return [MessageDTO(
+        message_id,
+        UserRefDTO(sender_id, usernames[sender_id]) if sender_id in usernames else None,
+        room_id, content, message_type, created
+    ).to_dict() for message_id, sender_id, content, message_type, created in rows]
+
+class ArchivedRooms:
+    """Ids of the rooms with archive segments, reloaded after MESSAGE_ARCHIVE_ROOMS_TTL seconds"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms = None
+        self._loaded_at = 0.0
+
+    def _expired(self):
+        ttl = app.config.get('MESSAGE_ARCHIVE_ROOMS_TTL', 60)
+        return self._rooms is None or time.monotonic() - self._loaded_at > ttl
+
+    def refresh(self):
+        # Answered from the leading column of ix_message_archive_room_last
+        rooms = set(db.session.execute(select(MessageArchiveSegment.room_id).distinct()).scalars())
+        with self._lock:
+            self._rooms = rooms
+            self._loaded_at = time.monotonic()
+
+    def __contains__(self, room_id):
+        with self._lock:
+            if self._rooms is not None and room_id in self._rooms:
+                return True
+            expired = self._expired()
+        if expired:
+            self.refresh()
+        with self._lock:
+            return room_id in self._rooms
+
+archived_rooms = ArchivedRooms()
+
+def archive_summary():
+    """Per-room segment counts, archived messages and covered time range"""
+    rows = db.session.execute(select(
+        MessageArchiveSegment.room_id,
+        func.count(),
+        func.sum(MessageArchiveSegment.message_count),
+        func.min(MessageArchiveSegment.first_created_at),
+        func.max(MessageArchiveSegment.last_created_at),
+        func.sum(func.length(MessageArchiveSegment.payload))
+    ).group_by(MessageArchiveSegment.room_id)).all()
+    return [{
+        'room_id': room_id,
+        'segments': segments,
+        'messages': messages,
+        'oldest': oldest.isoformat(),
+        'newest': newest.isoformat(),
+        'compressed_bytes': compressed
+    } for room_id, segments, messages, oldest, newest, compressed in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--older-than-days', type=int, default=app.config['MESSAGE_ARCHIVE_AFTER_DAYS'])
+    parser.add_argument('--segment-size', type=int, default=app.config['MESSAGE_ARCHIVE_SEGMENT_SIZE'])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    start = time.perf_counter()
+    with app.app_context():
+        older_than = datetime.utcnow() - timedelta(days=args.older_than_days)
+        archived, segments = archive_messages(older_than, args.segment_size)
+    print(f'Archived {archived} messages into {segments} segments in {time.perf_counter() - start:.1f}s')
+
+if __name__ == '__main__':
+    sys.exit(main())
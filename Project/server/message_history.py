@@ -0,0 +1,103 @@
+"""
+Room message history with keyset pagination
+Pages walk back from the newest message on (created_at, id), so every page
+is one index range scan with the sender joined in, however deep the client
+has scrolled, and no COUNT(*) is needed. Messages moved out by
+message_archive.py are older than everything still in the table, so once a
+page runs past the oldest hot message it continues from the archive
+segments with the same cursor, for rooms that have any.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from app import db, Message, User
+from message_archive import archived_messages_before, archived_rooms
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+from serializers import message_options, serialize_message, MessageDTO, UserRefDTO
+
+def _cursor_key(cursor):
+    created_at, message_id = decode_cursor(cursor, 2)
+    try:
+        return datetime.fromisoformat(created_at), message_id
+    except (TypeError, ValueError):
+        raise InvalidCursor('Invalid cursor')
+
+def _before(created_at, message_id):
+    return or_(
+        Message.created_at < created_at,
+        and_(Message.created_at == created_at, Message.id < message_id)
+    )
+
+def load_room_page(room_id, limit, cursor=None):
+    """
+    Up to limit messages older than cursor (newest first from the top of the
+    room when cursor is None), returned oldest first with the cursor for the
+    next, older page or None when there is none
+    """
+    created_at = message_id = None
+    query = Message.query.options(*message_options()).filter(Message.room_id == room_id)
+    if cursor:
+        created_at, message_id = _cursor_key(cursor)
+        query = query.filter(_before(created_at, message_id))
+
+    # One extra row tells us whether there is an older page
+    rows = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1).all()
+    messages = [serialize_message(message) for message in rows]
+
+    if len(rows) <= limit and room_id in archived_rooms:
+        # The hot table ran out before the page did
+        if rows:
+            created_at, message_id = rows[-1].created_at, rows[-1].id
+        messages += archived_messages_before(room_id, created_at, message_id, limit + 1 - len(rows))
+
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        oldest = messages[-1]
+        next_cursor = encode_cursor(oldest['created_at'], oldest['id'])
+
+    return messages[::-1], next_cursor
+
+def serialize_pending(rows):
+    """Message rows still queued in the write-behind writer, serialized like stored ones"""
+    if not rows:
+        return []
+    sender_ids = {row['sender_id'] for row in rows}
+    usernames = dict(db.session.query(User.id, User.username).filter(User.id.in_(sender_ids)))
+    return [
+        MessageDTO(row['id'], UserRefDTO(row['sender_id'], usernames.get(row['sender_id'])), row['room_id'],
+                   row['content'], row['message_type'], row['created_at']).to_dict()
+        for row in rows
+    ]
+
+def load_messages_after(room_id, message_id, limit, pending=()):
+    """
+    Up to limit messages sent after message_id, oldest first, or None if it
+    is not a message of the room (or only in the archive) and there is no
+    position to resume from. pending are serialized messages accepted by the write-behind
+    writer that may not be in the table yet; they are merged in, and
+    message_id may be one of them.
+    """
+    pending = {message['id']: message for message in pending}
+    anchor = db.session.query(Message.created_at).filter_by(id=message_id, room_id=room_id).scalar()
+    if anchor is None and message_id in pending:
+        anchor = datetime.fromisoformat(pending[message_id]['created_at'])
+    if anchor is None:
+        return None
+
+    rows = Message.query.options(*message_options()).filter(
+        Message.room_id == room_id,
+        or_(Message.created_at > anchor, and_(Message.created_at == anchor, Message.id > message_id))
+    ).order_by(Message.created_at, Message.id).limit(limit).all()
+
+    messages = [serialize_message(message) for message in rows]
+    if pending:
+        # Pending messages the table already has were committed since they were listed
+        stored = {message['id'] for message in messages}
+        after = (anchor, message_id)
+        messages += [message for message in pending.values() if message['id'] not in stored and
+                     (datetime.fromisoformat(message['created_at']), message['id']) > after]
+        messages.sort(key=lambda message: (datetime.fromisoformat(message['created_at']), message['id']))
+    return messages[:limit]
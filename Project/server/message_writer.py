@@ -0,0 +1,221 @@
+"""
+Write-behind ingestion for chat messages
+
+send_message() validates a message, gives it its id and timestamp and hands
+it to a MessageWriter, which acknowledges immediately. A background thread
+drains the bounded queue and inserts messages in batches, one commit per
+batch, so a burst of messages shares a handful of fsyncs instead of paying
+one each. When the queue is full, submit() fails and the route answers 503
+so clients back off. stop() - also run at interpreter exit - flushes
+everything still queued. A submit() that got past the shutdown check is
+always written: the writer only exits once no submit() is in progress and
+the queue is empty, checked under the same lock stop() sets the flag with.
+
+Until its batch commits, an accepted row is also listed by pending(), so a
+chat stream catching up from the database can replay it.
+
+An acknowledged row is only given up on when the database rejects it: a
+batch failing with an IntegrityError is retried row by row and the rows
+that still fail are dropped. Any other error - the database being down or
+the connection lost - keeps the rows and retries them with exponential
+backoff, while new messages wait in the queue and get 503s once it is full.
+Only during shutdown does the writer give up, after shutdown_retries more
+attempts. send_message() checks the sender and the column sizes before it
+acknowledges, so a valid message is not rejected later.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db, Message
+
+logger = logging.getLogger(__name__)
+
+class MessageQueueFull(Exception):
+    pass
+
+class MessageWriter:
+    def __init__(self, flask_app, max_queue=10000, flush_interval=0.05, flush_size=500, enqueue_timeout=0.1,
+                 retry_delay=0.1, max_retry_delay=5.0, shutdown_retries=3):
+        self.app = flask_app
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.enqueue_timeout = enqueue_timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.shutdown_retries = shutdown_retries
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        # Guards _stopping against submit() calls between the check and the put
+        self._lock = threading.Lock()
+        self._submitting = 0
+        # room_id -> {id: row} accepted but not yet committed, in submission order
+        self._pending = defaultdict(dict)
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._stats = {'accepted': 0, 'rejected': 0, 'written': 0, 'failed': 0, 'batches': 0, 'retries': 0}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='message-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, row):
+        """Queue a message row; raises MessageQueueFull if the writer cannot keep up"""
+        with self._lock:
+            if self._stopping.is_set():
+                raise MessageQueueFull('Message writer is shutting down')
+            self._submitting += 1
+            self._pending[row['room_id']][row['id']] = row
+        try:
+            self._queue.put(row, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._settle([row])
+            self._count('rejected')
+            raise MessageQueueFull('Message queue is full')
+        finally:
+            with self._lock:
+                self._submitting -= 1
+        self._count('accepted')
+
+    def pending(self, room_id):
+        """Rows of the room accepted but not yet committed, oldest first"""
+        with self._lock:
+            return list(self._pending.get(room_id, {}).values())
+
+    def stop(self, timeout=None):
+        """Stop accepting messages and wait until everything queued is written"""
+        with self._lock:
+            self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats, queued=self._queue.qsize())
+
+    def _settle(self, rows):
+        """Stop listing rows as pending once they are written or dropped"""
+        with self._lock:
+            for row in rows:
+                room = self._pending.get(row['room_id'])
+                if room is not None:
+                    room.pop(row['id'], None)
+                    if not room:
+                        del self._pending[row['room_id']]
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _next_batch(self):
+        """Block for the first row, then gather more until the batch is full or the interval ends"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drained(self):
+        """Whether stop() was called and no row is queued or about to be"""
+        with self._lock:
+            return self._stopping.is_set() and not self._submitting and self._queue.empty()
+
+    def _run(self):
+        while not self._drained():
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, rows):
+        """Write rows, retrying until each one is committed or rejected by the database"""
+        rows = list(rows)
+        delay = self.retry_delay
+        failures = 0
+        while True:
+            try:
+                self._insert(rows)
+                return
+            except Exception as e:
+                with self.app.app_context():
+                    db.session.rollback()
+                failures += 1
+                if self._stopping.is_set() and failures > self.shutdown_retries:
+                    self._count('failed', len(rows))
+                    self._settle(rows)
+                    logger.error('Dropping %d messages at shutdown: %s', len(rows), e)
+                    return
+                self._count('retries')
+                logger.warning('Writing %d messages failed (%s), retrying in %.1fs', len(rows), e, delay)
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+
+    def _insert(self, rows):
+        """
+        Insert rows, dropping those that violate a constraint. Rows are removed
+        from the list as they are settled; on any other error the ones left
+        are still to be written.
+        """
+        with self.app.app_context():
+            try:
+                db.session.execute(Message.__table__.insert(), rows)
+                db.session.commit()
+            except IntegrityError as e:
+                db.session.rollback()
+                logger.warning('Batch of %d messages failed (%s), retrying one by one', len(rows), e)
+            else:
+                self._count('written', len(rows))
+                self._count('batches')
+                self._settle(rows)
+                del rows[:]
+                return
+
+            # Isolate the rows that cannot be written so the rest still land
+            for row in list(rows):
+                try:
+                    db.session.execute(Message.__table__.insert(), [row])
+                    db.session.commit()
+                    self._count('written')
+                except IntegrityError as e:
+                    db.session.rollback()
+                    self._count('failed')
+                    logger.error('Dropping message %s: %s', row.get('id'), e)
+                self._settle([row])
+                rows.remove(row)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def message_writer():
+    """The shared writer, started on first use, or None when write-behind is disabled"""
+    global _writer
+    if not app.config.get('MESSAGE_WRITE_BEHIND'):
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = MessageWriter(
+                    app,
+                    max_queue=app.config['MESSAGE_QUEUE_SIZE'],
+                    flush_interval=app.config['MESSAGE_FLUSH_INTERVAL'],
+                    flush_size=app.config['MESSAGE_FLUSH_SIZE']
+                ).start()
+                atexit.register(_writer.stop)
+    return _writer
@@ -0,0 +1,174 @@
+"""
+Schema migrations
+db.create_all() only creates missing tables, so indexes and other changes to
+existing tables live here as numbered migrations. Applied versions are
+recorded in schema_migrations and each migration runs once, in order, in
+its own transaction.
+"""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, MetaData, String, Table, inspect, select, text, true
+
+from app import (
+    db, User, UserSkill, SkillMatch, SkillMatchDirty, BackgroundLease, Message, MessageArchiveSegment, MeetingRoom,
+    MeetingRoomParticipant, CacheVersion
+)
+
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', String(100), primary_key=True),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+MIGRATIONS = []
+
+def migration(version):
+    """Register fn(connection) as the migration with the given version"""
+    def register(fn):
+        MIGRATIONS.append((version, fn))
+        return fn
+    return register
+
+def _table(model):
+    # A detached copy, so indexes created here are not also added to the
+    # models' metadata and emitted by db.create_all()
+    return model.__table__.to_metadata(MetaData())
+
+def create_index(conn, name, table, *columns, unique=False, where=None):
+    """Create an index unless it already exists; where is a partial-index predicate"""
+    options = {}
+    if where is not None:
+        options = {'sqlite_where': where, 'postgresql_where': where}
+    index = Index(name, *[table.c[column] for column in columns], unique=unique, **options)
+    index.create(conn, checkfirst=True)
+
+def add_column(conn, table, column_name):
+    """Add a model column to an existing table unless it is already there"""
+    existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    if column_name in existing:
+        return
+    column = table.c[column_name]
+    conn.execute(text(
+        f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}'
+    ))
+
+@migration('0001_hot_path_indexes')
+def hot_path_indexes(conn):
+    user_skills = _table(UserSkill)
+    messages = _table(Message)
+    meeting_rooms = _table(MeetingRoom)
+
+    # A user holds each skill once; drop duplicates before enforcing it
+    conn.execute(text(
+        'DELETE FROM user_skills WHERE id NOT IN '
+        '(SELECT MIN(id) FROM user_skills GROUP BY user_id, skill_id)'
+    ))
+    create_index(conn, 'uq_user_skills_user_skill', user_skills, 'user_id', 'skill_id', unique=True)
+
+    # Teacher/student lookups by skill, excluding the requesting user
+    create_index(conn, 'ix_user_skills_teachers', user_skills, 'skill_id', 'user_id',
+                 where=user_skills.c.want_to_teach == true())
+    create_index(conn, 'ix_user_skills_learners', user_skills, 'skill_id', 'user_id',
+                 where=user_skills.c.want_to_learn == true())
+
+    # Room history, newest first
+    create_index(conn, 'ix_messages_room_created', messages, 'room_id', 'created_at')
+
+    # Active room listing, newest first
+    create_index(conn, 'ix_meeting_rooms_active_created', meeting_rooms, 'created_at',
+                 where=meeting_rooms.c.is_active == true())
+
+@migration('0002_users_points_index')
+def users_points_index(conn):
+    # Leaderboard: top users by points
+    create_index(conn, 'ix_users_points', _table(User), 'points')
+
+@migration('0003_skill_match_store')
+def skill_match_store(conn):
+    skill_matches = _table(SkillMatch)
+    add_column(conn, skill_matches, 'user_skill_id')
+    add_column(conn, skill_matches, 'match_type')
+
+    # Rows written before the materializer cannot be served or refreshed
+    conn.execute(text('DELETE FROM skill_matches WHERE match_type IS NULL OR user_skill_id IS NULL'))
+
+    # One row per (user, candidate user skill, match type), read best first
+    create_index(conn, 'uq_skill_matches_candidate', skill_matches, 'user1_id', 'user_skill_id', 'match_type',
+                 unique=True)
+    create_index(conn, 'ix_skill_matches_user_rank', skill_matches, 'user1_id', 'match_percentage')
+    # Refreshing a user also replaces the rows where they are the candidate
+    create_index(conn, 'ix_skill_matches_user2', skill_matches, 'user2_id')
+
+@migration('0004_user_search')
+def user_search_index(conn):
+    from user_search import SearchUnavailable, create_search_index, index_users
+    try:
+        create_search_index(conn)
+    except SearchUnavailable as e:
+        logger.warning('Skipping the user search index: %s', e)
+        return
+    index_users(conn)
+
+@migration('0005_meeting_room_occupancy')
+def meeting_room_occupancy(conn):
+    meeting_rooms = _table(MeetingRoom)
+    add_column(conn, meeting_rooms, 'current_participants')
+    conn.execute(text('UPDATE meeting_rooms SET current_participants = 0 WHERE current_participants IS NULL'))
+    # The seats behind current_participants
+    participants = _table(MeetingRoomParticipant)
+    participants.create(conn, checkfirst=True)
+    add_column(conn, participants, 'last_seen_at')
+
+    # Upcoming active rooms, soonest first
+    create_index(conn, 'ix_meeting_rooms_active_scheduled', meeting_rooms, 'scheduled_time',
+                 where=meeting_rooms.c.is_active == true())
+
+@migration('0006_message_archive')
+def message_archive(conn):
+    segments = _table(MessageArchiveSegment)
+    segments.create(conn, checkfirst=True)
+    # Segments of a room, newest first, for reading past the hot window
+    create_index(conn, 'ix_message_archive_room_last', segments, 'room_id', 'last_created_at', 'last_message_id')
+
+@migration('0007_cache_versions')
+def cache_versions(conn):
+    _table(CacheVersion).create(conn, checkfirst=True)
+
+@migration('0008_skill_match_dirty')
+def skill_match_dirty(conn):
+    from match_store import REFRESH_LEASE, build_matches
+    _table(SkillMatchDirty).create(conn, checkfirst=True)
+    leases = _table(BackgroundLease)
+    leases.create(conn, checkfirst=True)
+    conn.execute(leases.insert().values(name=REFRESH_LEASE))
+    # The one full scoring pass, so no worker has to build the store itself
+    build_matches(conn)
+
+def applied_versions(conn):
+    return {row.version for row in conn.execute(select(schema_migrations.c.version))}
+
+def run_migrations(engine=None):
+    """Apply pending migrations and return their versions"""
+    engine = engine or db.engine
+    schema_migrations.create(engine, checkfirst=True)
+
+    with engine.connect() as conn:
+        applied = applied_versions(conn)
+
+    newly_applied = []
+    for version, fn in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(schema_migrations.insert().values(version=version, applied_at=datetime.utcnow()))
+        logger.info('Applied migration %s', version)
+        newly_applied.append(version)
+
+    return newly_applied
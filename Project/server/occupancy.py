@@ -0,0 +1,108 @@
+"""
+Live meeting room occupancy
+
+Who is in a room is recorded in meeting_room_participants, and
+meeting_rooms.current_participants counts those rows. Both change in one
+transaction, and a seat is only taken by
+
+    UPDATE meeting_rooms SET current_participants = current_participants + 1
+    WHERE id = :id AND current_participants < max_participants
+
+so two users racing for the last seat cannot both get it, whichever worker
+or process handles them. Only a participant row can be given back, so
+leaving a room one never joined changes nothing.
+
+A seat is a lease: joining again renews it, and MEETING_SEAT_LEASE_SECONDS
+after the last renewal it lapses, so a client that closes the tab without
+leaving does not hold it forever. Lapsed seats of a room are reclaimed by
+the next join or leave, in the same transaction and before the guarded
+UPDATE, so until then current_participants still counts them.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db, MeetingRoom, MeetingRoomParticipant
+
+_rooms = MeetingRoom.__table__
+_participants = MeetingRoomParticipant.__table__
+
+class RoomFull(Exception):
+    pass
+
+def _count(room_id):
+    return db.session.execute(
+        select(_rooms.c.current_participants).where(_rooms.c.id == room_id)
+    ).scalar() or 0
+
+def _release(room_id, *conditions):
+    """Delete the room's participant rows matching conditions and free their seats"""
+    released = db.session.execute(
+        delete(_participants).where(_participants.c.room_id == room_id, *conditions)
+    ).rowcount
+    if released:
+        db.session.execute(
+            update(_rooms)
+            .where(_rooms.c.id == room_id)
+            .values(current_participants=case(
+                (_rooms.c.current_participants > released, _rooms.c.current_participants - released),
+                else_=0
+            ))
+        )
+    return released
+
+def _expire(room_id, now):
+    cutoff = now - timedelta(seconds=app.config['MEETING_SEAT_LEASE_SECONDS'])
+    return _release(room_id, _participants.c.last_seen_at < cutoff)
+
+def join_room(room_id, user_id):
+    """
+    Give user_id a seat in the room, commit and return its occupancy; raises
+    RoomFull when every seat is taken. Joining a room one is already in
+    renews the seat's lease.
+    """
+    now = datetime.utcnow()
+    _expire(room_id, now)
+    renewed = db.session.execute(
+        update(_participants)
+        .where(_participants.c.room_id == room_id, _participants.c.user_id == user_id)
+        .values(last_seen_at=now)
+    ).rowcount
+    if renewed:
+        participants = _count(room_id)
+        db.session.commit()
+        return participants
+
+    taken = db.session.execute(
+        update(_rooms)
+        .where(_rooms.c.id == room_id,
+               or_(_rooms.c.max_participants.is_(None),
+                   _rooms.c.current_participants < _rooms.c.max_participants))
+        .values(current_participants=_rooms.c.current_participants + 1)
+    ).rowcount
+    if not taken:
+        # Keep any lapsed seats reclaimed above
+        db.session.commit()
+        raise RoomFull('Room is full')
+
+    try:
+        db.session.execute(insert(_participants).values(
+            room_id=room_id, user_id=user_id, joined_at=now, last_seen_at=now
+        ))
+        participants = _count(room_id)
+        db.session.commit()
+    except IntegrityError:
+        # Another request joined the same user first; give the seat back
+        db.session.rollback()
+        return _count(room_id)
+    return participants
+
+def leave_room(room_id, user_id):
+    """Give back user_id's seat in the room, if they hold one, commit and return its occupancy"""
+    _expire(room_id, datetime.utcnow())
+    _release(room_id, _participants.c.user_id == user_id)
+    participants = _count(room_id)
+    db.session.commit()
+    return participants
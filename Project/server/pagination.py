@@ -0,0 +1,24 @@
+"""
+Opaque cursors for keyset pagination
+A cursor is the sort key of the last row on a page, JSON-encoded and
+base64'd so clients treat it as a token
+"""
+
+import base64
+import json
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, length):
+    """The sort key values stored in cursor, which must hold exactly length of them"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor('Invalid cursor')
+    return values
@@ -0,0 +1,132 @@
+"""
+Password hashing off the request threads
+
+Key derivation is slow on purpose. Running it inline lets a burst of logins
+pin every request thread while the other endpoints wait, so hashes are
+computed on a small dedicated pool instead. Admission is bounded: once
+workers + queue slots are taken, hash() and verify() raise HashingBusy and
+the route answers 503 rather than piling up more waiting requests. Each
+admitted hash holds a request thread while it waits, so the bound only
+protects anything while it is below the request threads per process
+(GUNICORN_THREADS); the defaults keep it at half of them.
+
+PASSWORD_HASH_METHOD is any werkzeug method string, e.g. 'scrypt' or
+'pbkdf2:sha256:600000'. Hashes stored with a different method are upgraded
+on the user's next successful login (see needs_rehash()).
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app import app
+
+class HashingBusy(Exception):
+    pass
+
+class PasswordHasher:
+    def __init__(self, method='scrypt', workers=2, max_queue=32, timeout=10.0):
+        self._stats_lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+        self._running = 0
+        self._stats = {'completed': 0, 'rejected': 0, 'rehashed': 0,
+                       'wait_ms_total': 0.0, 'hash_ms_total': 0.0, 'max_pending': 0}
+        self.configure(method, workers, max_queue, timeout)
+
+    def configure(self, method=None, workers=None, max_queue=None, timeout=None):
+        """Apply new settings; work already submitted finishes on the old pool"""
+        self.method = method or getattr(self, 'method', 'scrypt')
+        self.workers = workers or getattr(self, 'workers', 2)
+        self.max_queue = max_queue if max_queue is not None else getattr(self, 'max_queue', 32)
+        self.timeout = timeout or getattr(self, 'timeout', 10.0)
+        # The full method string werkzeug stores, with its default parameters filled in
+        self.stored_method = generate_password_hash('', self.method).split('$', 1)[0]
+
+        old_executor = self._executor
+        with self._stats_lock:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+            self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        if old_executor is not None:
+            old_executor.shutdown(wait=False)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True when pwhash was not made with the configured method and parameters"""
+        return pwhash.split('$', 1)[0] != self.stored_method
+
+    def record_rehash(self):
+        self._count('rehashed')
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats.update(method=self.stored_method, workers=self.workers, max_queue=self.max_queue,
+                         running=self._running, queued=self._pending - self._running)
+        completed = stats['completed'] or 1
+        stats['avg_wait_ms'] = round(stats.pop('wait_ms_total') / completed, 3)
+        stats['avg_hash_ms'] = round(stats.pop('hash_ms_total') / completed, 3)
+        return stats
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise HashingBusy('Too many password hashing requests, try again shortly')
+
+        with self._stats_lock:
+            self._pending += 1
+            self._stats['max_pending'] = max(self._stats['max_pending'], self._pending)
+            executor, slots = self._executor, self._slots
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            with self._stats_lock:
+                self._running += 1
+            try:
+                return fn(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._stats_lock:
+                    self._running -= 1
+                    self._pending -= 1
+                    self._stats['completed'] += 1
+                    self._stats['wait_ms_total'] += (started - submitted) * 1000
+                    self._stats['hash_ms_total'] += (finished - started) * 1000
+                slots.release()
+
+        try:
+            future = executor.submit(task)
+        except RuntimeError:
+            # The pool was replaced by configure() between admission and submit
+            with self._stats_lock:
+                self._pending -= 1
+            slots.release()
+            return self._run(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingBusy('Password hashing timed out, try again shortly')
+
+password_hasher = PasswordHasher(
+    method=app.config['PASSWORD_HASH_METHOD'],
+    workers=app.config['PASSWORD_HASH_WORKERS'],
+    max_queue=app.config['PASSWORD_HASH_QUEUE']
+)
+
+if password_hasher.workers + password_hasher.max_queue >= app.config['REQUEST_THREADS']:
+    app.logger.warning(
+        'PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE (%d) is not below GUNICORN_THREADS (%d); '
+        'logins can take every request thread before any 503 is sent',
+        password_hasher.workers + password_hasher.max_queue, app.config['REQUEST_THREADS'])
@@ -0,0 +1,167 @@
+"""
+Per-request SQL and latency profiling
+
+Opt in with PROFILE_REQUESTS=true. Every request then records its number of
+SQL statements, time spent in SQL, the remaining (Python) time and the
+response size. Statements are counted by SQLAlchemy engine events, and only
+those run on the request's own thread are attributed to it. Totals and
+histograms are aggregated per route and served on /api/admin/profile.
+
+In debug mode, or with PROFILE_HEADERS=true, the numbers are also sent as
+X-SQL-Count, X-SQL-Time-Ms, X-Python-Time-Ms and X-Response-Time-Ms
+headers. Requests slower than PROFILE_SLOW_MS are logged.
+"""
+
+import bisect
+import logging
+import threading
+import time
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = threading.local()
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile (None if unbounded)"""
+        target = fraction * sum(self.counts)
+        seen = 0
+        for position, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return self.bounds[position] if position < len(self.bounds) else None
+        return 0
+
+    def to_dict(self):
+        labels = [f'<={bound}' for bound in self.bounds] + [f'>{self.bounds[-1]}']
+        return {label: count for label, count in zip(labels, self.counts) if count}
+
+class RouteStats:
+    def __init__(self):
+        self.requests = 0
+        self.total_ms = 0.0
+        self.sql_ms = 0.0
+        self.sql_count = 0
+        self.max_sql_count = 0
+        self.response_bytes = 0
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+        self.statements = Histogram(SQL_COUNT_BUCKETS)
+
+    def record(self, total_ms, sql_ms, sql_count, response_bytes):
+        self.requests += 1
+        self.total_ms += total_ms
+        self.sql_ms += sql_ms
+        self.sql_count += sql_count
+        self.max_sql_count = max(self.max_sql_count, sql_count)
+        self.response_bytes += response_bytes or 0
+        self.latency.add(total_ms)
+        self.statements.add(sql_count)
+
+    def to_dict(self):
+        requests = self.requests or 1
+        return {
+            'requests': self.requests,
+            'avg_ms': round(self.total_ms / requests, 3),
+            'avg_sql_ms': round(self.sql_ms / requests, 3),
+            'avg_python_ms': round((self.total_ms - self.sql_ms) / requests, 3),
+            'avg_sql_count': round(self.sql_count / requests, 2),
+            'max_sql_count': self.max_sql_count,
+            'avg_response_bytes': round(self.response_bytes / requests),
+            'p50_ms': self.latency.quantile(0.5),
+            'p95_ms': self.latency.quantile(0.95),
+            'p99_ms': self.latency.quantile(0.99),
+            'latency_ms': self.latency.to_dict(),
+            'sql_count': self.statements.to_dict()
+        }
+
+class RequestProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.slow_ms = 500
+        self.headers = False
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def init_app(self, flask_app):
+        self.enabled = flask_app.config['PROFILE_REQUESTS']
+        self.slow_ms = flask_app.config['PROFILE_SLOW_MS']
+        self.headers = flask_app.config['PROFILE_HEADERS']
+        if not self.enabled:
+            return
+
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        flask_app.before_request(self._start)
+        flask_app.after_request(self._finish)
+        flask_app.teardown_request(self._clear)
+
+    def snapshot(self):
+        with self._lock:
+            return {route: stats.to_dict() for route, stats in sorted(self._routes.items())}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def _start(self):
+        _current.profile = {'started': time.perf_counter(), 'sql_count': 0, 'sql_seconds': 0.0}
+
+    def _finish(self, response):
+        profile = getattr(_current, 'profile', None)
+        if profile is None:
+            return response
+
+        total_ms = (time.perf_counter() - profile['started']) * 1000
+        sql_ms = profile['sql_seconds'] * 1000
+        # Streamed responses have no length until they are sent
+        response_bytes = None if response.is_streamed else response.calculate_content_length()
+        rule = request.url_rule.rule if request.url_rule else '<unmatched>'
+        route = f'{request.method} {rule}'
+
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = RouteStats()
+            stats.record(total_ms, sql_ms, profile['sql_count'], response_bytes)
+
+        if total_ms >= self.slow_ms:
+            logger.warning('Slow request %s %s: %.1f ms, %d SQL statements in %.1f ms, %s bytes',
+                           request.method, request.path, total_ms, profile['sql_count'], sql_ms, response_bytes)
+
+        if self.headers or current_app.debug:
+            response.headers['X-SQL-Count'] = str(profile['sql_count'])
+            response.headers['X-SQL-Time-Ms'] = f'{sql_ms:.2f}'
+            response.headers['X-Python-Time-Ms'] = f'{total_ms - sql_ms:.2f}'
+            response.headers['X-Response-Time-Ms'] = f'{total_ms:.2f}'
+        return response
+
+    def _clear(self, exc=None):
+        _current.profile = None
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = getattr(_current, 'profile', None)
+    if profile is not None:
+        profile.setdefault('statement_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = getattr(_current, 'profile', None)
+    if profile is not None and profile.get('statement_started'):
+        profile['sql_seconds'] += time.perf_counter() - profile['statement_started'].pop()
+        profile['sql_count'] += 1
+
+request_profiler = RequestProfiler()
@@ -1,10 +1,35 @@
-from flask import request, jsonify, session
+from flask import Response, request, jsonify, session, stream_with_context
 from app import app, db, User, Skill, UserSkill, SkillMatch, Message, MeetingRoom
+from pagination import InvalidCursor
+from match_store import load_skill_matches, mark_stale, match_materializer
+from message_history import load_room_page, load_messages_after, serialize_pending
+from message_archive import archive_summary
+from message_writer import message_writer, MessageQueueFull
+from chat_hub import room_hub, encode_event, encode_reset, StreamsFull
+from chat_relay import chat_relay
+from leaderboard import award_points, leaderboard, MAX_POINTS_PER_AWARD, POINTS_PER_LEVEL
+from skill_stats import skill_percentiles
+from passwords import password_hasher, HashingBusy
+from admin import admin_required
+from http_cache import conditional_get, response_cache, user_key
+from profiling import request_profiler
+from db_routing import read_only
+from user_search import index_user, search_users, SearchUnavailable
+from occupancy import join_room, leave_room, RoomFull
+from serializers import (
+    load_user_profile, load_user_profile_by_username, load_user_profiles, load_user_skills, load_meeting_room,
+    message_options, meeting_room_options,
+    serialize_user, serialize_user_skill, serialize_skill, serialize_message, serialize_meeting_room,
+    MessageDTO, UserRefDTO
+)
 from sqlalchemy import func, or_, and_
 import uuid
-from datetime import datetime
+import queue
+from datetime import datetime, timedelta
 import math
 
+request_profiler.init_app(app)
+
 # User Authentication Routes
 @app.route('/api/auth/register', methods=['POST'])
 def register():
@@ -33,14 +58,20 @@ def register():
             bio=data.get('bio', ''),
             profile_image_url=data.get('profile_image_url', '')
         )
-        user.set_password(data['password'])
+        user.password_hash = password_hasher.hash(data['password'])
         
         db.session.add(user)
+        db.session.flush()
+        index_user(user.id)
         db.session.commit()
         
         session['user_id'] = user.id
-        return jsonify(user.to_dict()), 201
+        session['username'] = user.username
+        return jsonify(serialize_user(user)), 201
         
+    except HashingBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -53,20 +84,34 @@ def login():
         if not data.get('username') or not data.get('password'):
             return jsonify({'error': 'Username and password are required'}), 400
         
-        user = User.query.filter_by(username=data['username']).first()
+        user = load_user_profile_by_username(data['username'])
         
-        if user and user.check_password(data['password']):
-            session['user_id'] = user.id
-            return jsonify(user.to_dict()), 200
+        if user and password_hasher.verify(user.password_hash, data['password']):
+            user_data = serialize_user(user)
+            
+            if password_hasher.needs_rehash(user.password_hash):
+                # Upgrade to the configured work factor while we have the plaintext
+                user.password_hash = password_hasher.hash(data['password'])
+                db.session.commit()
+                password_hasher.record_rehash()
+            
+            session['user_id'] = user_data['id']
+            session['username'] = user_data['username']
+            return jsonify(user_data), 200
         else:
             return jsonify({'error': 'Invalid credentials'}), 401
             
+    except HashingBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/auth/logout', methods=['POST'])
 def logout():
     session.pop('user_id', None)
+    session.pop('username', None)
     return jsonify({'message': 'Logged out successfully'}), 200
 
 @app.route('/api/auth/user', methods=['GET'])
@@ -75,20 +120,22 @@ def get_current_user():
     if not user_id:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    user = User.query.get(user_id)
+    user = load_user_profile(user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    return jsonify(user.to_dict()), 200
+    return jsonify(serialize_user(user)), 200
 
 # User Profile Routes
 @app.route('/api/users/<user_id>', methods=['GET'])
+@read_only
+@conditional_get(user_key)
 def get_user_profile(user_id):
-    user = User.query.get(user_id)
+    user = load_user_profile(user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    return jsonify(user.to_dict()), 200
+    return jsonify(serialize_user(user)), 200
 
 @app.route('/api/users/<user_id>', methods=['PUT'])
 def update_user_profile(user_id):
@@ -97,7 +144,7 @@ def update_user_profile(user_id):
         return jsonify({'error': 'Unauthorized'}), 401
     
     try:
-        user = User.query.get(user_id)
+        user = load_user_profile(user_id)
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
@@ -116,19 +163,62 @@ def update_user_profile(user_id):
             user.profile_image_url = data['profile_image_url']
         
         user.updated_at = datetime.utcnow()
+        # Serialize before the commit expires the eagerly loaded skills
+        user_data = serialize_user(user)
+        index_user(user_id)
+        response_cache.bump(user_key(user_id))
         db.session.commit()
         
-        return jsonify(user.to_dict()), 200
+        return jsonify(user_data), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/search/users', methods=['GET'])
+@read_only
+def search_user_profiles():
+    """
+    Users whose names, bio or skills match ?q=, best match first
+    Paged by ?limit= (default 20); the next page's cursor is returned in the
+    X-Next-Cursor header and passed back as ?cursor=...
+    """
+    try:
+        query = request.args.get('q', '')
+        limit = request.args.get('limit', 20, type=int)
+        cursor = request.args.get('cursor')
+        
+        if not query.strip():
+            return jsonify({'error': 'Search query is required'}), 400
+        if limit <= 0 or limit > 100:
+            return jsonify({'error': 'Limit must be between 1 and 100'}), 400
+        
+        try:
+            results, next_cursor = search_users(query, limit=limit, cursor=cursor)
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        except SearchUnavailable as e:
+            return jsonify({'error': str(e)}), 501
+        
+        users = load_user_profiles([user_id for user_id, _ in results])
+        response = jsonify([
+            {'user': serialize_user(users[user_id]), 'score': round(score, 4)}
+            for user_id, score in results if user_id in users
+        ])
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response, 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Skills Routes
 @app.route('/api/skills', methods=['GET'])
+@read_only
+@conditional_get(lambda: 'skills')
 def get_skills():
     skills = Skill.query.all()
-    return jsonify([skill.to_dict() for skill in skills]), 200
+    return jsonify([serialize_skill(skill) for skill in skills]), 200
 
 @app.route('/api/skills', methods=['POST'])
 def create_skill():
@@ -151,9 +241,10 @@ def create_skill():
         )
         
         db.session.add(skill)
+        response_cache.bump('skills')
         db.session.commit()
         
-        return jsonify(skill.to_dict()), 201
+        return jsonify(serialize_skill(skill)), 201
         
     except Exception as e:
         db.session.rollback()
@@ -161,9 +252,10 @@ def create_skill():
 
 # User Skills Routes
 @app.route('/api/users/<user_id>/skills', methods=['GET'])
+@read_only
 def get_user_skills(user_id):
-    user_skills = UserSkill.query.filter_by(user_id=user_id).all()
-    return jsonify([user_skill.to_dict() for user_skill in user_skills]), 200
+    user_skills = load_user_skills(user_id)
+    return jsonify([serialize_user_skill(user_skill) for user_skill in user_skills]), 200
 
 @app.route('/api/users/<user_id>/skills', methods=['POST'])
 def add_user_skill(user_id):
@@ -196,9 +288,12 @@ def add_user_skill(user_id):
         )
         
         db.session.add(user_skill)
+        index_user(user_id)
+        _user_skills_changed(user_id)
         db.session.commit()
+        skill_percentiles.record_added(user_skill.skill_id, user_skill.proficiency_level)
         
-        return jsonify(user_skill.to_dict()), 201
+        return jsonify(serialize_user_skill(user_skill)), 201
         
     except Exception as e:
         db.session.rollback()
@@ -219,8 +314,12 @@ def remove_user_skill(user_id, skill_id):
         if not user_skill:
             return jsonify({'error': 'User skill not found'}), 404
         
+        skill_id, proficiency_level = user_skill.skill_id, user_skill.proficiency_level
         db.session.delete(user_skill)
+        index_user(user_id)
+        _user_skills_changed(user_id)
         db.session.commit()
+        skill_percentiles.record_removed(skill_id, proficiency_level)
         
         return jsonify({'message': 'Skill removed successfully'}), 200
         
@@ -228,122 +327,101 @@ def remove_user_skill(user_id, skill_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _user_skills_changed(user_id):
+    """Invalidate what is derived from a user's skills, in the transaction that changes them"""
+    response_cache.bump(user_key(user_id))
+    mark_stale(user_id)
+    # Make sure this worker takes part in refreshing the stored matches
+    match_materializer()
+
 # Skill Matching Routes
 @app.route('/api/skill-matches/<user_id>', methods=['GET'])
+@read_only
 def get_skill_matches(user_id):
+    """
+    Teachers and students for a user, best match first
+    Optional ?limit=N pages the result; the next page's cursor is returned in
+    the X-Next-Cursor header and passed back as ?cursor=...
+    """
     try:
-        # Get user's skills
-        user_skills = UserSkill.query.filter_by(user_id=user_id).all()
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
         
-        if not user_skills:
-            return jsonify([]), 200
+        if limit is not None and limit <= 0:
+            return jsonify({'error': 'Limit must be positive'}), 400
         
-        matches = []
+        try:
+            rows, next_cursor = load_skill_matches(user_id, limit=limit, cursor=cursor)
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
         
-        for user_skill in user_skills:
-            if user_skill.want_to_learn:
-                # Find users who want to teach this skill
-                potential_teachers = UserSkill.query.filter(
-                    and_(
-                        UserSkill.skill_id == user_skill.skill_id,
-                        UserSkill.want_to_teach == True,
-                        UserSkill.user_id != user_id
-                    )
-                ).all()
-                
-                for teacher_skill in potential_teachers:
-                    # Calculate match percentage based on proficiency difference and experience
-                    proficiency_diff = abs(teacher_skill.proficiency_level - user_skill.proficiency_level)
-                    experience_factor = min(teacher_skill.years_experience / 5, 1.0)  # Cap at 5 years
-                    
-                    # Higher match percentage for teachers with more experience and appropriate proficiency
-                    match_percentage = max(0, 100 - (proficiency_diff * 10) + (experience_factor * 20))
-                    
-                    matches.append({
-                        'user': teacher_skill.user.to_dict(),
-                        'skill': teacher_skill.skill.to_dict(),
-                        'match_percentage': round(match_percentage, 1),
-                        'teacher_proficiency': teacher_skill.proficiency_level,
-                        'teacher_experience': teacher_skill.years_experience,
-                        'match_type': 'teacher'
-                    })
-            
-            if user_skill.want_to_teach:
-                # Find users who want to learn this skill
-                potential_students = UserSkill.query.filter(
-                    and_(
-                        UserSkill.skill_id == user_skill.skill_id,
-                        UserSkill.want_to_learn == True,
-                        UserSkill.user_id != user_id
-                    )
-                ).all()
-                
-                for student_skill in potential_students:
-                    proficiency_diff = abs(user_skill.proficiency_level - student_skill.proficiency_level)
-                    
-                    # Higher match percentage for students with lower proficiency (more to teach)
-                    match_percentage = max(0, 100 - (proficiency_diff * 5))
-                    
-                    matches.append({
-                        'user': student_skill.user.to_dict(),
-                        'skill': student_skill.skill.to_dict(),
-                        'match_percentage': round(match_percentage, 1),
-                        'student_proficiency': student_skill.proficiency_level,
-                        'match_type': 'student'
-                    })
-        
-        # Sort by match percentage descending
-        matches.sort(key=lambda x: x['match_percentage'], reverse=True)
-        
-        return jsonify(matches), 200
+        matches = []
+        for row in rows:
+            match = {
+                'user': serialize_user(row.User),
+                'skill': serialize_skill(row.Skill),
+                'match_percentage': round(row.match_percentage, 1),
+            }
+            if row.match_type == 'teacher':
+                match['teacher_proficiency'] = row.proficiency_level
+                match['teacher_experience'] = row.years_experience
+            else:
+                match['student_proficiency'] = row.proficiency_level
+            match['match_type'] = row.match_type
+            matches.append(match)
+        
+        response = jsonify(matches)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response, 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/skill-matches/percentiles', methods=['GET'])
+@read_only
 def get_skill_match_percentiles():
     try:
-        # Calculate percentiles for all skills
-        skills = Skill.query.all()
-        percentiles = {}
-        
-        for skill in skills:
-            user_skills = UserSkill.query.filter_by(skill_id=skill.id).all()
-            
-            if user_skills:
-                proficiency_levels = [us.proficiency_level for us in user_skills]
-                proficiency_levels.sort()
-                
-                percentiles[skill.name] = {
-                    'skill_id': skill.id,
-                    'total_users': len(user_skills),
-                    'avg_proficiency': round(sum(proficiency_levels) / len(proficiency_levels), 1),
-                    'percentiles': {
-                        '25th': proficiency_levels[int(len(proficiency_levels) * 0.25)] if len(proficiency_levels) >= 4 else proficiency_levels[0],
-                        '50th': proficiency_levels[int(len(proficiency_levels) * 0.5)] if len(proficiency_levels) >= 2 else proficiency_levels[0],
-                        '75th': proficiency_levels[int(len(proficiency_levels) * 0.75)] if len(proficiency_levels) >= 4 else proficiency_levels[-1],
-                        '90th': proficiency_levels[int(len(proficiency_levels) * 0.9)] if len(proficiency_levels) >= 10 else proficiency_levels[-1]
-                    }
-                }
-        
-        return jsonify(percentiles), 200
+        return jsonify(skill_percentiles.snapshot()), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Chat and Messaging Routes
 @app.route('/api/messages/<room_id>', methods=['GET'])
+@read_only
 def get_messages(room_id):
+    """
+    A page of room history, oldest first
+    Pass ?cursor=<next_cursor> from the previous response to load older
+    messages. The legacy ?page=N offset pagination is still accepted.
+    """
     try:
-        page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 50, type=int)
         
-        messages = Message.query.filter_by(room_id=room_id)\
+        if per_page <= 0:
+            return jsonify({'error': 'per_page must be positive'}), 400
+        
+        if 'page' not in request.args:
+            try:
+                messages, next_cursor = load_room_page(room_id, per_page, request.args.get('cursor'))
+            except InvalidCursor as e:
+                return jsonify({'error': str(e)}), 400
+            
+            return jsonify({
+                'messages': messages,
+                'has_next': next_cursor is not None,
+                'next_cursor': next_cursor
+            }), 200
+        
+        page = request.args.get('page', 1, type=int)
+        
+        messages = Message.query.options(*message_options()).filter_by(room_id=room_id)\
             .order_by(Message.created_at.desc())\
             .paginate(page=page, per_page=per_page, error_out=False)
         
         return jsonify({
-            'messages': [message.to_dict() for message in reversed(messages.items)],
+            'messages': [serialize_message(message) for message in reversed(messages.items)],
             'has_next': messages.has_next,
             'has_prev': messages.has_prev,
             'total': messages.total
@@ -352,6 +430,17 @@ def get_messages(room_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def validate_message(data):
+    """Why the message would not fit the messages table, or None"""
+    for field in ('room_id', 'content', 'message_type'):
+        if field in data and not isinstance(data[field], str):
+            return f'{field} must be a string'
+    for field in ('room_id', 'message_type'):
+        length = Message.__table__.c[field].type.length
+        if len(data.get(field, '')) > length:
+            return f'{field} must be at most {length} characters'
+    return None
+
 @app.route('/api/messages', methods=['POST'])
 def send_message():
     try:
@@ -359,10 +448,41 @@ def send_message():
         if not current_user_id:
             return jsonify({'error': 'Unauthorized'}), 401
         
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         
         if not data.get('room_id') or not data.get('content'):
             return jsonify({'error': 'Room ID and content are required'}), 400
+        error = validate_message(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        writer = message_writer()
+        if writer:
+            # The writer drops rows the database rejects, so everything it could reject is checked first
+            username = db.session.query(User.username).filter_by(id=current_user_id).scalar()
+            if username is None:
+                return jsonify({'error': 'User not found'}), 401
+            
+            # Acknowledge now; the background writer inserts it with the next batch
+            row = {
+                'id': str(uuid.uuid4()),
+                'sender_id': current_user_id,
+                'room_id': data['room_id'],
+                'content': data['content'],
+                'message_type': data.get('message_type', 'text'),
+                'created_at': datetime.utcnow()
+            }
+            try:
+                writer.submit(row)
+            except MessageQueueFull as e:
+                return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+            
+            sender = UserRefDTO(current_user_id, username)
+            message_data = MessageDTO(
+                row['id'], sender, row['room_id'], row['content'], row['message_type'], row['created_at']
+            ).to_dict()
+            room_hub.publish(row['room_id'], message_data)
+            return jsonify(message_data), 202
         
         message = Message(
             sender_id=current_user_id,
@@ -374,17 +494,141 @@ def send_message():
         db.session.add(message)
         db.session.commit()
         
-        return jsonify(message.to_dict()), 201
+        message_data = serialize_message(message)
+        room_hub.publish(message.room_id, message_data)
+        return jsonify(message_data), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# Missed messages read per query while a reconnecting client catches up
+SSE_CATCH_UP_PAGE = 500
+# Seconds between keep-alive comments on an idle stream
+SSE_HEARTBEAT_SECONDS = 15
+
+@app.route('/api/messages/<room_id>/stream', methods=['GET'])
+@read_only
+def stream_messages(room_id):
+    """
+    Server-sent events with every new message in the room
+    Reconnecting clients send Last-Event-ID (or ?last_id=) to receive every
+    message they missed before the live ones, read from the database a page
+    at a time. When that id is not a message of the room (or has been
+    archived) they get a reset event instead, and should reload the room
+    before listening on. Messages sent through other workers arrive via
+    chat_relay. Past SSE_MAX_STREAMS open streams in this process the answer
+    is 503.
+    """
+    chat_relay()
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_id')
+    try:
+        subscription = room_hub.subscribe(room_id)
+    except StreamsFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    
+    def catch_up():
+        """
+        Messages after last_id, oldest first. Subscribed before the first
+        read, so a message is live, missed or both but never neither; the
+        write-behind queue is read before the table for the same reason.
+        """
+        writer = message_writer()
+        try:
+            pending = serialize_pending(writer.pending(room_id)) if writer else []
+            after = last_id
+            while True:
+                page = load_messages_after(room_id, after, SSE_CATCH_UP_PAGE, pending)
+                db.session.remove()
+                if page is None:
+                    yield None
+                    return
+                yield from page
+                if len(page) < SSE_CATCH_UP_PAGE:
+                    return
+                after = page[-1]['id']
+        finally:
+            db.session.remove()
+    
+    def generate():
+        sent = set()
+        try:
+            yield 'retry: 3000\n\n'
+            for message in catch_up() if last_id else ():
+                if message is None:
+                    yield encode_reset('Cannot resume from the last event id')
+                    break
+                sent.add(message['id'])
+                yield encode_event(message)
+            
+            while not subscription.overflowed:
+                try:
+                    message_id, event = subscription.events.get(timeout=SSE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                # Published while catching up, already sent
+                if message_id in sent:
+                    continue
+                yield event
+        finally:
+            room_hub.unsubscribe(subscription)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 # Meeting Room Routes
 @app.route('/api/meeting-rooms', methods=['GET'])
+@read_only
+@conditional_get(lambda: 'meeting-rooms')
 def get_meeting_rooms():
-    rooms = MeetingRoom.query.filter_by(is_active=True).order_by(MeetingRoom.created_at.desc()).all()
-    return jsonify([room.to_dict() for room in rooms]), 200
+    rooms = MeetingRoom.query.options(*meeting_room_options())\
+        .filter_by(is_active=True).order_by(MeetingRoom.created_at.desc()).all()
+    return jsonify([serialize_meeting_room(room) for room in rooms]), 200
+
+@app.route('/api/meeting-rooms/live', methods=['GET'])
+@read_only
+def get_live_meeting_rooms():
+    """
+    Active rooms with their creator and live occupancy, in one query
+    ?upcoming=true keeps rooms scheduled from now on, soonest first, and
+    ?within_hours=N those scheduled in the next N hours; ?limit= caps the list.
+    """
+    try:
+        upcoming = request.args.get('upcoming', 'false').lower() in ('1', 'true', 'yes')
+        within_hours = request.args.get('within_hours', type=float)
+        limit = request.args.get('limit', 50, type=int)
+        
+        if limit <= 0 or limit > 200:
+            return jsonify({'error': 'Limit must be between 1 and 200'}), 400
+        if within_hours is not None and within_hours <= 0:
+            return jsonify({'error': 'within_hours must be positive'}), 400
+        
+        query = MeetingRoom.query.options(*meeting_room_options()).filter(MeetingRoom.is_active == True)
+        if upcoming or within_hours is not None:
+            now = datetime.utcnow()
+            query = query.filter(MeetingRoom.scheduled_time >= now)
+            if within_hours is not None:
+                query = query.filter(MeetingRoom.scheduled_time <= now + timedelta(hours=within_hours))
+            query = query.order_by(MeetingRoom.scheduled_time, MeetingRoom.id)
+        else:
+            query = query.order_by(MeetingRoom.created_at.desc())
+        rooms = query.limit(limit).all()
+        
+        results = []
+        for room in rooms:
+            room_data = serialize_meeting_room(room)
+            participants = room.current_participants or 0
+            room_data['current_participants'] = participants
+            room_data['spots_left'] = max((room.max_participants or 0) - participants, 0)
+            results.append(room_data)
+        
+        return jsonify(results), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/meeting-rooms', methods=['POST'])
 def create_meeting_room():
@@ -413,21 +657,23 @@ def create_meeting_room():
         )
         
         db.session.add(room)
+        response_cache.bump('meeting-rooms')
         db.session.commit()
         
-        return jsonify(room.to_dict()), 201
+        return jsonify(serialize_meeting_room(room)), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/meeting-rooms/<room_id>', methods=['GET'])
+@read_only
 def get_meeting_room(room_id):
-    room = MeetingRoom.query.get(room_id)
+    room = load_meeting_room(room_id)
     if not room:
         return jsonify({'error': 'Room not found'}), 404
     
-    return jsonify(room.to_dict()), 200
+    return jsonify(serialize_meeting_room(room)), 200
 
 @app.route('/api/meeting-rooms/<room_id>/join', methods=['POST'])
 def join_meeting_room(room_id):
@@ -436,22 +682,48 @@ def join_meeting_room(room_id):
         if not current_user_id:
             return jsonify({'error': 'Unauthorized'}), 401
         
-        room = MeetingRoom.query.get(room_id)
+        room = load_meeting_room(room_id)
         if not room:
             return jsonify({'error': 'Room not found'}), 404
         
         if not room.is_active:
             return jsonify({'error': 'Room is not active'}), 400
         
+        # Serialize before the commit in join_room() expires the room
+        room_data = serialize_meeting_room(room)
+        try:
+            participants = join_room(room.id, current_user_id)
+        except RoomFull as e:
+            return jsonify({'error': str(e)}), 409
+        
         # In a real implementation, you would integrate with Zoom SDK here
         # For now, we'll just return the join URL
         return jsonify({
-            'zoom_join_url': room.zoom_join_url,
-            'meeting_id': room.zoom_meeting_id,
-            'room': room.to_dict()
+            'zoom_join_url': room_data['zoom_join_url'],
+            'meeting_id': room_data['zoom_meeting_id'],
+            'room': room_data,
+            'current_participants': participants
         }), 200
         
     except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/meeting-rooms/<room_id>/leave', methods=['POST'])
+def leave_meeting_room(room_id):
+    try:
+        current_user_id = session.get('user_id')
+        if not current_user_id:
+            return jsonify({'error': 'Unauthorized'}), 401
+        
+        if not db.session.query(MeetingRoom.id).filter_by(id=room_id).first():
+            return jsonify({'error': 'Room not found'}), 404
+        
+        participants = leave_room(room_id, current_user_id)
+        return jsonify({'current_participants': participants}), 200
+        
+    except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 # Gamification Routes
@@ -462,37 +734,82 @@ def add_points(user_id):
         if not current_user_id or current_user_id != user_id:
             return jsonify({'error': 'Unauthorized'}), 401
         
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         points = data.get('points', 0)
         
-        if points <= 0:
-            return jsonify({'error': 'Points must be positive'}), 400
+        # bool is an int subclass, so JSON true would otherwise count as 1
+        if not isinstance(points, int) or isinstance(points, bool) or not 0 < points <= MAX_POINTS_PER_AWARD:
+            return jsonify({'error': f'Points must be an integer from 1 to {MAX_POINTS_PER_AWARD}'}), 400
         
-        user = User.query.get(user_id)
-        if not user:
+        awarded = award_points(user_id, points)
+        if not awarded:
+            db.session.rollback()
             return jsonify({'error': 'User not found'}), 404
         
-        user.points += points
-        
-        # Calculate new level (every 100 points = 1 level)
-        new_level = (user.points // 100) + 1
-        level_up = new_level > user.level
-        user.level = new_level
-        
-        user.updated_at = datetime.utcnow()
+        response_cache.bump(user_key(user_id))
         db.session.commit()
+        leaderboard.record(user_id, awarded.username, awarded.points, awarded.level)
+        
+        previous_level = (awarded.points - points) // POINTS_PER_LEVEL + 1
         
         return jsonify({
-            'points': user.points,
-            'level': user.level,
-            'level_up': level_up,
-            'points_to_next_level': 100 - (user.points % 100)
+            'points': awarded.points,
+            'level': awarded.level,
+            'level_up': awarded.level > previous_level,
+            'points_to_next_level': POINTS_PER_LEVEL - (awarded.points % POINTS_PER_LEVEL)
         }), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/leaderboard', methods=['GET'])
+@read_only
+def get_leaderboard():
+    try:
+        limit = request.args.get('limit', 10, type=int)
+        
+        if limit <= 0 or limit > leaderboard.size:
+            return jsonify({'error': f'Limit must be between 1 and {leaderboard.size}'}), 400
+        
+        return jsonify(leaderboard.top(limit)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Admin
+@app.route('/api/admin/password-hashing', methods=['GET'])
+@admin_required
+def get_password_hashing_stats():
+    return jsonify(password_hasher.stats()), 200
+
+@app.route('/api/admin/profile', methods=['GET'])
+@admin_required
+def get_request_profile():
+    """Per-route SQL and latency aggregates, when PROFILE_REQUESTS is on"""
+    return jsonify({
+        'enabled': request_profiler.enabled,
+        'slow_ms': request_profiler.slow_ms,
+        'routes': request_profiler.snapshot()
+    }), 200
+
+@app.route('/api/admin/profile', methods=['DELETE'])
+@admin_required
+def reset_request_profile():
+    request_profiler.reset()
+    return jsonify({'message': 'Profile reset'}), 200
+
+@app.route('/api/admin/http-cache', methods=['GET'])
+@admin_required
+def get_http_cache_stats():
+    return jsonify(response_cache.stats()), 200
+
+@app.route('/api/admin/message-archive', methods=['GET'])
+@admin_required
+def get_message_archive_summary():
+    """Archived segments, messages and time range per room"""
+    return jsonify(archive_summary()), 200
+
 # Health check
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -0,0 +1,233 @@
+"""
+Query-shaped loaders and lightweight DTOs for API responses
+
+Model to_dict() methods walk lazy relationships, so serializing a user costs
+one query for its skills plus one per skill. The loaders here fetch exactly
+what each endpoint serializes up front (selectinload/joinedload) and the DTOs
+copy it out, so a response costs a fixed number of queries.
+"""
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from app import User, UserSkill, Message, MeetingRoom
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+# Data transfer objects
+class SkillDTO:
+    __slots__ = ('id', 'name', 'category', 'description', 'icon')
+
+    def __init__(self, id, name, category, description, icon):
+        self.id = id
+        self.name = name
+        self.category = category
+        self.description = description
+        self.icon = icon
+
+    @classmethod
+    def from_model(cls, skill):
+        return cls(skill.id, skill.name, skill.category, skill.description, skill.icon)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'category': self.category,
+            'description': self.description,
+            'icon': self.icon
+        }
+
+class UserSkillDTO:
+    __slots__ = ('id', 'skill', 'proficiency_level', 'want_to_teach', 'want_to_learn', 'years_experience')
+
+    def __init__(self, id, skill, proficiency_level, want_to_teach, want_to_learn, years_experience):
+        self.id = id
+        self.skill = skill
+        self.proficiency_level = proficiency_level
+        self.want_to_teach = want_to_teach
+        self.want_to_learn = want_to_learn
+        self.years_experience = years_experience
+
+    @classmethod
+    def from_model(cls, user_skill):
+        skill = SkillDTO.from_model(user_skill.skill) if user_skill.skill else None
+        return cls(user_skill.id, skill, user_skill.proficiency_level, user_skill.want_to_teach,
+                   user_skill.want_to_learn, user_skill.years_experience)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'skill': self.skill.to_dict() if self.skill else None,
+            'proficiency_level': self.proficiency_level,
+            'want_to_teach': self.want_to_teach,
+            'want_to_learn': self.want_to_learn,
+            'years_experience': self.years_experience
+        }
+
+class UserDTO:
+    __slots__ = ('id', 'username', 'email', 'first_name', 'last_name', 'age', 'bio',
+                 'profile_image_url', 'points', 'level', 'created_at', 'skills')
+
+    def __init__(self, id, username, email, first_name, last_name, age, bio,
+                 profile_image_url, points, level, created_at, skills):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.first_name = first_name
+        self.last_name = last_name
+        self.age = age
+        self.bio = bio
+        self.profile_image_url = profile_image_url
+        self.points = points
+        self.level = level
+        self.created_at = created_at
+        self.skills = skills
+
+    @classmethod
+    def from_model(cls, user):
+        return cls(user.id, user.username, user.email, user.first_name, user.last_name, user.age,
+                   user.bio, user.profile_image_url, user.points, user.level, user.created_at,
+                   [UserSkillDTO.from_model(user_skill) for user_skill in user.skills])
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'age': self.age,
+            'bio': self.bio,
+            'profile_image_url': self.profile_image_url,
+            'points': self.points,
+            'level': self.level,
+            'created_at': _isoformat(self.created_at),
+            'skills': [skill.to_dict() for skill in self.skills]
+        }
+
+class UserRefDTO:
+    """The {id, username} summary embedded in messages and rooms"""
+    __slots__ = ('id', 'username')
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+    @classmethod
+    def from_model(cls, user):
+        return cls(user.id, user.username) if user else None
+
+    def to_dict(self):
+        return {'id': self.id, 'username': self.username}
+
+class MessageDTO:
+    __slots__ = ('id', 'sender', 'room_id', 'content', 'message_type', 'created_at')
+
+    def __init__(self, id, sender, room_id, content, message_type, created_at):
+        self.id = id
+        self.sender = sender
+        self.room_id = room_id
+        self.content = content
+        self.message_type = message_type
+        self.created_at = created_at
+
+    @classmethod
+    def from_model(cls, message):
+        return cls(message.id, UserRefDTO.from_model(message.sender), message.room_id,
+                   message.content, message.message_type, message.created_at)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'sender': self.sender.to_dict() if self.sender else None,
+            'room_id': self.room_id,
+            'content': self.content,
+            'message_type': self.message_type,
+            'created_at': _isoformat(self.created_at)
+        }
+
+class MeetingRoomDTO:
+    __slots__ = ('id', 'name', 'description', 'creator', 'zoom_meeting_id', 'zoom_join_url',
+                 'scheduled_time', 'max_participants', 'is_active')
+
+    def __init__(self, id, name, description, creator, zoom_meeting_id, zoom_join_url,
+                 scheduled_time, max_participants, is_active):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.creator = creator
+        self.zoom_meeting_id = zoom_meeting_id
+        self.zoom_join_url = zoom_join_url
+        self.scheduled_time = scheduled_time
+        self.max_participants = max_participants
+        self.is_active = is_active
+
+    @classmethod
+    def from_model(cls, room):
+        return cls(room.id, room.name, room.description, UserRefDTO.from_model(room.creator),
+                   room.zoom_meeting_id, room.zoom_join_url, room.scheduled_time,
+                   room.max_participants, room.is_active)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'creator': self.creator.to_dict() if self.creator else None,
+            'zoom_meeting_id': self.zoom_meeting_id,
+            'zoom_join_url': self.zoom_join_url,
+            'scheduled_time': _isoformat(self.scheduled_time),
+            'max_participants': self.max_participants,
+            'is_active': self.is_active
+        }
+
+# Loader options, one per response shape
+def user_profile_options():
+    """A user with its skills and each skill's catalog entry: 2 queries for any number of users"""
+    return (selectinload(User.skills).joinedload(UserSkill.skill),)
+
+def user_skill_options():
+    return (joinedload(UserSkill.skill),)
+
+def message_options():
+    return (joinedload(Message.sender),)
+
+def meeting_room_options():
+    return (joinedload(MeetingRoom.creator),)
+
+# Loaders
+def load_user_profile(user_id):
+    return User.query.options(*user_profile_options()).filter_by(id=user_id).first()
+
+def load_user_profile_by_username(username):
+    return User.query.options(*user_profile_options()).filter_by(username=username).first()
+
+def load_user_profiles(user_ids):
+    """Users by id, keyed by id, with their skills loaded"""
+    if not user_ids:
+        return {}
+    users = User.query.options(*user_profile_options()).filter(User.id.in_(set(user_ids))).all()
+    return {user.id: user for user in users}
+
+def load_user_skills(user_id):
+    return UserSkill.query.options(*user_skill_options()).filter_by(user_id=user_id).all()
+
+def load_meeting_room(room_id):
+    return MeetingRoom.query.options(*meeting_room_options()).filter_by(id=room_id).first()
+
+# Serializers
+def serialize_user(user):
+    return UserDTO.from_model(user).to_dict()
+
+def serialize_user_skill(user_skill):
+    return UserSkillDTO.from_model(user_skill).to_dict()
+
+def serialize_skill(skill):
+    return SkillDTO.from_model(skill).to_dict()
+
+def serialize_message(message):
+    return MessageDTO.from_model(message).to_dict()
+
+def serialize_meeting_room(room):
+    return MeetingRoomDTO.from_model(room).to_dict()
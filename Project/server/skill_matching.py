@@ -0,0 +1,114 @@
+"""
+SQL-side skill matching
+Finds teachers and students for a user and scores them in a single query,
+instead of one query per skill and a sort in Python
+"""
+
+from sqlalchemy import Float, and_, case, cast, func, literal, or_, select, union_all
+from sqlalchemy.orm import aliased, joinedload, selectinload
+
+from app import db, User, Skill, UserSkill
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+
+def _clamp_at_zero(expr):
+    # Postgres would otherwise make integer / 5.0 a numeric, read back as Decimal
+    return cast(case((expr < 0, 0), else_=expr), Float)
+
+def teacher_match_percentage(learner, teacher):
+    """Closer proficiency and up to 5 years of teaching experience score higher"""
+    proficiency_diff = func.abs(teacher.proficiency_level - learner.proficiency_level)
+    years = func.coalesce(teacher.years_experience, 0)
+    experience_factor = case((years >= 5, 1.0), else_=years / 5.0)
+    return _clamp_at_zero(100 - proficiency_diff * 10 + experience_factor * 20)
+
+def student_match_percentage(teacher, student):
+    proficiency_diff = func.abs(teacher.proficiency_level - student.proficiency_level)
+    return _clamp_at_zero(100 - proficiency_diff * 5)
+
+def scored_pairs(criteria):
+    """
+    Subquery with one row per (user skill, candidate user skill, match type)
+    for the pairs accepted by criteria(mine, other), a function returning extra
+    WHERE clauses for the two UserSkill aliases. Columns: user1_id, match_type,
+    user_skill_id, user_id, skill_id, proficiency_level, years_experience,
+    match_percentage; user1_id is the user the match is for, the rest describe
+    the candidate.
+    """
+    mine = aliased(UserSkill)
+    other = aliased(UserSkill)
+
+    def pairs(match_type, mine_flag, other_flag, match_percentage):
+        return select(
+            mine.user_id.label('user1_id'),
+            literal(match_type).label('match_type'),
+            other.id.label('user_skill_id'),
+            other.user_id.label('user_id'),
+            other.skill_id.label('skill_id'),
+            other.proficiency_level.label('proficiency_level'),
+            other.years_experience.label('years_experience'),
+            match_percentage.label('match_percentage')
+        ).join(mine, mine.skill_id == other.skill_id).where(
+            mine_flag == True,
+            other_flag == True,
+            other.user_id != mine.user_id,
+            *criteria(mine, other)
+        )
+
+    teachers = pairs('teacher', mine.want_to_learn, other.want_to_teach, teacher_match_percentage(mine, other))
+    students = pairs('student', mine.want_to_teach, other.want_to_learn, student_match_percentage(mine, other))
+    return union_all(teachers, students).subquery('candidates')
+
+def candidate_matches(user_id):
+    """scored_pairs() for the matches of a single user"""
+    return scored_pairs(lambda mine, other: [mine.user_id == user_id])
+
+def find_skill_matches(user_id, limit=None, cursor=None):
+    """
+    Ranked matches for user_id, best first, as (matches, next_cursor)
+    Pages are keyset-paginated on (match_percentage DESC, user_skill_id, match_type),
+    so any page costs the same. next_cursor is None on the last page.
+    """
+    return rank_candidates(candidate_matches(user_id), limit, cursor)
+
+def rank_candidates(candidates, limit=None, cursor=None):
+    """One page of a candidate_matches()-shaped subquery, with its User and Skill"""
+    statement = select(candidates, User, Skill)\
+        .join(User, User.id == candidates.c.user_id)\
+        .join(Skill, Skill.id == candidates.c.skill_id)\
+        .options(selectinload(User.skills).joinedload(UserSkill.skill))\
+        .order_by(
+            candidates.c.match_percentage.desc(),
+            candidates.c.user_skill_id,
+            candidates.c.match_type
+        )
+
+    if cursor:
+        match_percentage, user_skill_id, match_type = decode_cursor(cursor, 3)
+        try:
+            match_percentage = float(match_percentage)
+        except (TypeError, ValueError):
+            raise InvalidCursor('Invalid cursor')
+        statement = statement.where(or_(
+            candidates.c.match_percentage < match_percentage,
+            and_(
+                candidates.c.match_percentage == match_percentage,
+                or_(
+                    candidates.c.user_skill_id > user_skill_id,
+                    and_(candidates.c.user_skill_id == user_skill_id, candidates.c.match_type > match_type)
+                )
+            )
+        ))
+
+    if limit:
+        # One extra row tells us whether there is a next page without a COUNT
+        statement = statement.limit(limit + 1)
+
+    rows = db.session.execute(statement).all()
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(float(last.match_percentage), last.user_skill_id, last.match_type)
+
+    return rows, next_cursor
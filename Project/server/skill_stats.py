@@ -0,0 +1,123 @@
+"""
+Cached per-skill proficiency statistics for /api/skill-matches/percentiles
+
+Proficiency is a small integer scale, so a per-skill histogram of levels is
+an exact quantile sketch: it is built with one GROUP BY query, percentiles
+are read off its cumulative counts, and adding or removing a user skill is
+a single counter update.
+"""
+
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import func
+
+from app import app, db, Skill, UserSkill
+
+# Percentile name, rank fraction and the minimum population for using the rank;
+# smaller populations use the lowest (first) or highest (last) value instead
+PERCENTILES = (
+    ('25th', 0.25, 4, 'first'),
+    ('50th', 0.5, 2, 'first'),
+    ('75th', 0.75, 4, 'last'),
+    ('90th', 0.9, 10, 'last'),
+)
+
+def _nth_smallest(histogram, index):
+    """Value at position index of the sorted values the histogram counts"""
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if index < seen:
+            return value
+    raise IndexError(index)
+
+def summarize(skill_id, histogram):
+    total = sum(histogram.values())
+    levels = sorted(histogram)
+    percentiles = {}
+    for name, fraction, min_count, fallback in PERCENTILES:
+        if total >= min_count:
+            percentiles[name] = _nth_smallest(histogram, int(total * fraction))
+        else:
+            percentiles[name] = levels[0] if fallback == 'first' else levels[-1]
+    return {
+        'skill_id': skill_id,
+        'total_users': total,
+        'avg_proficiency': round(sum(level * count for level, count in histogram.items()) / total, 1),
+        'percentiles': percentiles
+    }
+
+class SkillPercentileCache:
+    """
+    Per-skill proficiency histograms, loaded lazily and kept current by
+    record_added()/record_removed() after user skill commits. The cache is
+    per process, so it is also reloaded once it is older than
+    SKILL_STATS_TTL seconds to pick up writes made by other workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = None
+        self._histograms = None
+        self._loaded_at = 0.0
+
+    def _expired(self):
+        ttl = app.config.get('SKILL_STATS_TTL', 300)
+        return self._histograms is None or (ttl and time.monotonic() - self._loaded_at > ttl)
+
+    def _load(self):
+        rows = db.session.query(
+            Skill.id, Skill.name, UserSkill.proficiency_level, func.count(UserSkill.id)
+        ).join(UserSkill, UserSkill.skill_id == Skill.id)\
+         .group_by(Skill.id, Skill.name, UserSkill.proficiency_level).all()
+
+        names = {}
+        histograms = {}
+        for skill_id, name, level, count in rows:
+            names[skill_id] = name
+            histograms.setdefault(skill_id, Counter())[level] = count
+
+        self._names = names
+        self._histograms = histograms
+        self._loaded_at = time.monotonic()
+
+    def snapshot(self):
+        """Statistics keyed by skill name, for every skill with at least one user"""
+        with self._lock:
+            if self._expired():
+                self._load()
+            return {
+                self._names[skill_id]: summarize(skill_id, histogram)
+                for skill_id, histogram in self._histograms.items()
+                if sum(histogram.values()) > 0
+            }
+
+    def record_added(self, skill_id, level):
+        with self._lock:
+            if self._histograms is None:
+                return
+            if skill_id not in self._names:
+                # First user of this skill; the name is not cached, reload on next read
+                self._histograms = None
+                return
+            self._histograms[skill_id][level] += 1
+
+    def record_removed(self, skill_id, level):
+        with self._lock:
+            if self._histograms is None:
+                return
+            histogram = self._histograms.get(skill_id)
+            if histogram is None or histogram[level] <= 0:
+                self._histograms = None
+                return
+            histogram[level] -= 1
+            if histogram[level] == 0:
+                del histogram[level]
+
+    def invalidate(self):
+        with self._lock:
+            self._histograms = None
+
+skill_percentiles = SkillPercentileCache()
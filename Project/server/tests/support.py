@@ -0,0 +1,18 @@
+"""
+Setup shared by the server tests; import it before anything imports app
+
+The tests run against a throwaway SQLite database, with nothing held in the
+conditional-GET cache and messages written synchronously, so every request
+reaches the database.
+"""
+
+import os
+import sys
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix='bridgen-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_db_dir, 'test.db')
+os.environ.pop('DATABASE_REPLICA_URLS', None)
+os.environ['HTTP_CACHE_MAX_BYTES'] = '0'
+os.environ['MESSAGE_WRITE_BEHIND'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
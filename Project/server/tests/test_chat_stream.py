@@ -0,0 +1,100 @@
+"""
+Chat streams: the per-process cap on open streams, resuming after a
+reconnect, and what the hub keeps in memory
+"""
+
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import support  # noqa: F401 must come before app
+
+from app import app, db, create_tables, User, Message
+from chat_hub import RoomHub, room_hub
+import routes  # noqa: F401 registers the endpoints
+
+class StreamLimitTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+
+    def open_stream(self, room_id):
+        response = app.test_client().get(f'/api/messages/{room_id}/stream', buffered=False)
+        if response.status_code == 200:
+            next(response.response)
+        return response
+
+    def test_streams_past_the_limit_get_503(self):
+        with mock.patch.dict(app.config, SSE_MAX_STREAMS=1):
+            first = self.open_stream('capped-room')
+            self.assertEqual(first.status_code, 200)
+            self.assertEqual(room_hub.stream_count(), 1)
+
+            second = self.open_stream('other-room')
+            self.assertEqual(second.status_code, 503)
+            self.assertIn('Retry-After', second.headers)
+
+            first.close()
+            self.assertEqual(room_hub.stream_count(), 0)
+            third = self.open_stream('other-room')
+            self.assertEqual(third.status_code, 200)
+            third.close()
+
+    def test_default_limit_leaves_threads_for_other_requests(self):
+        self.assertLess(app.config['SSE_MAX_STREAMS'], app.config['REQUEST_THREADS'])
+
+class StreamResumeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+        with app.app_context():
+            user = User(username='streamer', email='streamer@example.com')
+            user.password_hash = 'unused'
+            db.session.add(user)
+            db.session.flush()
+            start = datetime.utcnow() - timedelta(minutes=5)
+            messages = [Message(room_id='resume-room', sender_id=user.id, content=f'message {i}',
+                                created_at=start + timedelta(seconds=i)) for i in range(8)]
+            db.session.add_all(messages)
+            db.session.commit()
+            cls.ids = [message.id for message in messages]
+
+    def events(self, last_id, count):
+        response = app.test_client().get('/api/messages/resume-room/stream', headers={'Last-Event-ID': last_id},
+                                         buffered=False)
+        chunks = iter(response.response)
+        next(chunks)  # retry:
+        events = [next(chunks).decode() for _ in range(count)]
+        response.close()
+        return events
+
+    def test_resume_pages_through_the_whole_gap(self):
+        with mock.patch.object(routes, 'SSE_CATCH_UP_PAGE', 3):
+            events = self.events(self.ids[0], 7)
+        self.assertEqual([event.split('\n', 1)[0] for event in events], [f'id: {id}' for id in self.ids[1:]])
+
+    def test_unknown_last_event_id_gets_a_reset(self):
+        event, = self.events('no-such-message', 1)
+        self.assertTrue(event.startswith('event: reset\n'), event)
+
+class RoomHubMemoryTest(unittest.TestCase):
+    def test_nothing_is_kept_for_rooms_without_subscribers(self):
+        hub = RoomHub(dedupe_seconds=60.0)
+        subscription = hub.subscribe('busy-room')
+        hub.publish('busy-room', {'id': 'm1'})
+        hub.unsubscribe(subscription)
+        self.assertEqual(hub.rooms(), [])
+        self.assertEqual(hub.stream_count(), 0)
+
+    def test_dedupe_window_is_pruned(self):
+        hub = RoomHub(dedupe_seconds=60.0)
+        with mock.patch('chat_hub.time.monotonic', return_value=1000.0):
+            for i in range(100):
+                hub.publish(f'room-{i}', {'id': f'm{i}'})
+            self.assertFalse(hub.publish('room-0', {'id': 'm0'}))
+        with mock.patch('chat_hub.time.monotonic', return_value=1100.0):
+            hub.publish('room-0', {'id': 'later'})
+        self.assertEqual(list(hub._published), ['later'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+Conditional-GET cache: a write through any worker invalidates every worker's copy
+"""
+
+import unittest
+from unittest import mock
+
+import support  # noqa: F401 must come before app
+
+from app import app, db, create_tables, User
+from http_cache import ResponseCache, response_cache, user_key
+import routes  # noqa: F401 registers the endpoints
+
+class SharedVersionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+        with app.app_context():
+            user = User(username='cached', email='cached@example.com', bio='before')
+            user.password_hash = 'unused'
+            db.session.add(user)
+            db.session.commit()
+            cls.user_id = user.id
+
+    def setUp(self):
+        patcher = mock.patch.object(response_cache, 'max_bytes', 1024 * 1024)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write_in_another_worker(self, bio):
+        """Change the profile the way another process would, with its own cache"""
+        other = ResponseCache(max_bytes=1024 * 1024)
+        with app.app_context():
+            db.session.query(User).filter_by(id=self.user_id).update({'bio': bio})
+            other.bump(user_key(self.user_id))
+            db.session.commit()
+
+    def test_other_workers_writes_are_not_served_stale(self):
+        client = app.test_client()
+        first = client.get(f'/api/users/{self.user_id}')
+        self.assertEqual(first.json['bio'], 'before')
+        cached = client.get(f'/api/users/{self.user_id}', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+        self.write_in_another_worker('after')
+
+        revalidated = client.get(f'/api/users/{self.user_id}', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(revalidated.status_code, 200)
+        self.assertEqual(revalidated.json['bio'], 'after')
+        self.assertNotEqual(revalidated.headers['ETag'], first.headers['ETag'])
+
+    def test_bump_creates_and_increments_the_counter(self):
+        with app.app_context():
+            key = 'test:counter'
+            self.assertEqual(response_cache.version(key), 0)
+            response_cache.bump(key)
+            db.session.commit()
+            response_cache.bump(key, key)
+            db.session.commit()
+            self.assertEqual(response_cache.version(key), 3)
+
+    def test_rolled_back_writes_keep_the_version(self):
+        with app.app_context():
+            key = 'test:rollback'
+            response_cache.bump(key)
+            db.session.rollback()
+            self.assertEqual(response_cache.version(key), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Materialized skill matches: staleness shared through the database and a
+single refreshing process
+"""
+
+import unittest
+from unittest import mock
+
+import support  # noqa: F401 must come before app
+
+from app import app, db, create_tables, BackgroundLease, User, Skill, UserSkill
+from match_store import SkillMatchMaterializer, is_stale, load_skill_matches
+from skill_matching import find_skill_matches
+import routes  # noqa: F401 registers the endpoints
+
+class MatchStoreTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+        with app.app_context():
+            cls.skills = [skill.id for skill in Skill.query.order_by(Skill.name).limit(3)]
+            users = []
+            for i in range(6):
+                user = User(username=f'stored{i}', email=f'stored{i}@example.com')
+                user.password_hash = 'unused'
+                users.append(user)
+            db.session.add_all(users)
+            db.session.flush()
+            for i, user in enumerate(users):
+                db.session.add(UserSkill(user_id=user.id, skill_id=cls.skills[i % 2], proficiency_level=1 + i,
+                                         want_to_teach=i % 2 == 0, want_to_learn=i % 2 == 1))
+            db.session.commit()
+            cls.users = [user.id for user in users]
+
+    def setUp(self):
+        # Two workers, neither running its thread; the test drives them
+        self.worker, self.other_worker = SkillMatchMaterializer(app), SkillMatchMaterializer(app)
+        self.worker.rebuild()
+        with app.app_context():
+            # Released, as by a worker from an earlier test whose lease ran out
+            BackgroundLease.query.update({'holder': None, 'expires_at': None})
+            db.session.commit()
+        for target in ('match_store.match_materializer', 'routes.match_materializer'):
+            patcher = mock.patch(target, return_value=self.worker)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def matches(self, user_id):
+        with app.app_context():
+            return load_skill_matches(user_id)[0], find_skill_matches(user_id)[0]
+
+    def add_skill(self, user_id, skill_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+        response = client.post(f'/api/users/{user_id}/skills',
+                               json={'skill_id': skill_id, 'want_to_learn': True, 'proficiency_level': 3})
+        self.assertEqual(response.status_code, 201, response.get_data(as_text=True))
+
+    def test_changed_user_is_served_live_until_refreshed(self):
+        user_id = self.users[0]
+        self.add_skill(user_id, self.skills[1])
+        with app.app_context():
+            self.assertTrue(is_stale(user_id))
+        served, live = self.matches(user_id)
+        self.assertEqual(served, live)
+
+        self.assertEqual(self.worker.refresh_stale(), 1)
+        with app.app_context():
+            self.assertFalse(is_stale(user_id))
+        for other in self.users:
+            served, live = self.matches(other)
+            self.assertEqual(served, live)
+
+    def test_only_the_lease_holder_refreshes(self):
+        self.add_skill(self.users[1], self.skills[2])
+        self.assertEqual(self.worker.refresh_stale(), 1)
+        self.add_skill(self.users[2], self.skills[2])
+        self.assertIsNone(self.other_worker.refresh_stale())
+        with app.app_context():
+            self.assertTrue(is_stale(self.users[2]))
+        self.assertEqual(self.worker.refresh_stale(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
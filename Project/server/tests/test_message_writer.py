@@ -0,0 +1,109 @@
+"""
+Write-behind message ingestion: acknowledged messages survive database errors
+"""
+
+import threading
+import unittest
+import uuid
+from datetime import datetime
+from unittest import mock
+
+import support  # noqa: F401 must come before app
+
+from sqlalchemy.exc import OperationalError
+
+from app import app, db, create_tables, User, Message
+from message_writer import MessageWriter
+import routes  # noqa: F401 registers the endpoints
+
+class MessageWriterTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+        with app.app_context():
+            user = User(username='writer', email='writer@example.com')
+            user.password_hash = 'unused'
+            db.session.add(user)
+            db.session.commit()
+            cls.user_id = user.id
+
+    def row(self, sender_id=None, room_id='writer-room'):
+        return {'id': str(uuid.uuid4()), 'sender_id': sender_id or self.user_id, 'room_id': room_id,
+                'content': 'hi', 'message_type': 'text', 'created_at': datetime.utcnow()}
+
+    def stored(self, rows):
+        with app.app_context():
+            return db.session.query(Message.id).filter(Message.id.in_([row['id'] for row in rows])).count()
+
+    def test_rows_are_kept_while_the_database_is_unavailable(self):
+        writer = MessageWriter(app, flush_interval=0.01, retry_delay=0.01)
+        rows = [self.row() for _ in range(3)]
+        insert = MessageWriter._insert
+        calls = []
+
+        def flaky_insert(self, batch):
+            calls.append(len(batch))
+            if len(calls) <= 2:
+                raise OperationalError('INSERT', {}, Exception('server closed the connection'))
+            return insert(self, batch)
+
+        with mock.patch.object(MessageWriter, '_insert', flaky_insert):
+            for row in rows:
+                writer.submit(row)
+            writer.start()
+            writer.stop(timeout=5)
+
+        self.assertEqual(self.stored(rows), 3)
+        self.assertEqual(writer.stats()['failed'], 0)
+        self.assertGreaterEqual(writer.stats()['retries'], 2)
+        self.assertEqual(writer.pending('writer-room'), [])
+
+    def test_rows_stay_pending_until_written(self):
+        writer = MessageWriter(app, flush_interval=0.01, retry_delay=0.01)
+        row = self.row(room_id='pending-room')
+        failing = threading.Event()
+        failing.set()
+        insert = MessageWriter._insert
+
+        def blocked_insert(self, batch):
+            if failing.is_set():
+                raise OperationalError('INSERT', {}, Exception('database is starting up'))
+            return insert(self, batch)
+
+        with mock.patch.object(MessageWriter, '_insert', blocked_insert):
+            writer.submit(row)
+            writer.start()
+            self.assertEqual([pending['id'] for pending in writer.pending('pending-room')], [row['id']])
+            failing.clear()
+            writer.stop(timeout=5)
+        self.assertEqual(self.stored([row]), 1)
+
+    def test_only_constraint_violations_are_dropped(self):
+        writer = MessageWriter(app, flush_interval=0.01)
+        first, other = self.row(), self.row()
+        duplicate = dict(first, content='again')
+        rows = [first, duplicate, other]
+        writer._insert(rows)
+        self.assertEqual(rows, [])
+        self.assertEqual(self.stored([first, other]), 2)
+        self.assertEqual(writer.stats()['failed'], 1)
+
+    def test_send_rejects_what_the_writer_would_drop(self):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = self.user_id
+        response = client.post('/api/messages', json={'room_id': 'r' * 101, 'content': 'hi'})
+        self.assertEqual(response.status_code, 400)
+        response = client.post('/api/messages', json={'room_id': 'room', 'content': ['hi']})
+        self.assertEqual(response.status_code, 400)
+
+        with client.session_transaction() as session:
+            session['user_id'] = str(uuid.uuid4())
+        with mock.patch.dict(app.config, MESSAGE_WRITE_BEHIND=True), \
+                mock.patch('routes.message_writer') as message_writer:
+            response = client.post('/api/messages', json={'room_id': 'room', 'content': 'hi'})
+        self.assertEqual(response.status_code, 401)
+        message_writer.return_value.submit.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Meeting room seats: capacity, leaving, and leases that lapse
+"""
+
+import unittest
+from datetime import datetime, timedelta
+
+import support  # noqa: F401 must come before app
+
+from app import app, db, create_tables, User, MeetingRoom, MeetingRoomParticipant
+from occupancy import RoomFull, join_room, leave_room
+
+class OccupancyTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+        with app.app_context():
+            users = []
+            for i in range(3):
+                user = User(username=f'sitter{i}', email=f'sitter{i}@example.com')
+                user.password_hash = 'unused'
+                users.append(user)
+            db.session.add_all(users)
+            db.session.commit()
+            cls.users = [user.id for user in users]
+
+    def setUp(self):
+        with app.app_context():
+            room = MeetingRoom(name='Two seats', creator_id=self.users[0], max_participants=2)
+            db.session.add(room)
+            db.session.commit()
+            self.room_id = room.id
+
+    def backdate(self, user_id, seconds):
+        with app.app_context():
+            db.session.query(MeetingRoomParticipant).filter_by(room_id=self.room_id, user_id=user_id)\
+                .update({'last_seen_at': datetime.utcnow() - timedelta(seconds=seconds)})
+            db.session.commit()
+
+    def test_full_room_rejects_until_someone_leaves(self):
+        with app.app_context():
+            self.assertEqual(join_room(self.room_id, self.users[0]), 1)
+            self.assertEqual(join_room(self.room_id, self.users[1]), 2)
+            self.assertEqual(join_room(self.room_id, self.users[1]), 2)
+            with self.assertRaises(RoomFull):
+                join_room(self.room_id, self.users[2])
+            self.assertEqual(leave_room(self.room_id, self.users[2]), 2)
+            self.assertEqual(leave_room(self.room_id, self.users[0]), 1)
+            self.assertEqual(join_room(self.room_id, self.users[2]), 2)
+
+    def test_lapsed_seats_are_reclaimed_by_the_next_join(self):
+        lease = app.config['MEETING_SEAT_LEASE_SECONDS']
+        with app.app_context():
+            join_room(self.room_id, self.users[0])
+            join_room(self.room_id, self.users[1])
+        self.backdate(self.users[0], lease + 1)
+        self.backdate(self.users[1], lease - 30)
+        with app.app_context():
+            self.assertEqual(join_room(self.room_id, self.users[2]), 2)
+            with self.assertRaises(RoomFull):
+                join_room(self.room_id, self.users[0])
+
+    def test_joining_again_renews_the_lease(self):
+        lease = app.config['MEETING_SEAT_LEASE_SECONDS']
+        with app.app_context():
+            join_room(self.room_id, self.users[0])
+            join_room(self.room_id, self.users[1])
+        self.backdate(self.users[0], lease - 30)
+        with app.app_context():
+            join_room(self.room_id, self.users[0])
+        self.backdate(self.users[1], lease + 1)
+        with app.app_context():
+            self.assertEqual(join_room(self.room_id, self.users[2]), 2)
+            self.assertEqual(
+                {row.user_id for row in MeetingRoomParticipant.query.filter_by(room_id=self.room_id)},
+                {self.users[0], self.users[2]}
+            )
+
+if __name__ == '__main__':
+    unittest.main()
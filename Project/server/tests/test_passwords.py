@@ -0,0 +1,71 @@
+"""
+Admission control on the password hashing pool
+"""
+
+import threading
+import unittest
+
+import support  # noqa: F401 must come before app
+
+from app import app, db, create_tables, User
+from passwords import HashingBusy, password_hasher
+import routes  # noqa: F401 registers the endpoints
+
+class PasswordAdmissionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+        password_hasher.configure(method='pbkdf2:sha256:1000')
+        with app.app_context():
+            user = User(username='hasher', email='hasher@example.com')
+            user.password_hash = password_hasher.hash('secret')
+            db.session.add(user)
+            db.session.commit()
+
+    def setUp(self):
+        self.saved = (password_hasher.workers, password_hasher.max_queue)
+        password_hasher.configure(workers=1, max_queue=0)
+        self.gate = threading.Event()
+
+    def tearDown(self):
+        self.gate.set()
+        workers, max_queue = self.saved
+        password_hasher.configure(workers=workers, max_queue=max_queue)
+
+    def occupy_pool(self):
+        """Take the only admission slot until the test ends"""
+        started = threading.Event()
+
+        def hold():
+            started.set()
+            return self.gate.wait(5)
+
+        thread = threading.Thread(target=password_hasher._run, args=(hold,), daemon=True)
+        thread.start()
+        started.wait(5)
+        return thread
+
+    def test_default_admission_is_below_the_request_threads(self):
+        admitted = app.config['PASSWORD_HASH_WORKERS'] + app.config['PASSWORD_HASH_QUEUE']
+        self.assertLess(admitted, app.config['REQUEST_THREADS'])
+
+    def test_full_pool_raises_busy(self):
+        self.occupy_pool()
+        with self.assertRaises(HashingBusy):
+            password_hasher.verify(password_hasher.hash('x'), 'x')
+
+    def test_login_answers_503_with_retry_after_when_busy(self):
+        self.occupy_pool()
+        response = app.test_client().post('/api/auth/login', json={'username': 'hasher', 'password': 'secret'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+
+    def test_login_succeeds_once_the_pool_frees_up(self):
+        thread = self.occupy_pool()
+        self.gate.set()
+        thread.join(5)
+        response = app.test_client().post('/api/auth/login', json={'username': 'hasher', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
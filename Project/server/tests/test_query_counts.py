@@ -0,0 +1,121 @@
+"""
+Statements issued per request by the read endpoints
+
+Each endpoint must cost a fixed number of queries however many skills,
+senders or rooms it serializes; a lazy relationship creeping back into a
+response shows up here as a count that grows with the data.
+
+    python -m pytest server/tests    (or python -m unittest discover server/tests)
+"""
+
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import support  # noqa: F401 must come before app
+
+from sqlalchemy import event
+
+from app import app, db, create_tables, User, Skill, UserSkill, Message, MeetingRoom
+from message_archive import archived_rooms
+import routes  # noqa: F401 registers the endpoints
+
+# Statements per request, independent of how many rows are serialized
+EXPECTED_QUERIES = {
+    # the user, then their skills with each skill joined in
+    'profile': 2,
+    # the user skills with each skill joined in
+    'user skills': 1,
+    # a page of messages with senders joined in
+    'messages': 1,
+    # the last page too: none of these rooms has archive segments to read on
+    # into (with archived_rooms loaded beforehand)
+    'messages, last page': 1,
+    # the active rooms with creators joined in
+    'meeting rooms': 1,
+}
+
+class QueryCountTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+        with app.app_context():
+            skills = Skill.query.order_by(Skill.name).all()
+            users = []
+            for i in range(12):
+                user = User(username=f'user{i}', email=f'user{i}@example.com', bio=f'Bio {i}')
+                user.password_hash = 'unused'
+                users.append(user)
+            db.session.add_all(users)
+            db.session.flush()
+
+            # user0 holds one skill, user1 every skill
+            db.session.add(UserSkill(user_id=users[0].id, skill_id=skills[0].id, want_to_teach=True))
+            db.session.add_all(UserSkill(user_id=users[1].id, skill_id=skill.id, want_to_learn=True)
+                               for skill in skills)
+
+            # room-one has one sender, room-many a different sender per message
+            start = datetime.utcnow() - timedelta(hours=1)
+            db.session.add(Message(room_id='room-one', sender_id=users[0].id, content='hello', created_at=start))
+            db.session.add_all(
+                Message(room_id='room-many', sender_id=user.id, content=f'hello from {user.username}',
+                        created_at=start + timedelta(seconds=i))
+                for i, user in enumerate(users)
+            )
+            db.session.commit()
+            cls.few, cls.many = users[0].id, users[1].id
+            cls.users = [user.id for user in users]
+            archived_rooms.refresh()
+
+    @contextmanager
+    def count_queries(self):
+        statements = []
+        with app.app_context():
+            engine = db.engine
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+    def assertQueries(self, endpoint, path):
+        client = app.test_client()
+        with self.count_queries() as statements:
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        self.assertEqual(len(statements), EXPECTED_QUERIES[endpoint],
+                         f'{path} issued {len(statements)} queries:\n' + '\n'.join(statements))
+        return response
+
+    def add_rooms(self, creators):
+        with app.app_context():
+            db.session.add_all(MeetingRoom(name=f'Room {i}', creator_id=creator) for i, creator in enumerate(creators))
+            db.session.commit()
+
+    def test_profile(self):
+        for user_id in (self.few, self.many):
+            self.assertQueries('profile', f'/api/users/{user_id}')
+
+    def test_user_skills(self):
+        self.assertEqual(len(self.assertQueries('user skills', f'/api/users/{self.few}/skills').json), 1)
+        self.assertGreater(len(self.assertQueries('user skills', f'/api/users/{self.many}/skills').json), 1)
+
+    def test_messages(self):
+        self.assertQueries('messages', '/api/messages/room-many?per_page=1')
+        self.assertQueries('messages', '/api/messages/room-many?per_page=5')
+        self.assertQueries('messages, last page', '/api/messages/room-one')
+        self.assertQueries('messages, last page', '/api/messages/room-many')
+
+    def test_meeting_rooms(self):
+        with app.app_context():
+            MeetingRoom.query.delete()
+            db.session.commit()
+        self.add_rooms(self.users[:1])
+        self.assertQueries('meeting rooms', '/api/meeting-rooms')
+        self.add_rooms(self.users)
+        self.assertEqual(len(self.assertQueries('meeting rooms', '/api/meeting-rooms').json), len(self.users) + 1)
+
+if __name__ == '__main__':
+    unittest.main()
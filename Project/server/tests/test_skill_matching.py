@@ -0,0 +1,72 @@
+"""
+Keyset paging of ranked skill matches
+
+Postgres computes match_percentage as a numeric, which comes back as a
+Decimal; the candidates are cast to Numeric here so SQLite does the same.
+"""
+
+import unittest
+
+import support  # noqa: F401 must come before app
+
+from sqlalchemy import Numeric, cast, select
+
+from app import app, db, create_tables, User, Skill, UserSkill
+from skill_matching import candidate_matches, find_skill_matches, rank_candidates
+
+class SkillMatchPagingTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+        with app.app_context():
+            skills = Skill.query.order_by(Skill.name).limit(3).all()
+            users = []
+            for i in range(8):
+                user = User(username=f'matcher{i}', email=f'matcher{i}@example.com')
+                user.password_hash = 'unused'
+                users.append(user)
+            db.session.add_all(users)
+            db.session.flush()
+
+            learner = users[0]
+            db.session.add_all(UserSkill(user_id=learner.id, skill_id=skill.id, proficiency_level=5,
+                                         want_to_learn=True, want_to_teach=True) for skill in skills)
+            for i, user in enumerate(users[1:]):
+                db.session.add_all(
+                    UserSkill(user_id=user.id, skill_id=skill.id, proficiency_level=1 + (i + j) % 9,
+                              years_experience=(i * 3 + j) % 7, want_to_teach=True, want_to_learn=i % 2 == 0)
+                    for j, skill in enumerate(skills)
+                )
+            db.session.commit()
+            cls.user_id = learner.id
+
+    def decimal_candidates(self):
+        candidates = candidate_matches(self.user_id)
+        columns = [cast(column, Numeric(10, 4)).label(column.name) if column.name == 'match_percentage' else column
+                   for column in candidates.c]
+        return select(*columns).subquery('decimal_candidates')
+
+    def page_through(self, candidates, limit):
+        keys, cursor = [], None
+        while True:
+            rows, cursor = rank_candidates(candidates, limit, cursor)
+            keys += [(row.user_skill_id, row.match_type) for row in rows]
+            if cursor is None:
+                return keys
+
+    def test_pages_match_the_full_ranking(self):
+        with app.app_context():
+            rows, cursor = find_skill_matches(self.user_id)
+            self.assertIsNone(cursor)
+            ranked = [(row.user_skill_id, row.match_type) for row in rows]
+            self.assertGreater(len(ranked), 10)
+            self.assertEqual(self.page_through(candidate_matches(self.user_id), 4), ranked)
+
+    def test_pages_with_decimal_percentages(self):
+        with app.app_context():
+            candidates = self.decimal_candidates()
+            ranked = [(row.user_skill_id, row.match_type) for row in rank_candidates(candidates)[0]]
+            self.assertEqual(self.page_through(candidates, 3), ranked)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+Full-text search over users' names, bios and skill names
+
+The user_search table holds one document per user. On SQLite it is an FTS5
+table with name, bio and skills columns ranked by bm25; on Postgres it is a
+weighted tsvector (names A, skills B, bio C) with a GIN index, ranked by
+ts_rank_cd. Migration 0004 creates and backfills it, and the write routes
+call index_user() before they commit, so the document changes in the same
+transaction as the profile or skills it describes.
+
+Search is optional: on other databases, or SQLite builds without FTS5, the
+migration skips the table, index_user() does nothing and only search_users()
+raises SearchUnavailable.
+
+Queries are split into words and every word must match, as a prefix, so
+"gard pian" finds a user who gardens and plays piano.
+"""
+
+import re
+
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+
+# Relative weight of the name, bio and skills columns in SQLite's bm25
+SQLITE_WEIGHTS = (10.0, 1.0, 5.0)
+
+MAX_QUERY_WORDS = 8
+
+class SearchUnavailable(Exception):
+    pass
+
+def _dialect(conn):
+    name = conn.dialect.name
+    if name not in ('sqlite', 'postgresql'):
+        raise SearchUnavailable(f'User search is not supported on {name}')
+    return name
+
+_index_exists = False
+
+def _require_index(conn):
+    """The dialect name, once the user_search table is known to exist"""
+    global _index_exists
+    name = _dialect(conn)
+    if not _index_exists:
+        if not inspect(conn).has_table('user_search'):
+            raise SearchUnavailable('The user search index has not been created')
+        _index_exists = True
+    return name
+
+def create_search_index(conn):
+    if _dialect(conn) == 'sqlite':
+        try:
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5("
+                "user_id UNINDEXED, name, bio, skills, tokenize = 'unicode61 remove_diacritics 2')"
+            ))
+        except OperationalError as e:
+            raise SearchUnavailable(f'SQLite was built without FTS5: {e.orig}')
+    else:
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS user_search ('
+            'user_id VARCHAR(36) PRIMARY KEY, document tsvector NOT NULL)'
+        ))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS ix_user_search_document ON user_search USING GIN (document)'))
+
+_NAME = "COALESCE(u.username, '') || ' ' || COALESCE(u.first_name, '') || ' ' || COALESCE(u.last_name, '')"
+
+_SQLITE_INDEX = f"""
+INSERT INTO user_search (user_id, name, bio, skills)
+SELECT u.id, {_NAME}, COALESCE(u.bio, ''),
+       COALESCE((SELECT group_concat(s.name, ' ') FROM user_skills us
+                 JOIN skills s ON s.id = us.skill_id WHERE us.user_id = u.id), '')
+FROM users u
+"""
+
+_POSTGRES_INDEX = f"""
+INSERT INTO user_search (user_id, document)
+SELECT u.id,
+       setweight(to_tsvector('simple', {_NAME}), 'A') ||
+       setweight(to_tsvector('simple', COALESCE((SELECT string_agg(s.name, ' ') FROM user_skills us
+                 JOIN skills s ON s.id = us.skill_id WHERE us.user_id = u.id), '')), 'B') ||
+       setweight(to_tsvector('simple', COALESCE(u.bio, '')), 'C')
+FROM users u
+"""
+
+def index_users(conn, user_ids=None):
+    """(Re)build the documents of user_ids, or of every user when user_ids is None"""
+    dialect = _dialect(conn)
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        ids = bindparam('user_ids', expanding=True)
+        conn.execute(text('DELETE FROM user_search WHERE user_id IN :user_ids').bindparams(ids),
+                     {'user_ids': user_ids})
+    else:
+        conn.execute(text('DELETE FROM user_search'))
+
+    statement = _SQLITE_INDEX if dialect == 'sqlite' else _POSTGRES_INDEX
+    if user_ids is not None:
+        statement = text(statement + 'WHERE u.id IN :user_ids').bindparams(bindparam('user_ids', expanding=True))
+        conn.execute(statement, {'user_ids': user_ids})
+    else:
+        conn.execute(text(statement))
+
+def index_user(user_id):
+    """
+    Refresh one user's document in the current session's transaction; a no-op
+    when search is unavailable, so profile and skill writes never depend on it
+    """
+    db.session.flush()
+    conn = db.session.connection()
+    try:
+        _require_index(conn)
+    except SearchUnavailable:
+        return
+    index_users(conn, [user_id])
+
+def _words(query):
+    return re.findall(r'\w+', query.lower())[:MAX_QUERY_WORDS]
+
+def search_users(query, limit=20, cursor=None):
+    """
+    Ids of users matching query as ([(user_id, score), ...], next_cursor), best
+    first. Pages are keyset-paginated on (score DESC, user_id).
+    """
+    words = _words(query)
+    if not words:
+        return [], None
+
+    conn = db.session.connection()
+    params = {'limit': limit + 1}
+    if _require_index(conn) == 'sqlite':
+        params['query'] = ' '.join(f'"{word}"*' for word in words)
+        score = '-bm25(user_search, 0.0, {}, {}, {})'.format(*SQLITE_WEIGHTS)
+        match = 'user_search MATCH :query'
+    else:
+        params['query'] = ' & '.join(f'{word}:*' for word in words)
+        score = 'ts_rank_cd(document, to_tsquery(\'simple\', :query))::float8'
+        match = 'document @@ to_tsquery(\'simple\', :query)'
+
+    after = ''
+    if cursor:
+        last_score, last_id = decode_cursor(cursor, 2)
+        try:
+            params['last_score'] = float(last_score)
+        except (TypeError, ValueError):
+            raise InvalidCursor('Invalid cursor')
+        params['last_id'] = last_id
+        after = f' AND ({score} < :last_score OR ({score} = :last_score AND user_id > :last_id))'
+
+    rows = conn.execute(text(
+        f'SELECT user_id, {score} AS score FROM user_search WHERE {match}{after} '
+        f'ORDER BY score DESC, user_id LIMIT :limit'
+    ), params).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].score, rows[-1].user_id)
+    return [(row.user_id, row.score) for row in rows], next_cursor
@@ -0,0 +1,13 @@
+"""
+WSGI entry point for production serving
+
+    gunicorn wsgi:app       (run from this directory, settings in gunicorn.conf.py)
+
+Unlike main.py this runs no development server; the schema is migrated once
+when the app is loaded, before any worker starts.
+"""
+
+from app import app, create_tables
+import routes  # noqa: F401 - registers the endpoints
+
+create_tables()